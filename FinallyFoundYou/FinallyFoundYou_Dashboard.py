@@ -1,11 +1,23 @@
 import pandas as pd
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import matplotlib.pyplot as plt
 import os
-import regex
+import sys
 
+#the shared dashboard_core package lives one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard_core import aggregates, figures, downsample, planner, products, timing, velocity, views
+from dashboard_core.lazy import lazy_import
+
+px = lazy_import('plotly.express')
+
+
+def prepare_finallyfoundyou(df):
+    #period labels and the units and rupiah each row sold, added once per dataset version
+    df['period'] = aggregates.period_names(df['scraping_date'])
+    return velocity.add_sold_columns(df, 'finallyfoundyou')
+
+
+@timing.timed_page('finallyfoundyou')
 def main():
     st.set_page_config(
         page_title = 'Finally Found You Product Dashboard 2025',
@@ -15,81 +27,56 @@ def main():
     st.title('Finally Found You Product Dashboard 2025')
 
     #Loading the Dataset
-    @st.cache_data
-    def load_data(url):
-        df = pd.read_csv(url)
-        return df
-    
-    df = load_data(r'FinallyFoundYou/CleanData_FinallyFoundYou_30625.csv')
-
-    month_order = {
-    1:'January',
-    2:'February',
-    3:'March',
-    4:'April',
-    5:'May',
-    6:'June',
-    7:'July',
-    8:'August',
-    9:'September',
-    10:'October',
-    11:'November',
-    12:'December'
-    }
+    #reordered once per version so the month and category selected below are a slice
+    df, blocks, version = views.load_partitioned('finallyfoundyou', ['period', 'categories'], prepare_finallyfoundyou,
+                                                  product_keys = 20)
 
     with st.sidebar:
         st.title('"Finally Found You" Moisturizer Products')
 
-        #create month_list for the filter
-        df['month'] = df['month'].map(month_order)
-        month_list = df['month'].unique().tolist()
+        #KPI totals per category and (year, month), built once per dataset version
+        rollup = aggregates.monthly_rollup('finallyfoundyou', 'categories')
+        #units and revenue really sold per category and (year, month), from the counters
+        monthly_sales = velocity.monthly_sales('finallyfoundyou', 'categories')
+        #create month_list for the filter, every (year, month) of the history oldest first
+        month_list = rollup['periods']
         category_list = df['categories'].unique().tolist()
         
         #button mechanisms
         selected_month = st.selectbox('Select a month', month_list, index = len(month_list)-1)
         selected_categories = st.selectbox('Select a Category', category_list,index = len(category_list)-1)
-        df_selected_month = df[(df['month'] == selected_month) & (df['categories'] == selected_categories)]
+        df_selected_month = views.select(df, blocks, selected_month, selected_categories)
+        #KPI totals of the selection and of the category's month before it, positional
+        #lookups in the monthly rollup, the same (year, month) rows the charts slice
+        current, month_before = aggregates.rollup_periods(rollup, selected_month, selected_categories)
+        sold, sold_before = velocity.sales_periods(monthly_sales, rollup, selected_month, selected_categories)
+        #the charts read the selection on the same basis as the KPIs
+        df_selected_month = velocity.sold_rows(df_selected_month, sold, 'sales', 'revenue')
 
         def calculate_revenue_metric(month,category):
-            revenue_total = df_selected_month['revenue'].sum()
+            revenue_total = sold['revenue']
             return revenue_total
         
         def calculate_sales_metric(month,category):
-            sales_total = df_selected_month['sales'].sum()
+            sales_total = sold['sales']
             return sales_total
         
         def calculate_product_rating(month,category):
-            rating_mean = df_selected_month['rating'].mean()
+            rating_mean = current['rating']
             return rating_mean
-       
-        def calculate_pct_revenue(df):                        # hindari SettingWithCopy
-            df_selected_month['revenue'] = pd.to_numeric(df_selected_month['revenue'], errors='coerce')
-
-            total = df_selected_month['revenue'].sum()
-
-            if total == 0:
-                df_selected_month['pct_revenue'] = 0.0
-            else:
-                df_selected_month['pct_revenue'] = (100*df_selected_month['revenue'] / total ).round(2)
-            return df
-             
-        def format_number(num):
-            if num is None:
-                return "-" 
-            try:
-                num = float(num)
-            except (ValueError, TypeError):
-                return str(num)
-
-            if abs(num) >= 1_000_000_000:
-                return f"{num / 1_000_000_000:.1f}Bn"
-            elif abs(num) >= 1_000_000:
-                return f"{num / 1_000_000:.1f}M"
-            else:
-                return f"{num:,.0f}"   
-        def shorten_name(name, max_len=25):
-            return name if len(name) <= max_len else name[:max_len]+ '...'
-        
+
+    #figure cache keys of the panels
+    filters = {'period': selected_month, 'category': selected_categories}
+
+    #what the bar charts read from the selection, grouped once per key on the first
+    #figure miss. Products are grouped on the integer short_id, the names come from
+    #the product dimension
+    selection_table = planner.aggregate_plan(df_selected_month, {
+        'rev_product': ('short_id', {'name_rank':'min', 'revenue':'sum'}),
+        'sales_product': ('short_id', {'name_rank':'min', 'sales':'sum'}),
+        'contrib_rev': ('short_id', {'name_rank':'min', 'revenue':'sum'}),
+    }, names = {'short_id': lambda grouped: products.join_names(grouped, 'finallyfoundyou', 20)})
+
     total_rev, total_sales,avg_rating = st.columns(3)
     st.markdown("""<style>
         [data-testid="stMetricValue"] {
@@ -97,186 +84,236 @@ def main():
         }
         </style>
         """, unsafe_allow_html=True)
-    df_selected_month['short_name'] = df_selected_month['product_name'].apply(lambda x:shorten_name(x,20))
-    with total_rev:
+    with total_rev, timing.span('total_rev'):
             total_rev = calculate_revenue_metric(selected_month,selected_categories)
-            st.metric(label = f'Revenue in {selected_month} 2025', value = f'{format_number(total_rev)} Rupiah')
-    with total_sales:
+            st.metric(label = f'Revenue in {selected_month}', value = f'{views.format_number(total_rev)} Rupiah',
+                      delta = views.metric_delta(total_rev, sold_before, 'revenue', ' Rupiah'),
+                      help = views.SALES_HELP)
+    with total_sales, timing.span('total_sales'):
             total_sales = calculate_sales_metric(selected_month,selected_categories)
-            st.metric(label = f'Sales  in {selected_month} 2025',value = f'{format_number(total_sales)} units')
-    with avg_rating:
+            st.metric(label = f'Sales  in {selected_month}',value = f'{views.format_number(total_sales)} units',
+                      delta = views.metric_delta(total_sales, sold_before, 'sales', ' units'),
+                      help = views.SALES_HELP)
+    with avg_rating, timing.span('avg_rating'):
             avg_rating = calculate_product_rating(selected_month,selected_categories)
-            st.metric(f'Rating of  in {selected_month} 2025', value = round(avg_rating,2))    
+            st.metric(f'Rating of  in {selected_month}', value = round(avg_rating,2),
+                      delta = views.metric_delta(round(avg_rating,2), month_before, 'rating', digits = 2))    
 
     sales_histogram = st.columns(1)[0]
-    with sales_histogram:
-        df_sales_hist = df_selected_month.groupby('Price Range').agg(
-            {
-                'sales':'sum'
-            }
-        ).reset_index().sort_values(by = 'Price Range')
+    #the bin settings rerun only this panel
+    @timing.timed_fragment('finallyfoundyou')
+    def sales_histogram_panel():
+        #bins are a count or a width, from 0 to the highest price of the category or of every category
+        bins_col, width_col, scope_col = st.columns(3)
+        price_bins = bins_col.slider('Price bins', min_value = 5, max_value = 40, value = 10, step = 1)
+        bin_width = width_col.number_input('Bin width (Rp), 0 uses the count', min_value = 0, value = 0, step = 5000)
+        edge_scope = scope_col.radio('Bin edges', ['Per category', 'All categories'])
+        hist_filters = dict(filters, price_bins = price_bins, bin_width = bin_width, edge_scope = edge_scope)
+
+        def build_fig_hist():
+            #units sold per price of the selection, binned numerically
+            maxima = aggregates.price_max('finallyfoundyou', 'categories')
+            highest = maxima.get(selected_categories if edge_scope == 'Per category' else '', 0)
+            edges = aggregates.price_edges(highest, price_bins, bin_width)
+            df_sales_hist = aggregates.price_histogram(df_selected_month['product_price'], df_selected_month['sales'], edges)
         
-        fig_hist = px.bar(df_sales_hist, x = 'Price Range', y = 'sales', color = 'Price Range',
-                        color_discrete_sequence = px.colors.sequential.Plasma_r, text = 'Price Range')
-        fig_hist.update_traces(marker_line_width = 1, texttemplate = "%{y}") 
-        fig_hist.update_layout(
-            title = 'Sales per Price Range',
-            xaxis = dict(
-                title = 'Price Range(Rp)',
-                tickangle = 45,
-                tickfont = dict(size = 10),
-                rangeslider = dict(visible = False)
-            ),
-            yaxis = dict(title = 'Total Product Sold'),
-            width  =500,
-            height = 500,
-            margin = dict(
-                l = 40,
-                r = 40,
-                t = 40,
-                b = 40)
-        )
-        fig_hist.update_layout(bargap = 0.1)
-        st.plotly_chart(fig_hist, use_container_width = True)
+            fig_hist = px.bar(df_sales_hist, x = 'Price Range', y = 'sales', color = 'Price Range',
+                            color_discrete_sequence = px.colors.sequential.Plasma_r, text = 'Price Range')
+            fig_hist.update_traces(marker_line_width = 1, texttemplate = "%{y}") 
+            fig_hist.update_layout(
+                title = 'Sales per Price Range',
+                xaxis = dict(
+                    title = 'Price Range(Rp)',
+                    tickangle = 45,
+                    tickfont = dict(size = 10),
+                    rangeslider = dict(visible = False)
+                ),
+                yaxis = dict(title = 'Total Product Sold'),
+                width  =500,
+                height = 500,
+                margin = dict(
+                    l = 40,
+                    r = 40,
+                    t = 40,
+                    b = 40)
+            )
+            fig_hist.update_layout(bargap = 0.1)
+            return fig_hist
+
+        fig_hist = figures.cached_figure('finallyfoundyou', 'sales_histogram', hist_filters, version, build_fig_hist)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_hist, use_container_width = True)
+
+    with sales_histogram, timing.span('sales_histogram'):
+        sales_histogram_panel()
         
         #revenue based on product, sales based on product, contribution of each product revenue to whole company revenue
-    product_list = df_selected_month['product_name'].unique().tolist()
+    #the products of the selection in order of appearance, the pickers search among them
+    #through the index of every product name built once per dataset version
+    product_list = df_selected_month['product_id'].unique()
+    product_list = product_list[product_list >= 0]
+    last_product = int(product_list[-1]) if len(product_list) else None
 
     #filtered_df_1 = df_selected_month['product_name'==product_name_1]
     #filtered_df_2 = df_selected_month['product_name' == product_name_2]
 
     product_compare_timeline = st.columns(1)[0]
-    button1, button2 = st.columns(2) 
-    with product_compare_timeline:
+    #the products, metric and resolution only change the timeline, a fragment: picking
+    #them reruns this panel, not the metrics, histogram and product charts
+    @timing.timed_fragment('finallyfoundyou')
+    def product_compare_timeline_panel():
+        #the chart above the widgets that pick its products
+        chart = st.container()
+        button1, button2 = st.columns(2)
         with button1:
-            prod_a= st.selectbox('Choose a Product to Compare', product_list, index = len(product_list)-1)
+            _, prod_a = views.product_picker('Choose a Product to Compare', 'finallyfoundyou', 'search_product_a',
+                                             among = product_list, default = last_product)
             metric = st.radio('Choose a metric', options =['sales','revenue'],horizontal=True)
         with button2:
-            prod_b = st.selectbox('Choose other Product to Compare',product_list, index=len(product_list)-1)
-        #create a df that only take categories of product
-        df_categories = df[(df['categories'] == selected_categories) & df['product_name'].isin([prod_a,prod_b])]
-
-        fig_timeline = px.line(
-              df_categories,
-              x='scraping_date',
-              y=metric,
-              color =  'product_name',
-              color_discrete_sequence = px.colors.sequential.Inferno,
-              markers = True,
-              title = f'{metric.capitalize()} of {prod_a} vs {prod_b} in 2025',
-              labels = {'scraping_date':'Date', metric:metric.capitalize()}
-         )
+            _, prod_b = views.product_picker('Choose other Product to Compare', 'finallyfoundyou', 'search_product_b',
+                                             among = product_list, default = last_product)
+            resolution = st.select_slider('Points per product', options = [100, 250, 500, 1000, 2000], value = 500)
+        timeline_filters = dict(filters, product_a = prod_a, product_b = prod_b, metric = metric, resolution = resolution)
+        def build_fig_timeline():
+            #only the category's rows of both products, each reduced to about `resolution` points
+            df_categories = pd.concat([
+                downsample.product_series('finallyfoundyou', product, metric, resolution, group = selected_categories)
+                    .assign(product_name = product)
+                for product in dict.fromkeys([prod_a, prod_b])], ignore_index = True)
+
+            fig_timeline = px.line(
+                  df_categories,
+                  x='scraping_date',
+                  y=metric,
+                  color =  'product_name',
+                  color_discrete_sequence = px.colors.sequential.Inferno,
+                  markers = True,
+                  title = f'{metric.capitalize()} of {prod_a} vs {prod_b} in 2025',
+                  labels = {'scraping_date':'Date', metric:metric.capitalize()}
+             )
         
-        fig_timeline.update_layout(hovermode='x unified')
-        st.plotly_chart(fig_timeline, use_container_width=True)
+            fig_timeline.update_layout(hovermode='x unified')
+            return fig_timeline
+
+        fig_timeline = figures.cached_figure('finallyfoundyou', 'product_compare_timeline', timeline_filters, version, build_fig_timeline)
+        with chart, timing.span('plotly_chart'):
+            st.plotly_chart(fig_timeline, use_container_width=True)
+
+    with product_compare_timeline, timing.span('product_compare_timeline'):
+        product_compare_timeline_panel()
         
     rev_product, sales_product, contrib_rev = st.columns(3)
 
-    with rev_product:
-            df_rev_product = df_selected_month.groupby('short_name').agg(
-                  {
-                       'product_name':'min',
-                       'revenue':'sum'
-                  }
-             ).reset_index().sort_values(by='revenue', ascending = False)
-
-            fig_rev = px.bar(df_rev_product, x = 'short_name', 
-                             y = 'revenue',
-                             hover_data = {"product_name":True},
-                             color = 'revenue',
-                             labels = {"short_name":"Produk",
-                                       'revenue':'Revenue(Rp)'},
-                             color_continuous_scale = px.colors.sequential.Viridis, 
-                             text = 'revenue')
-            
-            fig_rev.update_traces(marker_line_width = 0, 
-                                  texttemplate = "%{y}", hovertemplate = 
-                                  '<br>%{customdata[0]}<br>' +
-                                  '%{y} Rupiah<br>')
+    with rev_product, timing.span('rev_product'):
+            def build_fig_rev():
+                df_rev_product = selection_table('rev_product').sort_values(by='revenue', ascending = False)
+
+                fig_rev = px.bar(df_rev_product, x = 'short_name', 
+                                 y = 'revenue',
+                                 hover_data = {"product_name":True},
+                                 color = 'revenue',
+                                 labels = {"short_name":"Produk",
+                                           'revenue':'Revenue(Rp)'},
+                                 color_continuous_scale = px.colors.sequential.Viridis, 
+                                 text = 'revenue')
             
-            fig_rev.update_layout(
-                 title = 'Revenue Based on Products(Rp)',
-                 xaxis = dict(
-                      title = 'Product Name',
-                      tickangle = 90,
-                      tickfont = dict(size = 10),
-                      rangeslider = dict(visible = True)),
-                      yaxis = dict(title='Revenue(Rp)'),
-                      width = 500,
-                      height = 500,
-                      margin = dict(
-                           l = 40,
-                           r = 40,
-                           b = 40,
-                           t = 40
-                      )
-                 )
+                fig_rev.update_traces(marker_line_width = 0, 
+                                      texttemplate = "%{y}", hovertemplate = 
+                                      '<br>%{customdata[0]}<br>' +
+                                      '%{y} Rupiah<br>')
             
-
-            st.plotly_chart(fig_rev)
-    with sales_product:
-        df_sales_product = df_selected_month.groupby('short_name').agg({
-                 'product_name':'min',
-                 'sales':'sum'
-            }).reset_index()
+                fig_rev.update_layout(
+                     title = 'Revenue Based on Products(Rp)',
+                     xaxis = dict(
+                          title = 'Product Name',
+                          tickangle = 90,
+                          tickfont = dict(size = 10),
+                          rangeslider = dict(visible = True)),
+                          yaxis = dict(title='Revenue(Rp)'),
+                          width = 500,
+                          height = 500,
+                          margin = dict(
+                               l = 40,
+                               r = 40,
+                               b = 40,
+                               t = 40
+                          )
+                     )
+                return fig_rev
+
+            fig_rev = figures.cached_figure('finallyfoundyou', 'rev_product', filters, version, build_fig_rev)
+            with timing.span('plotly_chart'):
+                st.plotly_chart(fig_rev)
+    with sales_product, timing.span('sales_product'):
+        def build_fig_sales_product():
+            df_sales_product = selection_table('sales_product')
         
-        fig_sales_product = px.bar(df_sales_product, x= 'short_name', y = 'sales',
-                                       hover_data = {'product_name':True},
-                                       color = 'sales',
-                                       labels = {"short_name":"Product Name","sales":"Sales"},
-                                       color_continuous_scale = px.colors.sequential.Turbo,
-                                       text = 'sales')
-        fig_sales_product.update_traces(marker_line_width = 0, texttemplate="%{y}",
-                                            hovertemplate = '<br>%{customdata[0]}<br>' + '%{y} units<br>')
-            
-        fig_sales_product.update_layout(
-                 title = 'Sales Based on Product in {selected_month} 2025',
-                 xaxis = dict(
-                      title = 'Product Name',
-                      tickangle = 90,
-                      tickfont = dict(size = 10),
-                      rangeslider = dict(visible = True)),
-                      yaxis = dict(title='Sales'),
-                      width = 500,
-                      height = 500,
-                      margin = dict(
-                           l = 40,
-                           r = 40,
-                           b = 40,
-                           t = 40
-                      )
-                 )
+            fig_sales_product = px.bar(df_sales_product, x= 'short_name', y = 'sales',
+                                           hover_data = {'product_name':True},
+                                           color = 'sales',
+                                           labels = {"short_name":"Product Name","sales":"Sales"},
+                                           color_continuous_scale = px.colors.sequential.Turbo,
+                                           text = 'sales')
+            fig_sales_product.update_traces(marker_line_width = 0, texttemplate="%{y}",
+                                                hovertemplate = '<br>%{customdata[0]}<br>' + '%{y} units<br>')
             
-        st.plotly_chart(fig_sales_product)
-
-
-        with contrib_rev:   
-            pct_contribute_df = calculate_pct_revenue(df_selected_month)
-
-            fig_pct_contribute = px.pie(pct_contribute_df, values = 'pct_revenue',
-                                             names = 'short_name',
-                                             hover_data = ({
-                                                  'product_name':True
-                                             }))
-            fig_pct_contribute.update_traces(marker_line_width = 0)
-            fig_pct_contribute.update_layout(
-                     title = 'Each Product Contribution to Company''s Revenue',
+            fig_sales_product.update_layout(
+                     title = f'Sales Based on Product in {selected_month}',
                      xaxis = dict(
                           title = 'Product Name',
                           tickangle = 90,
-                          tickfont = dict(size=12),
-                          rangeslider = dict(visible =True)),
-                          yaxis = dict(title = 'Revenue Percentage(%)'),
-                          width = 450,
-                          height = 450,
+                          tickfont = dict(size = 10),
+                          rangeslider = dict(visible = True)),
+                          yaxis = dict(title='Sales'),
+                          width = 500,
+                          height = 500,
                           margin = dict(
                                l = 40,
                                r = 40,
-                               t = 40,
-                               b = 40
-                          ))
-
-            st.plotly_chart(fig_pct_contribute)
+                               b = 40,
+                               t = 40
+                          )
+                     )
+            return fig_sales_product
+
+        fig_sales_product = figures.cached_figure('finallyfoundyou', 'sales_product', filters, version, build_fig_sales_product)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_sales_product)
+
+
+        with contrib_rev, timing.span('contrib_rev'):
+            def build_fig_pct_contribute():
+                pct_contribute_df = selection_table('contrib_rev')
+                total = pct_contribute_df['revenue'].sum()
+                pct_contribute_df['pct_revenue'] = (100*pct_contribute_df['revenue'] / total).round(2) if total else 0.0
+
+                fig_pct_contribute = px.pie(pct_contribute_df, values = 'pct_revenue',
+                                                 names = 'short_name',
+                                                 hover_data = ({
+                                                      'product_name':True
+                                                 }))
+                fig_pct_contribute.update_traces(marker_line_width = 0)
+                fig_pct_contribute.update_layout(
+                         title = 'Each Product Contribution to Company''s Revenue',
+                         xaxis = dict(
+                              title = 'Product Name',
+                              tickangle = 90,
+                              tickfont = dict(size=12),
+                              rangeslider = dict(visible =True)),
+                              yaxis = dict(title = 'Revenue Percentage(%)'),
+                              width = 450,
+                              height = 450,
+                              margin = dict(
+                                   l = 40,
+                                   r = 40,
+                                   t = 40,
+                                   b = 40
+                              ))
+                return fig_pct_contribute
+
+            fig_pct_contribute = figures.cached_figure('finallyfoundyou', 'contrib_rev', filters, version, build_fig_pct_contribute)
+            with timing.span('plotly_chart'):
+                st.plotly_chart(fig_pct_contribute)
 
 
 
@@ -1,11 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import seaborn as sns
-import matplotlib.pyplot as plt
-import regex as re
+from functools import partial
+from dashboard_core import aggregates, figures, ingest, planner, products, query, timing, velocity, views
+from dashboard_core.lazy import lazy_import
 
+px = lazy_import('plotly.express')
+
+@timing.timed_page('babycare')
 def main():
     st.set_page_config(
         page_title = 'Top 10 Baby Care Brands in Indonesia 2025',
@@ -16,39 +17,82 @@ def main():
 
     placeholder = st.empty()
 
-    #load the dataset
-    @st.cache_data
-    def load_data(url):
-        df = pd.read_csv(url, on_bad_lines = 'skip')
-        return df
-    
-    df = load_data('dataset/Clean Brand.csv')
+    if query.serves('babycare'):
+        #the history stays on disk, DuckDB answers the lookups below over the columnar cache
+        version = ingest.source_version('babycare')
+        brand_list = query.distinct('babycare', 'brand')
+        rollup = query.monthly_rollup('babycare', 'brand')
+        monthly_sales = query.monthly_sales('babycare', 'brand')
+        counter_slice = partial(query.cube_slice, 'babycare')
+        sold_slice = partial(query.sold_slice, 'babycare')
+        price_max = partial(query.price_max, 'babycare')
+    else:
+        #load the dataset, shared with every other page and session of the app
+        df, version = views.load_data('babycare')
+        brand_list = df['brand'].unique().tolist()
+        #new snapshots are merged into the process-wide cube instead of rebuilding it
+        cube = aggregates.load_aggregate('babycare', aggregates.build_brand_month_cube,
+                                         aggregates.merge_brand_month_cube)
+        rollup = aggregates.monthly_rollup('babycare', 'brand')
+        monthly_sales = velocity.monthly_sales('babycare', 'brand')
+        counter_slice = partial(aggregates.cube_slice, cube)
+        sold_slice = partial(aggregates.cube_slice, velocity.sold_cube('babycare'))
+        price_max = partial(aggregates.price_max, 'babycare')
+
+    #every (year, month) of the history, oldest first, as 'June 2025' labels
+    month_list = rollup['periods']
 
     with st.sidebar:
         st.title('ExpertCare Product Sales Performance')
 
-        #Create available month list for the visitor to choose
-        month_list = df['month'].unique().tolist()
-
         #button mechanisms
         selected_month = st.selectbox('Select a month', month_list, index=len(month_list)-1)
-        selected_brand = st.selectbox('Select a brand', df['brand'].unique().tolist())
-        df_selected_month = df[df.month == selected_month]
-        df_selected_brand = df[df.brand == selected_brand]
-
-    #Month order to be used in the data viz
-    filtered_df = df[(df['brand'] == selected_brand) & (df['month'] == selected_month)]
+        selected_brand = st.selectbox('Select a brand', brand_list)
+        #the rest of the products is rolled into one 'Others' bar
+        top_n = st.slider('Products shown per chart', min_value = 5, max_value = 100, value = 25, step = 5)
+
+    #figure cache keys of the panels
+    selection = {'brand': selected_brand, 'period': selected_month}
+    filters = dict(selection, top_n = top_n)
+
+    #KPI totals of the brand's selected period and of its period before, positional
+    #lookups in the (year, month) keyed monthly rollup. Units and revenue are what was
+    #really sold in the period, the growth of the cumulative sales counters, where the
+    #period has earlier snapshots to count from
+    current, month_before = aggregates.rollup_periods(rollup, selected_month, selected_brand)
+    sold, sold_before = velocity.sales_periods(monthly_sales, rollup, selected_month, selected_brand)
+    #the product panels read the cube on the same basis as the KPIs, so a product's
+    #share is a part of the brand's revenue
+    cube_slice = sold_slice if velocity.measured(sold) else counter_slice
+
+    #Per-product rollup of the selected brand and month, looked up from the cube,
+    #with the keys of the 25 and 20 character short names from the product dimension
+    products_df = cube_slice('products', selected_brand, selected_month)
+    product_ids = products_df['product_id'].to_numpy()
+    products_df['short_id'] = products.lookup(product_ids, 'babycare', 'short_id', 25)
+    products_df['short_id_20'] = products.lookup(product_ids, 'babycare', 'short_id', 20)
+    products_df['name_rank'] = products.lookup(product_ids, 'babycare', 'name_rank')
+
+    #what every product panel reads, grouped once per key on the first figure miss
+    product_table = planner.aggregate_plan(products_df, {
+        'top_sales_products': ('short_id', {'name_rank':'min', 'sales':'sum', 'revenue':'sum'}),
+        'revenue_top_products': ('short_id', {'name_rank':'min', 'revenue':'sum'}),
+        'pct_contribute': ('short_id_20', {'name_rank':'max', 'revenue':'sum'}),
+    }, names = {
+        'short_id': lambda grouped: products.join_names(grouped, 'babycare', 25),
+        'short_id_20': lambda grouped: products.join_names(grouped, 'babycare', 20),
+    })
 
     def calculate_sales_metric(month,brand):
-        sales = filtered_df['sales'].sum()
+        sales = sold['sales']
         return sales
     
     def calculate_revenue_metric(month,brand):
-        revenue = filtered_df['revenue'].sum()
+        revenue = sold['revenue']
         return revenue
     
     def calculate_total_unique_product(month,brand):
-        nunique_products = filtered_df['product_name'].nunique()
+        nunique_products = current['unique_products']
         return nunique_products
     
     def calculate_pct_revenue(df):
@@ -63,24 +107,6 @@ def main():
             df['pct_revenue'] = (100*df['revenue'] / total ).round(2)
         return df
     
-    def format_number(num):
-        if num is None:
-            return "-" 
-        try:
-            num = float(num)
-        except (ValueError, TypeError):
-            return str(num)
-
-        if abs(num) >= 1_000_000_000:
-            return f"{num / 1_000_000_000:.1f}Bn"
-        elif abs(num) >= 1_000_000:
-            return f"{num / 1_000_000:.1f}M"
-        else:
-            return f"{num:,.0f}" 
-    
-    def shorten_name(name, max_len=25):
-        return name if len(name) <= max_len else name[:max_len]+ '...'
-
     total_unique_product,amount_revenue_metric,amount_sales_metric, = st.columns(3)
     st.markdown("""<style>
     [data-testid="stMetricValue"] {
@@ -88,57 +114,68 @@ def main():
         }
         </style>
         """, unsafe_allow_html=True)
-    with amount_sales_metric:
+    with amount_sales_metric, timing.span('amount_sales_metric'):
         sales_brand_month = calculate_sales_metric(selected_month,selected_brand)
-        st.metric(label = f'Sales of {selected_brand} in {selected_month}', value = f'{format_number(sales_brand_month)} units')
+        st.metric(label = f'Sales of {selected_brand} in {selected_month}', value = f'{views.format_number(sales_brand_month)} units',
+                  delta = views.metric_delta(sales_brand_month, sold_before, 'sales', ' units'),
+                  help = views.SALES_HELP)
 
-    with amount_revenue_metric:
+    with amount_revenue_metric, timing.span('amount_revenue_metric'):
         revenue_brand_month = calculate_revenue_metric(selected_month,selected_brand)
-        st.metric(label = f'Revenue of {selected_brand} in {selected_month}', value = f'{format_number(revenue_brand_month)} Rupiah')
-    with total_unique_product:
+        st.metric(label = f'Revenue of {selected_brand} in {selected_month}', value = f'{views.format_number(revenue_brand_month)} Rupiah',
+                  delta = views.metric_delta(revenue_brand_month, sold_before, 'revenue', ' Rupiah'),
+                  help = views.SALES_HELP)
+    with total_unique_product, timing.span('total_unique_product'):
         amount_unique_product = calculate_total_unique_product(selected_month, selected_brand)
-        st.metric(label = f'Total Unique Products of {selected_brand} in {selected_month}', value = f'{amount_unique_product} unique products')
+        st.metric(label = f'Total Unique Products of {selected_brand} in {selected_month}', value = f'{amount_unique_product} unique products',
+                  delta = views.metric_delta(amount_unique_product, month_before, 'unique_products', ' products'))
 
     sales_histogram, top_sales_products = st.columns(2)
 
-   
-    def extract_min_price(price_str):
-    # Ambil semua angka dari string (hilangkan titik dan koma)
-        numbers = re.findall(r'\d[\d.]*', price_str.replace(',', '').replace('.', ''))
-        if numbers:
-            return int(numbers[0])
-        return 0
-    
-    filtered_df['min_price'] = filtered_df['Price Range'].apply(extract_min_price)
-    filtered_df = filtered_df.sort_values(by='min_price',ascending = True)
-    
-    with sales_histogram:
-        df_sales_hist = filtered_df.groupby('min_price').agg({
-            'Price Range':'min',
-            'sales':'sum'
-        }).reset_index()
-
-        fig_hist = px.bar(df_sales_hist, x = 'Price Range', y = 'sales', color = 'Price Range',
-        color_discrete_sequence = px.colors.sequential.Plasma_r, text = 'Price Range')
-        fig_hist.update_traces(marker_line_width = 0, texttemplate = "%{y}")
-        fig_hist.update_layout(
-            title = 'Sales per Price Range',
-            xaxis = dict(
-            title = 'Price Range(Rp)',
-            tickangle = 90,
-            tickfont = dict(size=12),
-            rangeslider = dict(visible = False)
-            ),
-            yaxis = dict(title = 'Total Product Sold'),
-            width = 500,
-            height = 500,
-            margin = dict(l =40,r =40, t=40, b = 40),)
-        fig_hist.update_layout(bargap = 0.1)
-        st.plotly_chart(fig_hist,use_container_width = True)
-        
-    with top_sales_products:
-        filtered_df['short_name'] = filtered_df['product_name'].apply(lambda x:shorten_name(x,25))
 
+    #the bin settings rerun only this panel
+    @timing.timed_fragment('babycare')
+    def sales_histogram_panel():
+        #bins are a count or a width, from 0 to the highest price of the brand or of every brand
+        bins_col, width_col, scope_col = st.columns(3)
+        price_bins = bins_col.slider('Price bins', min_value = 5, max_value = 40, value = 10, step = 1)
+        bin_width = width_col.number_input('Bin width (Rp), 0 uses the count', min_value = 0, value = 0, step = 5000)
+        edge_scope = scope_col.radio('Bin edges', ['Per brand', 'All brands'])
+        hist_filters = dict(selection, price_bins = price_bins, bin_width = bin_width, edge_scope = edge_scope)
+
+        def build_fig_hist():
+            #units sold per price of the brand and month, binned numerically
+            price_df = cube_slice('prices', selected_brand, selected_month)
+            highest = price_max('brand').get(selected_brand if edge_scope == 'Per brand' else '', 0)
+            edges = aggregates.price_edges(highest, price_bins, bin_width)
+            df_sales_hist = aggregates.price_histogram(price_df['product_price'], price_df['sales'], edges)
+
+            fig_hist = px.bar(df_sales_hist, x = 'Price Range', y = 'sales', color = 'Price Range',
+            color_discrete_sequence = px.colors.sequential.Plasma_r, text = 'Price Range')
+            fig_hist.update_traces(marker_line_width = 0, texttemplate = "%{y}")
+            fig_hist.update_layout(
+                title = 'Sales per Price Range',
+                xaxis = dict(
+                title = 'Price Range(Rp)',
+                tickangle = 90,
+                tickfont = dict(size=12),
+                rangeslider = dict(visible = False)
+                ),
+                yaxis = dict(title = 'Total Product Sold'),
+                width = 500,
+                height = 500,
+                margin = dict(l =40,r =40, t=40, b = 40),)
+            fig_hist.update_layout(bargap = 0.1)
+            return fig_hist
+
+        fig_hist = figures.cached_figure('babycare', 'sales_histogram', hist_filters, version, build_fig_hist)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_hist,use_container_width = True)
+
+    with sales_histogram, timing.span('sales_histogram'):
+        sales_histogram_panel()
+        
+    with top_sales_products, timing.span('top_sales_products'):
         st.markdown("""
             <style>
             [data-testid="stMetricValue"] {
@@ -147,79 +184,112 @@ def main():
             </style>
             """, unsafe_allow_html=True)
 
-        df_top_product = filtered_df.groupby('short_name').agg({\
-            'product_name':'min',
-            'sales':'sum',
-            'revenue':'sum'}).reset_index()
+        def build_fig_sales_product():
+            df_top_product = product_table('top_sales_products')
+            df_top_product = aggregates.top_n_with_others(df_top_product, 'sales', top_n)
         
-        fig_sales_product = px.bar(df_top_product,x='short_name',y='sales',title = 'Sales per Product',
-                                      color = 'sales', labels = 'product_name',color_continuous_scale = px.colors.sequential.Inferno,
-                                      text = 'sales')
-        fig_sales_product.update_traces(marker_line_width = 0, texttemplate='%{y}', hovertemplate =  df_top_product['product_name'])
-        fig_sales_product.update_layout(
-                title = 'Sales Based on Product',
-                xaxis = dict(
-                    title = 'Product Name',
-                    tickangle = 90,
-                    tickfont = dict(size = 12),
-                    rangeslider = dict(visible = True)),
-                    yaxis = dict(title='Sales'),
-                    width = 1200,
-                    height = 500,
-                    margin = dict(l = 40, r = 40, t = 40, b = 40))
-        st.plotly_chart(fig_sales_product)
+            fig_sales_product = px.bar(df_top_product,x='short_name',y='sales',title = 'Sales per Product',
+                                          color = 'sales', labels = 'product_name',color_continuous_scale = px.colors.sequential.Inferno,
+                                          custom_data = ['product_name'],
+                                          text = 'sales')
+            fig_sales_product.update_traces(marker_line_width = 0, texttemplate='%{y}', hovertemplate = '%{customdata[0]}')
+            fig_sales_product.update_layout(
+                    title = 'Sales Based on Product',
+                    xaxis = dict(
+                        title = 'Product Name',
+                        tickangle = 90,
+                        tickfont = dict(size = 12),
+                        rangeslider = dict(visible = True)),
+                        yaxis = dict(title='Sales'),
+                        width = 1200,
+                        height = 500,
+                        margin = dict(l = 40, r = 40, t = 40, b = 40))
+            return fig_sales_product
+
+        fig_sales_product = figures.cached_figure('babycare', 'top_sales_products', filters, version, build_fig_sales_product)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_sales_product)
 
         
     revenue_top_products, pct_contribute = st.columns(2)
-    with revenue_top_products:
-        df_rev_products = filtered_df.groupby('short_name').agg(
-                {   'product_name':'min',
-                    'revenue':'sum'}).reset_index()
+    with revenue_top_products, timing.span('revenue_top_products'):
+        def build_fig_rev_product():
+            df_rev_products = product_table('revenue_top_products')
+            df_rev_products = aggregates.top_n_with_others(df_rev_products, 'revenue', top_n)
             
-        fig_rev_product = px.bar(df_rev_products, x = 'short_name', y='revenue',color = 'revenue',labels ='Product Name',
-                                     color_continuous_scale = px.colors.sequential.Viridis,text = 'revenue')
-        fig_rev_product.update_traces(marker_line_width=0,texttemplate = "%{y}", hovertemplate = df_rev_products['product_name'])
-        fig_rev_product.update_layout(
-                title = 'Revenue Based on Products(Rp)',
-                xaxis = dict(
-                    title = 'Product Name',
-                    tickangle = 90,
-                    tickfont = dict(size = 12),
-                    rangeslider=dict(visible=True)),
-                    yaxis = dict(title ='Revenue(Rp)'),
-                    width = 500,
-                    height = 500,
-                    margin = dict(l=40,r=40,t=40,b=40),
-            )
-        st.plotly_chart(fig_rev_product)
+            fig_rev_product = px.bar(df_rev_products, x = 'short_name', y='revenue',color = 'revenue',labels ='Product Name',
+                                         color_continuous_scale = px.colors.sequential.Viridis,text = 'revenue',
+                                         custom_data = ['product_name'])
+            fig_rev_product.update_traces(marker_line_width=0,texttemplate = "%{y}", hovertemplate = '%{customdata[0]}')
+            fig_rev_product.update_layout(
+                    title = 'Revenue Based on Products(Rp)',
+                    xaxis = dict(
+                        title = 'Product Name',
+                        tickangle = 90,
+                        tickfont = dict(size = 12),
+                        rangeslider=dict(visible=True)),
+                        yaxis = dict(title ='Revenue(Rp)'),
+                        width = 500,
+                        height = 500,
+                        margin = dict(l=40,r=40,t=40,b=40),
+                )
+            return fig_rev_product
+
+        fig_rev_product = figures.cached_figure('babycare', 'revenue_top_products', filters, version, build_fig_rev_product)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_rev_product)
     
-    with pct_contribute:
-        filtered_df['short_name'] = filtered_df['product_name'].apply(lambda x:shorten_name(x,20))
-        pct_contribute_df = filtered_df.groupby('short_name').agg({
-            'product_name':'max',
-            'revenue':'sum',           
-        }).reset_index()
-
-        pct_contribute_df = calculate_pct_revenue(pct_contribute_df)
-
-        fig_pct_contribute = px.pie(pct_contribute_df, values = 'pct_revenue', 
-                                    names = 'short_name',
-                                    hover_data = ({'product_name':True}))
-
-        fig_pct_contribute.update_traces(marker_line_width=0)
-        fig_pct_contribute.update_layout(
-                title = 'Each Product Contribution to Company Revenue  ',
-                xaxis = dict(
-                    title = 'Product Name',
-                    tickangle = 90,
-                    tickfont = dict(size = 12),
-                    rangeslider=dict(visible=True)),
-                    yaxis = dict(title ='Revenue Percentage Contribution(Rp)'),
-                    width = 450,
-                    height = 450,
-                    margin = dict(l=40,r=40,t=40,b=40))
-                    
-        st.plotly_chart(fig_pct_contribute)
+    with pct_contribute, timing.span('pct_contribute'):
+        def build_fig_pct_contribute():
+            pct_contribute_df = calculate_pct_revenue(product_table('pct_contribute'))
+
+            fig_pct_contribute = px.pie(pct_contribute_df, values = 'pct_revenue', 
+                                        names = 'short_name',
+                                        hover_data = ({'product_name':True}))
+
+            fig_pct_contribute.update_traces(marker_line_width=0)
+            fig_pct_contribute.update_layout(
+                    title = 'Each Product Contribution to Company Revenue  ',
+                    xaxis = dict(
+                        title = 'Product Name',
+                        tickangle = 90,
+                        tickfont = dict(size = 12),
+                        rangeslider=dict(visible=True)),
+                        yaxis = dict(title ='Revenue Percentage Contribution(Rp)'),
+                        width = 450,
+                        height = 450,
+                        margin = dict(l=40,r=40,t=40,b=40))
+            return fig_pct_contribute
+
+        fig_pct_contribute = figures.cached_figure('babycare', 'pct_contribute', selection, version, build_fig_pct_contribute)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_pct_contribute)
+
+    #the brand's products of the month, best sellers first, searched through the index
+    #of every product name built once per dataset version
+    brand_products = products_df.sort_values('sales', ascending = False, kind = 'stable')['product_id'].to_numpy()
+
+    product_search = st.columns(1)[0]
+    #typing and picking rerun only this panel
+    @timing.timed_fragment('babycare')
+    def product_search_panel():
+        picker, product_sales, product_revenue, product_share = st.columns((3, 1, 1, 1))
+        with picker:
+            product_id, _ = views.product_picker('Find a product', 'babycare', 'search_product',
+                                                 among = brand_products)
+        if product_id is None:
+            return
+        row = products_df[products_df['product_id'].to_numpy() == product_id]
+        with product_sales:
+            st.metric(label = f'Sales in {selected_month}', value = f"{views.format_number(row['sales'].sum())} units")
+        with product_revenue:
+            st.metric(label = f'Revenue in {selected_month}', value = f"{views.format_number(row['revenue'].sum())} Rupiah")
+        with product_share:
+            share = row['revenue'].sum() / revenue_brand_month * 100 if revenue_brand_month else 0
+            st.metric(label = f'Share of {selected_brand} Revenue', value = f'{share:.2f}%')
+
+    with product_search, timing.span('product_search'):
+        product_search_panel()
              
 
             
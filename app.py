@@ -0,0 +1,19 @@
+#Every Nose dashboard as a page of one Streamlit app
+#The pages share one process, so each dataset, aggregate and cached figure is loaded
+#once for all of them instead of once per dashboard process:
+#
+#   streamlit run app.py
+import pandas as pd
+import streamlit as st
+
+#A selection, a column or a shallow copy of a shared frame is a view of it and never
+#writes into it, a page that assigns to one copies only the column it touches
+pd.set_option('mode.copy_on_write', True)
+
+pages = [
+    st.Page('all_babycare_dashboard.py', title = 'Baby Care Brands', url_path = 'babycare', default = True),
+    st.Page('babycare_market_share_dashboard.py', title = 'Baby Care Market Share', url_path = 'market-share'),
+    st.Page('expertcare_dasboard.py', title = 'ExpertCare', url_path = 'expertcare'),
+    st.Page('FinallyFoundYou/FinallyFoundYou_Dashboard.py', title = 'Finally Found You', url_path = 'finallyfoundyou'),
+]
+st.navigation(pages).run()
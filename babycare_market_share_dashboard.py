@@ -0,0 +1,134 @@
+#Market share of every baby care brand, month by month
+#all_babycare_dashboard.py shows one brand at a time, comparing brands meant clicking
+#through its selectbox and rerunning the page per brand. This page reads one pivot of
+#every brand's sales and revenue per month, built once per dataset version, so
+#comparing 3 brands or 30 costs the same column slices
+import pandas as pd
+import streamlit as st
+from dashboard_core import aggregates, figures, ingest, query, timing, velocity, views
+from dashboard_core.lazy import lazy_import
+
+px = lazy_import('plotly.express')
+
+
+@timing.timed_page('market_share')
+def main():
+    st.set_page_config(
+        page_title = 'Baby Care Market Share 2025',
+        layout = 'wide',
+        initial_sidebar_state = "expanded")
+
+    st.title('Baby Care Market Share (2025)')
+
+    #share and rank of every brand in every (year, month), shared by every session
+    version = ingest.source_version('babycare')
+    if query.serves('babycare'):
+        market = query.market_share('babycare')
+        monthly_sales = query.monthly_sales('babycare', 'brand')
+    else:
+        market = aggregates.market_share('babycare')
+        monthly_sales = velocity.monthly_sales('babycare', 'brand')
+    #the units and rupiah really sold where a brand's month has earlier snapshots to
+    #count from, the basis of the brand page's KPIs
+    market = velocity.market_share('babycare', market, monthly_sales)
+
+    with st.sidebar:
+        st.title('Baby Care Market Share')
+
+        measure = st.radio('Share of', ['revenue', 'sales'], horizontal = True)
+        #every period of the history oldest first, as 'June 2025' labels
+        month_list = market[measure].index.tolist()
+        selected_month = st.selectbox('Select a month', month_list, index = len(month_list)-1)
+        #brands ordered by their share of the selected month, the 10 largest by default
+        ranked = market[f'{measure}_share'].loc[selected_month].sort_values(ascending = False).index.tolist()
+        selected_brands = st.multiselect('Brands to compare', ranked, default = ranked[:10])
+
+    if not selected_brands:
+        st.info('Pick at least one brand to compare')
+        return
+
+    #widget values the figures depend on, part of the figure cache key
+    filters = {'measure': measure, 'period': selected_month, 'brands': tuple(selected_brands)}
+    #the trends span every month
+    trend_filters = {'measure': measure, 'brands': tuple(selected_brands)}
+    share = market[f'{measure}_share'][selected_brands]
+    rank = market[f'{measure}_rank'][selected_brands]
+    position = month_list.index(selected_month)
+    month_before = month_list[position - 1] if position > 0 else None
+
+    share_month, share_trend = st.columns(2)
+
+    with share_month, timing.span('share_month'):
+        def build_fig_share():
+            df_share = share.loc[selected_month].rename('share').reset_index().sort_values(by = 'share')
+            fig_share = px.bar(df_share, x = 'share', y = 'brand', orientation = 'h', color = 'share',
+                               color_continuous_scale = px.colors.sequential.Plasma_r, text = 'share')
+            fig_share.update_traces(marker_line_width = 0, texttemplate = "%{x:.1f}%")
+            fig_share.update_layout(
+                title = f'Share of {measure.capitalize()} in {selected_month}',
+                xaxis = dict(title = f'Share of {measure} (%)'),
+                yaxis = dict(title = 'Brand'),
+                width = 500,
+                height = 500,
+                margin = dict(l = 40, r = 40, t = 40, b = 40),)
+            return fig_share
+
+        fig_share = figures.cached_figure('babycare', 'market_share_month', filters, version, build_fig_share)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_share, use_container_width = True)
+
+    with share_trend, timing.span('share_trend'):
+        def build_fig_trend():
+            df_trend = share.reset_index().melt(id_vars = 'period', var_name = 'brand', value_name = 'share')
+            fig_trend = px.line(df_trend, x = 'period', y = 'share', color = 'brand', markers = True,
+                                labels = {'period': 'month'})
+            fig_trend.update_layout(
+                title = f'Share of {measure.capitalize()} per Month',
+                xaxis = dict(title = 'Month'),
+                yaxis = dict(title = f'Share of {measure} (%)'),
+                width = 500,
+                height = 500,
+                margin = dict(l = 40, r = 40, t = 40, b = 40),)
+            return fig_trend
+
+        fig_trend = figures.cached_figure('babycare', 'market_share_trend', trend_filters, version, build_fig_trend)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_trend, use_container_width = True)
+
+    rank_trend, rank_table = st.columns(2)
+
+    with rank_trend, timing.span('rank_trend'):
+        def build_fig_rank():
+            df_rank = rank.reset_index().melt(id_vars = 'period', var_name = 'brand', value_name = 'rank')
+            fig_rank = px.line(df_rank, x = 'period', y = 'rank', color = 'brand', markers = True,
+                               labels = {'period': 'month'})
+            fig_rank.update_layout(
+                title = f'Rank by {measure.capitalize()} per Month',
+                xaxis = dict(title = 'Month'),
+                #rank 1 on top
+                yaxis = dict(title = 'Rank', autorange = 'reversed', dtick = 1),
+                width = 500,
+                height = 500,
+                margin = dict(l = 40, r = 40, t = 40, b = 40),)
+            return fig_rank
+
+        fig_rank = figures.cached_figure('babycare', 'market_rank_trend', trend_filters, version, build_fig_rank)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig_rank, use_container_width = True)
+
+    with rank_table, timing.span('rank_table'):
+        #rows of the selected month, a positive change is a brand climbing since the month before
+        df_table = pd.DataFrame({
+            'Brand': selected_brands,
+            'Rank': rank.loc[selected_month].to_numpy(),
+            'Share (%)': share.loc[selected_month].round(2).to_numpy(),
+            measure.capitalize(): [views.format_number(value) for value in market[measure].loc[selected_month, selected_brands]],
+        })
+        if month_before is not None:
+            df_table['Rank change'] = rank.loc[month_before].to_numpy() - df_table['Rank'].to_numpy()
+        st.markdown(f'**Ranking in {selected_month}**' + (f' (change since {month_before})' if month_before else ''))
+        st.dataframe(df_table.sort_values(by = 'Rank'), hide_index = True, use_container_width = True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#Headless per-rerun latency benchmark for the dashboards
+#Every dashboard is run through Streamlit's AppTest harness (no browser, no server,
+#works offline on a CPU-only box) for every combination of its sidebar selections.
+#Each rerun reports its total wall time, the time spent before each chart/metric
+#was emitted (the panel) and the peak Python memory, as JSON so two commits can be
+#compared:
+#
+#   python benchmarks/rerun_latency.py --output before.json
+#   python benchmarks/rerun_latency.py --output after.json --compare before.json
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+#results persisted by the app or an earlier run would hide what a rerun computes,
+#NOSE_STORE=1 measures a store filled by python -m dashboard_core.warmup instead
+os.environ.setdefault('NOSE_STORE', '0')
+
+from dashboard_core import aggregates, downsample, figures, ingest, products, query, search, velocity, views
+
+DASHBOARDS = {
+    'all_babycare_dashboard': 'all_babycare_dashboard.py',
+    'babycare_market_share_dashboard': 'babycare_market_share_dashboard.py',
+    'expertcare_dasboard': 'expertcare_dasboard.py',
+    'FinallyFoundYou_Dashboard': os.path.join('FinallyFoundYou', 'FinallyFoundYou_Dashboard.py'),
+}
+
+#(element, title, timestamp) of every chart/metric emitted during the current rerun
+_emitted = []
+
+
+def _record(element, original, title):
+    def wrapper(*args, **kwargs):
+        result = original(*args, **kwargs)
+        _emitted.append((element, title(args, kwargs), time.perf_counter()))
+        return result
+    return wrapper
+
+
+def _chart_title(args, kwargs):
+    fig = args[0] if args else kwargs.get('figure_or_data')
+    try:
+        return fig.layout.title.text
+    except AttributeError:
+        return None
+
+
+def _metric_label(args, kwargs):
+    return args[0] if args else kwargs.get('label')
+
+
+def instrument():
+    #panels end where their chart or metric is emitted, patch the module level calls
+    st.plotly_chart = _record('plotly_chart', st.plotly_chart, _chart_title)
+    st.metric = _record('metric', st.metric, _metric_label)
+
+
+def clear_caches():
+    #every in-process cache, a rerun starts like the first one of a new process.
+    #The columnar cache and the result store on disk are kept
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    ingest._datasets.clear()
+    aggregates._aggregates.clear()
+    for cache in (velocity._monthly, velocity._cubes, velocity._shares, products._dimensions, search._indexes,
+                  query._registered, query._product_names, query._rollups, query._monthly_sales,
+                  query._market_shares, query._results):
+        cache.clear()
+    views.clear_page_frames()
+    figures.clear_figure_cache()
+    downsample.clear_series_cache()
+
+
+def timed_run(at):
+    _emitted.clear()
+    start = time.perf_counter()
+    at.run()
+    end = time.perf_counter()
+
+    panels = []
+    previous = start
+    for element, title, stamp in _emitted:
+        panels.append({'element': element, 'title': title, 'ms': round((stamp - previous) * 1000, 3)})
+        previous = stamp
+    panels.append({'element': 'tail', 'title': None, 'ms': round((end - previous) * 1000, 3)})
+    return round((end - start) * 1000, 3), panels
+
+
+def peak_memory_run(at):
+    tracemalloc.start()
+    try:
+        at.run()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_dashboard(script, repeat, timeout, cold):
+    at = AppTest.from_file(os.path.join(ROOT_DIR, script), default_timeout = timeout)
+    first_ms, _ = timed_run(at)
+    if at.exception:
+        raise RuntimeError(f'{script} failed: {at.exception[0].value}')
+
+    options = [selectbox.options for selectbox in at.sidebar.selectbox]
+    labels = [selectbox.label for selectbox in at.sidebar.selectbox]
+    states = []
+    for combo in itertools.product(*options):
+        for selectbox, value in zip(at.sidebar.selectbox, combo):
+            selectbox.set_value(value)
+        runs = []
+        for _ in range(repeat):
+            if cold:
+                clear_caches()
+            runs.append(timed_run(at))
+        if at.exception:
+            raise RuntimeError(f'{script} failed on {combo}: {at.exception[0].value}')
+        if cold:
+            clear_caches()
+        totals = [total for total, _ in runs]
+        states.append({
+            'selection': dict(zip(labels, combo)),
+            'total_ms': totals,
+            'median_ms': statistics.median(totals),
+            #panels of the fastest run, the least disturbed by the machine
+            'panels': min(runs, key = lambda run: run[0])[1],
+            'peak_kb': peak_memory_run(at),
+        })
+
+    medians = [state['median_ms'] for state in states]
+    return {
+        'script': script,
+        'first_run_ms': first_ms,
+        'states': states,
+        'summary': {
+            'states': len(states),
+            'median_ms': statistics.median(medians),
+            'max_ms': max(medians),
+            'peak_kb': max(state['peak_kb'] for state in states),
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd = ROOT_DIR,
+                              capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    for name, result in report['dashboards'].items():
+        before = baseline.get('dashboards', {}).get(name)
+        if before is None:
+            continue
+        old, new = before['summary']['median_ms'], result['summary']['median_ms']
+        change = (new - old) / old * 100 if old else 0.0
+        print(f'{name}: median {old:.1f} ms -> {new:.1f} ms ({change:+.1f}%), '
+              f"peak {before['summary']['peak_kb']} KB -> {result['summary']['peak_kb']} KB", file = sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Headless rerun latency benchmark for the dashboards')
+    parser.add_argument('dashboards', nargs = '*',
+                        help = f'dashboards to run, all of them by default ({", ".join(DASHBOARDS)})')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'timed reruns per sidebar selection')
+    parser.add_argument('--timeout', type = float, default = 120, help = 'seconds allowed per rerun')
+    parser.add_argument('--cold', action = 'store_true', help = 'clear every in-process cache (datasets, aggregates, page frames, product dimensions, '
+                        'search indexes, query results, figures) before every rerun')
+    parser.add_argument('--output', help = 'write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help = 'JSON report of an earlier run to compare against')
+    args = parser.parse_args()
+    unknown = sorted(set(args.dashboards) - set(DASHBOARDS))
+    if unknown:
+        parser.error(f'unknown dashboards: {", ".join(unknown)}')
+
+    instrument()
+    #the pages run with the pandas options app.py sets
+    pd.set_option('mode.copy_on_write', True)
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'streamlit': st.__version__,
+        'repeat': args.repeat,
+        'cold': args.cold,
+        'dashboards': {},
+    }
+    for name in args.dashboards or DASHBOARDS:
+        report['dashboards'][name] = bench_dashboard(DASHBOARDS[name], args.repeat, args.timeout, args.cold)
+    #ru_maxrss is in KB on Linux
+    report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2, default = str)
+    else:
+        json.dump(report, sys.stdout, indent = 2, default = str)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#Import time profile of the dashboards' startup
+#Every page is imported (not run) in a fresh interpreter under python -X importtime
+#and the self time of each imported module is attributed to its top level package,
+#so a new heavy import or one that stopped being lazy shows up by name. The median
+#of a few interpreters is reported as JSON, with --budget-ms failing the run when a
+#page takes longer than that to import:
+#
+#   python benchmarks/startup_imports.py --repeat 5 --top 10
+#   python benchmarks/startup_imports.py --budget-ms 1500
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    'all_babycare_dashboard': 'all_babycare_dashboard.py',
+    'babycare_market_share_dashboard': 'babycare_market_share_dashboard.py',
+    'expertcare_dasboard': 'expertcare_dasboard.py',
+    'FinallyFoundYou_Dashboard': os.path.join('FinallyFoundYou', 'FinallyFoundYou_Dashboard.py'),
+}
+
+#run_path with its default run_name, the pages' main() stays behind the __main__ guard
+_IMPORT_PAGE = 'import runpy, sys; sys.path.insert(0, {root!r}); runpy.run_path({path!r})'
+
+
+def parse_importtime(stderr):
+    #{module: self us} out of the -X importtime lines
+    #"import time: self [us] | cumulative | imported package"
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(self_us)
+    return modules
+
+
+def profile_once(script):
+    command = [sys.executable, '-X', 'importtime', '-c',
+               _IMPORT_PAGE.format(root = ROOT_DIR, path = os.path.join(ROOT_DIR, script))]
+    result = subprocess.run(command, cwd = ROOT_DIR, capture_output = True, text = True)
+    if result.returncode != 0:
+        raise RuntimeError(f'importing {script} failed:\n{result.stderr[-2000:]}')
+    return parse_importtime(result.stderr)
+
+
+def profile_page(script, repeat, top):
+    runs = [profile_once(script) for _ in range(repeat)]
+    packages = defaultdict(list)
+    for modules in runs:
+        per_package = defaultdict(int)
+        for name, self_us in modules.items():
+            per_package[name.split('.')[0]] += self_us
+        for package, us in per_package.items():
+            packages[package].append(us)
+
+    #median over the runs, a package missing from a run counts as 0 there
+    medians = {package: statistics.median(values + [0] * (repeat - len(values)))
+               for package, values in packages.items()}
+    ranked = sorted(medians.items(), key = lambda item: item[1], reverse = True)
+    totals = [sum(modules.values()) for modules in runs]
+    return {
+        'script': script,
+        'total_ms': round(statistics.median(totals) / 1000, 1),
+        'runs_ms': [round(total / 1000, 1) for total in totals],
+        'modules': len(runs[0]),
+        'packages': [{'package': package, 'ms': round(us / 1000, 1)} for package, us in ranked[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Import time profile of the dashboards')
+    parser.add_argument('pages', nargs = '*', help = f'pages to profile, all of them by default ({", ".join(PAGES)})')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'fresh interpreters per page')
+    parser.add_argument('--top', type = int, default = 15, help = 'packages listed per page')
+    parser.add_argument('--budget-ms', type = float, help = 'exit with status 1 when a page imports slower than this')
+    parser.add_argument('--output', help = 'write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    unknown = sorted(set(args.pages) - set(PAGES))
+    if unknown:
+        parser.error(f'unknown pages: {", ".join(unknown)}')
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'pages': {name: profile_page(PAGES[name], args.repeat, args.top) for name in args.pages or PAGES},
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2)
+    else:
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+
+    if args.budget_ms is not None:
+        over = {name: page['total_ms'] for name, page in report['pages'].items() if page['total_ms'] > args.budget_ms}
+        for name, total in over.items():
+            print(f'{name}: imports take {total} ms, budget {args.budget_ms} ms', file = sys.stderr)
+        if over:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
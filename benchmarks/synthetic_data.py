@@ -0,0 +1,205 @@
+#Synthetic datasets with the exact column layout of the bundled clean CSVs
+#The bundled files only have a few hundred rows, this writes millions so scaling
+#problems show up before production does. Every product gets a long-tailed
+#cumulative sold counter that grows from snapshot to snapshot and
+#revenue = price * sales holds on every row. Columns are built with numpy and
+#written by pyarrow's multithreaded CSV writer, 10M rows take seconds:
+#
+#   python benchmarks/synthetic_data.py --output-dir /tmp/scale --brands 200 --products 500 --snapshots 100
+#   NOSE_DATA_DIR=/tmp/scale streamlit run all_babycare_dashboard.py
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pandas writes the CSV instead, only much slower
+    pa = None
+    pa_csv = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from dashboard_core.datasets import DATASETS
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+ITEMS = ['Baby Wash', 'Shampoo', 'Lotion', 'Cream', 'Hair Lotion', 'Telon Oil', 'Cologne',
+         'Rash Cream', 'Sunscreen', 'Moisturizer', 'Toner', 'Serum', 'Wipes', 'Powder']
+DETAILS = ['Hypoallergenic', 'dengan Colloidal Oatmeal', 'Lembapkan Cegah Ruam', 'Kulit Sensitif Bayi dan Anak',
+           'Telon & Lavender', 'Tidur Nyenyak Imun Kuat', 'pH Balance', 'Bebas Kolik Napas Lega',
+           'Wangi Seharian', 'Refill Pouch', 'Paket Hemat', 'Original BPOM']
+SIZES = ['50g', '100ml', '150g', '200ml', '230ml', '400ml', '500ml', '30gr', '80gr']
+
+
+def product_names(rng, groups, per_group, long_names):
+    #one name per product, there are far fewer products than rows
+    n = len(groups) * per_group
+    items = rng.integers(len(ITEMS), size = n)
+    sizes = rng.integers(len(SIZES), size = n)
+    #distinct details per product: the first columns of a random permutation per row
+    details = np.argsort(rng.random((n, len(DETAILS))), axis = 1)[:, :6 if long_names else 2]
+    return [f"{groups[p // per_group]} {ITEMS[items[p]]} {SIZES[sizes[p]]} #{p % per_group} - "
+            + ' - '.join(DETAILS[d] for d in details[p]) for p in range(n)]
+
+
+def snapshot_dates(rng, snapshots, months, start):
+    #snapshots spread evenly over the months, scraped at a random minute of the hour
+    span = pd.Timedelta(days = 30.4 * months)
+    offsets = np.linspace(0, span.value, snapshots, endpoint = False).astype('int64')
+    dates = pd.Timestamp(start) + pd.to_timedelta(offsets)
+    return dates.floor('h') + pd.to_timedelta(rng.integers(0, 60, snapshots), unit = 'm')
+
+
+def sold_counters(rng, products, dates):
+    #cumulative counters of shape (snapshots, products): a lognormal starting count
+    #(most products sell little, a few sell hundreds of thousands) plus poisson
+    #sales at a per-product daily rate between snapshots
+    base = np.minimum(rng.lognormal(mean = 6.5, sigma = 2.0, size = products), 2_000_000).astype('int64')
+    daily = base / 365 * rng.gamma(2.0, 0.5, size = products)
+    gaps = np.diff(dates.to_numpy('datetime64[ns]')).astype('int64') / 86_400e9
+    increments = rng.poisson(np.outer(gaps, daily))
+    return np.vstack([base, base + np.cumsum(increments, axis = 0)])
+
+
+def price_labels(edges, style):
+    lo, hi = edges[:-1], edges[1:]
+    if style == 'interval':
+        return [f'({a:.1f}, {b:.1f}]' for a, b in zip(lo, hi)]
+    return [f'{int(a):,} - {int(b):,}' for a, b in zip(lo, hi)]
+
+
+def bin_codes(values, edges):
+    return np.clip(np.searchsorted(edges, values, side = 'left') - 1, 0, len(edges) - 2)
+
+
+def labelled(codes, labels):
+    #categorical rows from the label of each code, labels may repeat
+    label_codes, uniques = pd.factorize(np.asarray(labels, dtype = object))
+    return pd.Categorical.from_codes(label_codes[codes], uniques)
+
+
+def generate(name, brands, products, snapshots, months, start, seed):
+    rng = np.random.default_rng(seed)
+    groups = [f'Brand {i:03d}' for i in range(brands)]
+    if name == 'expertcare':
+        groups = [f'Category {i:03d}' for i in range(brands)]
+    elif name == 'finallyfoundyou':
+        groups = ['Moisturizer', 'Toner', 'Serum', 'Sunscreen'][:brands] + [f'Category {i:03d}' for i in range(4, brands)]
+
+    n_products = brands * products
+    names = product_names(rng, groups, products, long_names = name == 'expertcare')
+    group_of = np.repeat(np.arange(brands), products)
+    prices = (np.round(rng.lognormal(mean = 11.6, sigma = 0.6, size = n_products) / 100) * 100).astype('int64') + 900
+
+    dates = snapshot_dates(rng, snapshots, months, start)
+    sold = sold_counters(rng, n_products, dates).ravel()
+
+    #rows are snapshot-major like the scraper writes them: every product per snapshot
+    product = np.tile(np.arange(n_products), snapshots)
+    snapshot = np.repeat(np.arange(snapshots), n_products)
+    price = prices[product]
+    revenue = price * sold
+
+    columns = {'': np.arange(len(product))}
+    if name == 'babycare':
+        date_labels = [f'{d.month}/{d.day}/{d.year} {d.hour}:{d.minute:02d}' for d in dates]
+        #per-brand bins like 'Price Range', bins over every brand like 'Global Price Range'
+        brand_edges = [np.linspace(prices[group_of == g].min() * 0.95, prices[group_of == g].max(), 11).round()
+                       for g in range(brands)]
+        brand_bins = np.concatenate([bin_codes(prices[group_of == g], edges) + 10 * g
+                                     for g, edges in enumerate(brand_edges)])
+        brand_labels = [label for edges in brand_edges for label in price_labels(edges, 'range')]
+        global_edges = np.linspace(0, prices.max(), 23).round()
+        global_labels = price_labels(global_edges, 'range')
+        columns.update({
+            'product_name': labelled(product, names),
+            'product_price': price,
+            'sales': sold,
+            'scraping_date': labelled(snapshot, date_labels),
+            'revenue': revenue,
+            'month': labelled(snapshot, [MONTH_NAMES[d.month - 1] for d in dates]),
+            'year': dates.year.to_numpy()[snapshot],
+            'brand': labelled(group_of[product], groups),
+            'Price Range': labelled(brand_bins[product], brand_labels),
+            'Global Price Range': labelled(bin_codes(price, global_edges), global_labels),
+        })
+    elif name == 'expertcare':
+        date_labels = [f'{d.month}/{d.day}/{d.year} {d.hour}:{d.minute:02d}' for d in dates]
+        edges = np.linspace(0, prices.max(), 17)
+        bundling = np.array(['Bundle' in n or 'Paket' in n for n in names], dtype = 'int64')
+        columns.update({
+            'Nama Produk': labelled(product, names),
+            'Harga': price,
+            'Rating': np.round(rng.uniform(4.5, 5.0, n_products), 1)[product],
+            'Sales': sold,
+            'scraping_date': labelled(snapshot, date_labels),
+            'revenue': revenue,
+            'category': labelled(group_of[product], groups),
+            'bundling_or_not': bundling[product],
+            'price_bins': labelled(bin_codes(price, edges), price_labels(edges, 'interval')),
+        })
+    else:
+        date_labels = [d.strftime('%Y-%m-%d %H:%M:%S') for d in dates]
+        edges = np.linspace(prices.min() * 0.9, prices.max(), 11).round()
+        stock = rng.integers(0, 15_000, size = len(product))
+        columns.update({
+            'product_name': labelled(product, names),
+            'product_price': price,
+            'sales': sold,
+            'rating': np.round(rng.uniform(4.5, 5.0, n_products), 1)[product],
+            'categories': labelled(group_of[product], groups),
+            'stock': stock,
+            'scraping_date': labelled(snapshot, date_labels),
+            'month': dates.month.to_numpy()[snapshot],
+            'year': dates.year.to_numpy()[snapshot],
+            'revenue': revenue,
+            'Price Range': labelled(bin_codes(price, edges), price_labels(edges, 'range')),
+        })
+    return columns
+
+
+def write_csv(columns, path):
+    if pa_csv is None:
+        pd.DataFrame(columns).to_csv(path, index = False)
+        return
+    #straight to arrow, the labels are expanded from their codes by arrow's cast
+    arrays = {}
+    for name, values in columns.items():
+        if isinstance(values, pd.Categorical):
+            values = pa.DictionaryArray.from_arrays(values.codes, values.categories.to_numpy()).cast(pa.string())
+        arrays[name] = values
+    pa_csv.write_csv(pa.table(arrays), path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Write synthetic datasets with the clean CSV schemas')
+    parser.add_argument('datasets', nargs = '*', help = f'datasets to write, all by default ({", ".join(DATASETS)})')
+    parser.add_argument('--output-dir', required = True, help = 'directory for the CSVs, use it as NOSE_DATA_DIR')
+    parser.add_argument('--brands', type = int, default = 10, help = 'brands (categories for the single-brand datasets)')
+    parser.add_argument('--products', type = int, default = 100, help = 'products per brand')
+    parser.add_argument('--snapshots', type = int, default = 30, help = 'scrape snapshots')
+    parser.add_argument('--months', type = int, default = 6, help = 'months the snapshots are spread over')
+    parser.add_argument('--start', default = '2025-01-01', help = 'date of the first snapshot')
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+    unknown = sorted(set(args.datasets) - set(DATASETS))
+    if unknown:
+        parser.error(f'unknown datasets: {", ".join(unknown)}')
+
+    os.makedirs(args.output_dir, exist_ok = True)
+    for name in args.datasets or DATASETS:
+        started = time.perf_counter()
+        columns = generate(name, args.brands, args.products, args.snapshots, args.months, args.start, args.seed)
+        path = os.path.join(args.output_dir, os.path.basename(DATASETS[name]['path']))
+        write_csv(columns, path)
+        print(f"{name}: {len(columns['']):,} rows -> {path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
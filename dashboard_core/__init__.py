@@ -0,0 +1 @@
+#Shared data layer for the Nose dashboards (ingestion, caching and aggregates)
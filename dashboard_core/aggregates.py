@@ -0,0 +1,295 @@
+#Precomputed aggregates for the dashboards
+#Built once per dataset version so a sidebar change becomes an index lookup
+#instead of a boolean mask and groupby over the whole dataframe. When the scraper
+#appends snapshots only the new rows are aggregated and merged in
+import calendar
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core import ingest, store, timing
+from dashboard_core.datasets import get_dataset
+
+CUBE_KEYS = ['brand', 'period']
+ROLLUP_KEYS = ['year', 'month']
+ROLLUP_SUMS = ['sales', 'revenue', 'rating_sum', 'rating_count']
+
+#process-wide aggregates: (dataset, builder) -> {'generation', 'rows', 'value'}
+_aggregates = {}
+_lock = threading.Lock()
+
+
+def period_name(year, month):
+    #'June 2025', the label of a (year, month) period in the pages' month selection
+    return f'{calendar.month_name[month]} {year}'
+
+
+def period_key(label):
+    #(year, month) of a period label, sorts labels in time order
+    month, year = label.rsplit(' ', 1)
+    return int(year), list(calendar.month_name).index(month)
+
+
+def period_names(dates):
+    #Period label of every date as a categorical whose categories are in time order,
+    #missing dates stay missing. A month name alone is not a period once the history
+    #spans more than a year, every selection and rollup is keyed by these labels
+    periods = dates.dt.to_period('M')
+    categories = pd.PeriodIndex(periods.dropna().unique()).sort_values()
+    labels = [period_name(period.year, period.month) for period in categories]
+    codes = categories.get_indexer(periods)
+    return pd.Series(pd.Categorical.from_codes(codes, categories = labels), index = dates.index, name = 'period')
+
+
+def build_brand_month_cube(df):
+    #per-product and per-price rollups of every (brand, period) used by the charts,
+    #products are keyed by their integer product_id, products.product_dimension holds
+    #the names. The KPIs come from the monthly rollup
+    period = period_names(df['scraping_date'])
+    product_id = df['product_name'].cat.codes.astype('int32').rename('product_id')
+    products = df.groupby([df['brand'], period, product_id], observed = True).agg(
+        sales = ('sales', 'sum'),
+        revenue = ('revenue', 'sum')).sort_index()
+    #units sold per price, what the numeric price histograms are binned from
+    prices = df.groupby([df['brand'], period, df['product_price']], observed = True).agg(
+        sales = ('sales', 'sum')).sort_index()
+
+    return {'products': products, 'prices': prices}
+
+
+def merge_brand_month_cube(cube, delta):
+    #sums are additive
+    products = cube['products'].add(delta['products'], fill_value = 0).astype('int64').sort_index()
+    prices = cube['prices'].add(delta['prices'], fill_value = 0).astype('int64').sort_index()
+    return {'products': products, 'prices': prices}
+
+
+def market_share_pivots(totals):
+    #period x brand pivots of the (period, brand) totals: units and revenue, each
+    #brand's share of its period in percent and its rank (1 = largest) within it
+    pivot = totals.unstack('brand', fill_value = 0)
+    pivot = pivot.loc[sorted(pivot.index, key = period_key)]
+    market = {'totals': totals}
+    for measure in ('sales', 'revenue'):
+        values = pivot[measure]
+        market[measure] = values
+        market[f'{measure}_share'] = values.div(values.sum(axis = 1).replace(0, np.nan), axis = 0).fillna(0) * 100
+        market[f'{measure}_rank'] = values.rank(axis = 1, ascending = False, method = 'min').astype('int64')
+    return market
+
+
+def build_market_share(df):
+    #every brand's share of every period in one groupby, the market overview page
+    #reads slices of it whatever the number of brands compared
+    totals = df.groupby([period_names(df['scraping_date']), df['brand']], observed = True).agg(
+        sales = ('sales', 'sum'),
+        revenue = ('revenue', 'sum'))
+    return market_share_pivots(totals)
+
+
+def merge_market_share(market, delta):
+    totals = market['totals'].add(delta['totals'], fill_value = 0).astype('int64')
+    return market_share_pivots(totals)
+
+
+def market_share(name):
+    #the market share pivots of a dataset, built once per dataset version and process
+    return load_aggregate(name, build_market_share, merge_market_share)
+
+
+def cube_slice(cube, table, brand, period):
+    #rows of one rollup table for a (brand, period), with the keys dropped
+    frame = cube[table]
+    try:
+        return frame.loc[(brand, period)].reset_index()
+    except KeyError:
+        return frame.iloc[:0].reset_index(level = CUBE_KEYS, drop = True).reset_index()
+
+
+def _period_keys(df, group):
+    #(group,) year and month number of every row, the periods of the monthly rollup
+    dates = df['scraping_date']
+    keys = [dates.dt.year.rename('year'), dates.dt.month.rename('month')]
+    if group is not None:
+        keys.insert(0, df[group].astype(object).rename('group'))
+    return keys
+
+
+def monthly_rollup_view(totals, grouped):
+    #The lookup side of a monthly rollup: the periods as a list of rows ordered by
+    #(group,) year and month, {(group, period label): position} and the position of
+    #the period before each one (-1 for the first period of a group), so rollup_periods
+    #is a dict lookup and two list indexings however long the history gets, plus every
+    #period label in time order, the pages' month selection. totals holds the sums
+    #(and unique_products) indexed by (group,) year and month
+    periods = totals.sort_index().reset_index()
+    if not grouped:
+        periods.insert(0, 'group', None)
+    if 'rating_count' in periods:
+        count = periods['rating_count'].to_numpy()
+        periods['rating'] = np.where(count > 0, periods['rating_sum'] / np.maximum(count, 1), np.nan)
+    periods['period'] = [period_name(year, month) for year, month in zip(periods['year'], periods['month'])]
+    groups = periods['group'].tolist()
+    first = np.r_[True, [a != b for a, b in zip(groups[1:], groups[:-1])]] if groups else np.array([], dtype = bool)
+    previous = np.where(first, -1, np.arange(len(periods)) - 1).tolist()
+    positions = {(group, period): i for i, (group, period) in enumerate(zip(groups, periods['period']))}
+    labels = periods.drop_duplicates(['year', 'month']).sort_values(['year', 'month'])['period'].tolist()
+    return {'rows': periods.to_dict('records'), 'positions': positions, 'previous': previous, 'periods': labels}
+
+
+def _monthly_rollup(totals, products, grouped):
+    keys = list(totals.index.names)
+    unique_products = pd.Series(1, index = products).groupby(level = keys).size()
+    totals = totals.assign(unique_products = unique_products.reindex(totals.index, fill_value = 0))
+    return dict(monthly_rollup_view(totals, grouped), totals = totals[ROLLUP_SUMS], products = products)
+
+
+def build_monthly_rollup(df, name, group = None):
+    #KPI totals of a dataset per (year, month), per value of the group column when
+    #given: sales, revenue, mean rating and unique products. The sums and the distinct
+    #(period, product) keys are kept as well, appended rows are merged without a rescan
+    columns = get_dataset(name)['columns']
+    keys = _period_keys(df, group)
+    rating = df[columns['rating']] if 'rating' in columns else pd.Series(np.nan, index = df.index)
+    totals = pd.DataFrame({
+        'sales': df[columns['sales']],
+        'revenue': df[columns['revenue']],
+        'rating_sum': rating.fillna(0),
+        'rating_count': rating.notna().astype('int64'),
+    }).groupby(keys).sum()
+    product_id = df[columns['product']].cat.codes.astype('int32').rename('product_id')
+    products = pd.MultiIndex.from_arrays(keys + [product_id]).unique()
+    return _monthly_rollup(totals, products, group is not None)
+
+
+def merge_monthly_rollup(rollup, delta, name, group = None):
+    totals = rollup['totals'].add(delta['totals'], fill_value = 0).astype(
+        {'sales': 'int64', 'revenue': 'int64', 'rating_count': 'int64'})
+    products = rollup['products'].append(delta['products']).unique()
+    return _monthly_rollup(totals, products, group is not None)
+
+
+def monthly_rollup(name, group = None):
+    #the monthly rollup of a dataset, built once per dataset version and process
+    return load_aggregate(name, build_monthly_rollup, merge_monthly_rollup, name, group)
+
+
+def rollup_periods(rollup, period, group = None):
+    #(row, previous row) of the selected period label in a monthly rollup, a row is a
+    #dict of sales, revenue, rating, unique_products and the period. Both come from the
+    #same (year, month) keyed rollup. previous is None for the first period of the
+    #group, a selection without rows gets zeros (and no rating)
+    position = rollup['positions'].get((group, period))
+    if position is None:
+        return {'sales': 0, 'revenue': 0, 'rating': np.nan, 'unique_products': 0, 'period': period}, None
+    previous = rollup['previous'][position]
+    return rollup['rows'][position], (rollup['rows'][previous] if previous >= 0 else None)
+
+
+def _stored(name, build, generation, rows, args):
+    payload = store.load('aggregates', name, f'{generation}-{rows}', (build.__name__, args))
+    return None if payload is None else pickle.loads(payload)
+
+
+def _store(name, build, generation, rows, args, value):
+    #only the aggregates of the latest rows of a dataset are kept on disk
+    payload = pickle.dumps(value, protocol = pickle.HIGHEST_PROTOCOL)
+    store.save('aggregates', name, f'{generation}-{rows}', (build.__name__, args), payload)
+    store.prune('aggregates', name, f'{generation}-{rows}')
+
+
+def load_aggregate(name, build, merge, *args):
+    #Aggregate of a dataset kept up to date incrementally: rows appended by
+    #ingest.refresh_dataset are aggregated on their own and merged into the
+    #previous result, a full rebuild of the dataset rebuilds the aggregate.
+    #Extra args are passed to both build(df, *args) and merge(value, delta, *args),
+    #they are part of the cache key and must be hashable (a dataset name, a column).
+    #Results are persisted per (generation, rows), a new process starts from them
+    with timing.span('aggregate', build = build.__name__):
+        return _load_aggregate(name, build, merge, *args)
+
+
+def _load_aggregate(name, build, merge, *args):
+    state = ingest.refresh_dataset(name)
+    df = state['df']
+    generation = state['manifest']['generation']
+    with _lock:
+        key = (name, build.__name__, args)
+        entry = _aggregates.get(key)
+        if entry is None or entry['generation'] != generation or entry['rows'] > len(df):
+            value = _stored(name, build, generation, len(df), args)
+            if value is None:
+                value = build(df, *args)
+                _store(name, build, generation, len(df), args, value)
+            entry = {'generation': generation, 'rows': len(df), 'value': value}
+        elif entry['rows'] < len(df):
+            delta = build(df.iloc[entry['rows']:], *args)
+            entry = {'generation': generation, 'rows': len(df), 'value': merge(entry['value'], delta, *args)}
+            _store(name, build, generation, len(df), args, entry['value'])
+        _aggregates[key] = entry
+        return entry['value']
+
+
+def build_price_max(df, name, group = None):
+    #{group value: highest price} of a dataset, '' holding the highest price overall,
+    #the upper end of the price histograms' bin edges
+    price = df[get_dataset(name)['columns']['price']]
+    maxima = {} if price.empty else {'': int(price.max())}
+    if group is not None:
+        maxima.update((str(key), int(value)) for key, value in price.groupby(df[group], observed = True).max().items())
+    return maxima
+
+
+def merge_price_max(maxima, delta, name, group = None):
+    return {key: max(maxima.get(key, value), value) for key, value in {**maxima, **delta}.items()}
+
+
+def price_max(name, group = None):
+    return load_aggregate(name, build_price_max, merge_price_max, name, group)
+
+
+#the bin width is raised to keep a histogram under this many bins
+MAX_PRICE_BINS = 200
+
+
+def price_edges(highest, bins = 10, width = None):
+    #Equal width bin edges from 0 to highest: bins of them, or as many bins of width
+    #as it takes to reach highest when a width is given
+    highest = max(float(highest or 0), 1.0)
+    if width:
+        width = max(float(width), highest / MAX_PRICE_BINS)
+        return np.arange(0, np.ceil(highest / width) + 1) * width
+    return np.linspace(0, highest, int(bins) + 1)
+
+
+def price_histogram(prices, weights, edges, label = 'Price Range', weight = 'sales'):
+    #Weighted numeric histogram of prices over edges, one row per bin (empty bins
+    #included) with its bounds, its 'a - b' label and the summed weight
+    totals, _ = np.histogram(np.asarray(prices, dtype = float), bins = edges,
+                             weights = np.asarray(weights, dtype = float))
+    return pd.DataFrame({
+        'price_min': edges[:-1],
+        'price_max': edges[1:],
+        label: [f'{int(round(a)):,} - {int(round(b)):,}' for a, b in zip(edges[:-1], edges[1:])],
+        weight: totals.round().astype('int64'),
+    })
+
+
+def top_n_with_others(df, value, n, label = 'short_name', others = 'Others'):
+    #The n largest rows by value and one extra row summing the rest, so a chart
+    #never gets more than n + 1 bars whatever the catalog size. The leaders are
+    #picked with a partial selection (argpartition) rather than a full sort and
+    #keep their original order
+    if n is None or len(df) <= n:
+        return df
+    top = np.argpartition(-df[value].to_numpy(), n - 1)[:n]
+    keep = np.zeros(len(df), dtype = bool)
+    keep[top] = True
+
+    tail = df[~keep]
+    row = {col: f'{others} ({len(tail)} products)' for col in df.columns}
+    row[label] = others
+    row.update(tail.select_dtypes('number').sum())
+    return pd.concat([df[keep], pd.DataFrame([row], columns = df.columns)], ignore_index = True)
@@ -0,0 +1,380 @@
+#Cleaning pipeline from raw scraper dumps to the clean CSVs the dashboards read
+#The clean files used to come out of an offline step kept outside the project. Raw
+#dumps (CSV, optionally gzipped) carry the scraped fields as text: 'Rp145.900'
+#prices, '10RB+ terjual' sold counters, dates in whatever format the scraper wrote.
+#Each file is streamed in blocks of bounded size by a pool of worker processes: the
+#fields are normalized, revenue, month and year derived, and rows that cannot be used
+#are counted per reason instead of being dropped silently. The normalized rows of a
+#file are kept as an Arrow part keyed on its mtime and size, so a daily refresh only
+#cleans the new dumps. A last pass streams the parts in file order, labels the price
+#bins (their edges depend on the highest price over every file) and writes the CSV:
+#
+#   python -m dashboard_core.cleaning babycare dumps/babycare/ --workers 4
+import argparse
+import calendar
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core import ingest
+from dashboard_core.datasets import DATASETS, get_dataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # the pipeline streams through Arrow, the dashboards work without it
+    pa = None
+    pa_csv = None
+
+#bump whenever the normalization changes, cached parts of older rules are cleaned again
+CLEAN_VERSION = 1
+#bytes of raw CSV parsed at a time by a worker
+BLOCK_BYTES = 16 * 1024 * 1024
+#why a raw row was rejected, the first failing check wins
+REASONS = ['malformed', 'missing_product', 'bad_price', 'bad_sales', 'bad_date']
+SUFFIXES = {'rb': 1e3, 'k': 1e3, 'jt': 1e6}
+MONTH_NAMES = np.array(calendar.month_name, dtype = object)
+
+
+def parts_dir(name):
+    return os.path.join(ingest.CACHE_DIR, 'clean', name)
+
+
+def _distinct(values, parse, missing):
+    #parse() of the distinct values broadcast back to the rows, the scraped strings
+    #repeat a lot (prices, counters, one date per snapshot)
+    codes, uniques = pd.factorize(values)
+    parsed = np.asarray(parse(pd.Series(uniques, dtype = object)))
+    return np.append(parsed, np.array([missing], dtype = parsed.dtype))[codes]
+
+
+def _amounts(uniques):
+    text = (uniques.astype('string').str.lower()
+            .str.replace(r'rp|terjual|sold|\+|\s', '', regex = True)
+            .str.split('-').str[0])
+    parts = text.str.extract(r'^(\d+(?:[.,]\d+)*)(rb|k|jt)?$')
+    #a dot or comma followed by exactly three digits groups thousands, one left over
+    #is the decimal separator ('1,2RB' is 1200)
+    number = parts[0].str.replace(r'[.,](?=\d{3}(?:[.,]|$))', '', regex = True).str.replace(',', '.')
+    scale = parts[1].map(SUFFIXES).astype('float64').fillna(1.0)
+    return (pd.to_numeric(number, errors = 'coerce').astype('float64') * scale).to_numpy()
+
+
+def parse_amount(values):
+    #'Rp145.900', 'Rp 1,2JT', '10RB+ terjual', '145900' -> float, NaN when not a
+    #number. A price range 'Rp50.000 - Rp80.000' gives its lower bound
+    return _distinct(values, _amounts, np.nan)
+
+
+def parse_decimal(values):
+    #'4,9' or '4.9' -> 4.9
+    return _distinct(values, lambda uniques: pd.to_numeric(
+        uniques.astype('string').str.strip().str.replace(',', '.'), errors = 'coerce').astype('float64').to_numpy(), np.nan)
+
+
+def parse_date(values):
+    return _distinct(values, lambda uniques: pd.to_datetime(
+        uniques, errors = 'coerce', format = 'mixed').to_numpy('datetime64[ns]'), np.datetime64('NaT'))
+
+
+def parse_text(values):
+    return pd.Series(values, dtype = 'string').str.strip().fillna('').to_numpy(dtype = object)
+
+
+def _schema(spec):
+    #columns of the normalized parts, the clean columns without the price bins
+    clean = spec['clean']
+    types = {'text': pa.string(), 'amount': pa.int64(), 'decimal': pa.float64(), 'date': pa.timestamp('ns')}
+    fields = [(column, types[kind]) for column, kind in clean['raw'].items()]
+    fields.append((spec['columns']['revenue'], pa.int64()))
+    if clean['month']:
+        fields.append(('month', pa.string() if clean['month'] == 'name' else pa.int64()))
+    if clean['year']:
+        fields.append(('year', pa.int64()))
+    return pa.schema(fields)
+
+
+def normalize(raw, spec, rejected):
+    #clean rows of one raw block (every column read as text), rejected rows are
+    #counted per reason in rejected
+    clean, columns = spec['clean'], spec['columns']
+    n = len(raw)
+    out = {}
+    for column, kind in clean['raw'].items():
+        values = raw[column] if column in raw else pd.Series([None] * n, dtype = object)
+        if kind == 'text':
+            out[column] = parse_text(values)
+        elif kind == 'date':
+            out[column] = parse_date(values)
+        elif kind == 'amount':
+            out[column] = parse_amount(values)
+        else:
+            out[column] = parse_decimal(values)
+    df = pd.DataFrame(out)
+
+    price, sales = df[columns['price']], df[columns['sales']]
+    checks = [
+        ('missing_product', df[columns['product']] == ''),
+        ('bad_price', ~(price > 0)),
+        ('bad_sales', ~(sales >= 0)),
+        ('bad_date', df['scraping_date'].isna()),
+    ]
+    bad = np.zeros(n, dtype = bool)
+    for reason, failed in checks:
+        failed = failed.to_numpy() & ~bad
+        rejected[reason] += int(failed.sum())
+        bad |= failed
+    df = df[~bad].reset_index(drop = True)
+
+    for column, kind in clean['raw'].items():
+        if kind == 'amount':
+            #optional counters (stock, bundling) default to 0 like the clean files
+            df[column] = df[column].fillna(0).round().astype('int64')
+    df[columns['revenue']] = df[columns['price']] * df[columns['sales']]
+    if clean['month'] == 'name':
+        df['month'] = MONTH_NAMES[df['scraping_date'].dt.month.to_numpy()]
+    elif clean['month'] == 'number':
+        df['month'] = df['scraping_date'].dt.month.astype('int64')
+    if clean['year']:
+        df['year'] = df['scraping_date'].dt.year.astype('int64')
+    return df
+
+
+def _header(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding = 'utf-8', newline = '') as f:
+        return next(csv.reader(f), [])
+
+
+def _price_max(df, spec):
+    #{bin column: {group: highest price}}, the whole file is one group '' when the
+    #bins are not per group
+    price = df[spec['columns']['price']]
+    maxima = {}
+    for column, bins in spec['clean']['bins'].items():
+        if 'by' in bins:
+            maxima[column] = {str(key): int(value) for key, value in price.groupby(df[bins['by']]).max().items()}
+        else:
+            maxima[column] = {'': int(price.max())} if len(price) else {}
+    return maxima
+
+
+def _merge_max(total, maxima):
+    for column, groups in maxima.items():
+        merged = total.setdefault(column, {})
+        for group, value in groups.items():
+            merged[group] = max(merged.get(group, value), value)
+    return total
+
+
+def clean_file(name, path, part):
+    #Worker: normalize one raw dump into the Arrow part `part`, returns its stats
+    spec = get_dataset(name)
+    header = _header(path)
+    raw_columns = [column for column in spec['clean']['raw'] if column in header]
+    required = [spec['columns']['product'], spec['columns']['price'], spec['columns']['sales'], 'scraping_date']
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ValueError(f'{path}: raw dump without the column(s) {", ".join(missing)}')
+
+    rejected = dict.fromkeys(REASONS, 0)
+
+    def malformed(row):
+        rejected['malformed'] += 1
+        return 'skip'
+
+    reader = pa_csv.open_csv(
+        path,
+        read_options = pa_csv.ReadOptions(block_size = BLOCK_BYTES),
+        parse_options = pa_csv.ParseOptions(invalid_row_handler = malformed, newlines_in_values = True),
+        convert_options = pa_csv.ConvertOptions(column_types = {column: pa.string() for column in raw_columns},
+                                                include_columns = raw_columns))
+    schema = _schema(spec)
+    rows = clean = 0
+    maxima = {}
+    with pa.OSFile(f'{part}.tmp', 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in reader:
+            rows += batch.num_rows
+            df = normalize(batch.to_pandas(), spec, rejected)
+            clean += len(df)
+            _merge_max(maxima, _price_max(df, spec))
+            writer.write_table(pa.Table.from_pandas(df[schema.names], schema = schema, preserve_index = False))
+    os.replace(f'{part}.tmp', part)
+
+    stats = {'file': path, 'rows': rows + rejected['malformed'], 'clean': clean,
+             'rejected': rejected, 'max': maxima}
+    with open(f'{part}.json', 'w') as f:
+        json.dump(stats, f)
+    return stats
+
+
+def bin_edges(spec, maxima):
+    #{bin column: {group: edges}}, equal width bins from 0 to the highest price
+    return {column: {group: np.linspace(0, value, bins['bins'] + 1) for group, value in maxima.get(column, {}).items()}
+            for column, bins in spec['clean']['bins'].items()}
+
+
+def _labels(edges, style):
+    lo, hi = edges[:-1], edges[1:]
+    if style == 'interval':
+        return [f'({a:.1f}, {b:.1f}]' for a, b in zip(lo, hi)]
+    return [f'{int(round(a)):,} - {int(round(b)):,}' for a, b in zip(lo, hi)]
+
+
+def label_bins(df, spec, column, edges):
+    #label of the (lower, upper] bin of every row's price, vectorized over the groups:
+    #bins are equal width, so the bin is ceil(price / width) - 1
+    bins = spec['clean']['bins'][column]
+    count = bins['bins']
+    groups = list(edges)
+    group = pd.Categorical(df[bins['by']] if 'by' in bins else [''] * len(df), categories = groups).codes
+    width = np.array([edges[key][1] for key in groups] + [np.nan])[group]
+    code = np.clip(np.ceil(df[spec['columns']['price']].to_numpy() / width) - 1, 0, count - 1)
+    labels = np.array([label for key in groups for label in _labels(edges[key], bins['style'])] + [''], dtype = object)
+    position = np.where(group >= 0, group * count + np.nan_to_num(code).astype('int64'), len(labels) - 1)
+    return labels[position]
+
+
+def _dates(values, date_format):
+    #one strftime per snapshot instead of per row
+    return _distinct(pd.Series(values), lambda uniques: pd.to_datetime(uniques).dt.strftime(date_format).to_numpy(), '')
+
+
+def write_clean(name, parts, edges, output):
+    #stream the parts in order into the clean CSV, swapped in once complete
+    spec = get_dataset(name)
+    order = spec['clean']['order']
+    index = 0
+    writer = schema = None
+    with open(f'{output}.tmp', 'wb') as sink:
+        for part in parts:
+            with pa.memory_map(part) as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    df = reader.get_batch(i).to_pandas()
+                    for column in spec['clean']['bins']:
+                        df[column] = label_bins(df, spec, column, edges[column])
+                    df['scraping_date'] = _dates(df['scraping_date'], spec['date_format'])
+                    df.insert(0, '', np.arange(index, index + len(df), dtype = 'int64'))
+                    index += len(df)
+                    table = pa.Table.from_pandas(df[[''] + order], preserve_index = False)
+                    if writer is None:
+                        schema = table.schema
+                        writer = pa_csv.CSVWriter(sink, schema)
+                    writer.write_table(table.cast(schema))
+        if writer is not None:
+            writer.close()
+    os.replace(f'{output}.tmp', output)
+    return index
+
+
+def raw_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.csv')) + glob.glob(os.path.join(path, '*.csv.gz')))
+        else:
+            files.append(path)
+    return files
+
+
+def _part_path(name, path):
+    #the part of a raw file is reused while the file and the cleaning rules are unchanged
+    stat = os.stat(path)
+    key = f"{CLEAN_VERSION}|{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{get_dataset(name)['clean']!r}"
+    return os.path.join(parts_dir(name), hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + '.arrow')
+
+
+def _cached_stats(part):
+    try:
+        with open(f'{part}.json') as f:
+            return json.load(f) if os.path.exists(part) else None
+    except (OSError, ValueError):
+        return None
+
+
+def run(name, paths, workers = None, output = None):
+    #Clean the raw dumps of a dataset into its CSV (or output). Returns the report:
+    #per file rows, clean rows and rejected rows per reason, and the totals
+    if pa is None:
+        raise RuntimeError('pyarrow is required for the cleaning pipeline')
+    spec = get_dataset(name)
+    files = raw_files(paths)
+    if not files:
+        raise ValueError(f'no raw dumps in {", ".join(paths)}')
+    os.makedirs(parts_dir(name), exist_ok = True)
+    parts = [_part_path(name, path) for path in files]
+
+    stats = [_cached_stats(part) for part in parts]
+    todo = [i for i, entry in enumerate(stats) if entry is None]
+    if todo:
+        #spawned workers, one raw file each at a time
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers = workers, mp_context = context) as pool:
+            jobs = {i: pool.submit(clean_file, name, files[i], parts[i]) for i in todo}
+            for i, job in jobs.items():
+                stats[i] = dict(job.result(), cached = False)
+    for entry in stats:
+        entry.setdefault('cached', True)
+
+    maxima = {}
+    for entry in stats:
+        _merge_max(maxima, entry['max'])
+    output = output or spec['path']
+    rows = write_clean(name, parts, bin_edges(spec, maxima), output)
+
+    #parts of dumps that are gone or changed
+    for entry in os.listdir(parts_dir(name)):
+        if entry.split('.')[0] not in {os.path.basename(part).split('.')[0] for part in parts}:
+            os.remove(os.path.join(parts_dir(name), entry))
+
+    rejected = {reason: sum(entry['rejected'][reason] for entry in stats) for reason in REASONS}
+    return {'dataset': name, 'output': output, 'files': stats, 'clean': rows,
+            'rows': sum(entry['rows'] for entry in stats), 'rejected': rejected}
+
+
+def _describe(rejected):
+    found = [f'{reason} {count:,}' for reason, count in rejected.items() if count]
+    return ', '.join(found) or 'none'
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Clean raw scraper dumps into the CSV of a dataset')
+    parser.add_argument('dataset', choices = sorted(DATASETS))
+    parser.add_argument('raw', nargs = '+', help = 'raw dump files or directories of *.csv / *.csv.gz dumps')
+    parser.add_argument('--workers', type = int, default = os.cpu_count() or 1, help = 'worker processes')
+    parser.add_argument('--output', help = "write the clean CSV here instead of the dataset's path")
+    parser.add_argument('--report', help = 'write the JSON report of the run here')
+    parser.add_argument('--no-ingest', action = 'store_true', help = 'do not refresh the columnar cache afterwards')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = run(args.dataset, args.raw, args.workers, args.output)
+    for entry in report['files']:
+        state = 'cached' if entry['cached'] else 'cleaned'
+        print(f"{os.path.basename(entry['file'])}: {entry['rows']:,} rows, {entry['clean']:,} clean, "
+              f"rejected: {_describe(entry['rejected'])} ({state})")
+    print(f"{args.dataset}: {len(report['files'])} file(s), {report['clean']:,} of {report['rows']:,} rows clean, "
+          f"rejected: {_describe(report['rejected'])} -> {report['output']} in {time.perf_counter() - start:.1f}s")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent = 2)
+    if not args.no_ingest and args.output is None:
+        #the dashboards read the columnar cache, appended rows are all it parses
+        ingest.refresh_files(args.dataset)
+
+
+if __name__ == '__main__':
+    #run from the imported module, the spawned workers look clean_file up there
+    from dashboard_core.cleaning import main
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#Registry of the datasets used by the dashboards
+#Every dashboard refers to its data by name, the paths and column types live here
+#'columns' names the column playing each role so shared code works across the three
+#schemas. The product column is categorical (dictionary-encoded): rows carry an
+#integer code, see products.py.
+#'clean' describes how cleaning.py builds the CSV out of raw scraper dumps: the raw
+#fields and their kind, the derived month/year, the price bins (equal width from 0
+#to the highest price of the group, labelled 'a - b' or '(a, b]') and the column order
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+#point every dataset at another directory holding the same file names,
+#e.g. the output of benchmarks/synthetic_data.py
+DATA_DIR = os.environ.get('NOSE_DATA_DIR')
+
+
+def _data_path(*parts):
+    if DATA_DIR:
+        return os.path.join(DATA_DIR, parts[-1])
+    return os.path.join(ROOT_DIR, *parts)
+
+
+DATASETS = {
+    'babycare': {
+        'path': _data_path('dataset', 'Clean Brand.csv'),
+        'categorical': ['brand', 'month', 'product_name'],
+        'integer': ['product_price', 'sales', 'revenue', 'year'],
+        'date_format': '%m/%d/%Y %H:%M',
+        'columns': {'product': 'product_name', 'price': 'product_price', 'sales': 'sales',
+                    'revenue': 'revenue', 'group': 'brand'},
+        'clean': {
+            'raw': {'product_name': 'text', 'brand': 'text', 'product_price': 'amount',
+                    'sales': 'amount', 'scraping_date': 'date'},
+            'month': 'name',
+            'year': True,
+            'bins': {'Price Range': {'bins': 10, 'by': 'brand', 'style': 'range'},
+                     'Global Price Range': {'bins': 22, 'style': 'range'}},
+            'order': ['product_name', 'product_price', 'sales', 'scraping_date', 'revenue', 'month',
+                      'year', 'brand', 'Price Range', 'Global Price Range'],
+        },
+    },
+    'expertcare': {
+        'path': _data_path('dataset', 'Clean_Shopee_16625.csv'),
+        'categorical': ['category', 'Nama Produk'],
+        'integer': ['Harga', 'Sales', 'revenue', 'bundling_or_not'],
+        'date_format': '%m/%d/%Y %H:%M',
+        'columns': {'product': 'Nama Produk', 'price': 'Harga', 'sales': 'Sales',
+                    'revenue': 'revenue', 'group': 'category', 'rating': 'Rating'},
+        'clean': {
+            'raw': {'Nama Produk': 'text', 'category': 'text', 'Harga': 'amount', 'Sales': 'amount',
+                    'Rating': 'decimal', 'bundling_or_not': 'amount', 'scraping_date': 'date'},
+            'month': None,
+            'year': False,
+            'bins': {'price_bins': {'bins': 16, 'style': 'interval'}},
+            'order': ['Nama Produk', 'Harga', 'Rating', 'Sales', 'scraping_date', 'revenue', 'category',
+                      'bundling_or_not', 'price_bins'],
+        },
+    },
+    'finallyfoundyou': {
+        'path': _data_path('FinallyFoundYou', 'CleanData_FinallyFoundYou_30625.csv'),
+        'categorical': ['categories', 'product_name'],
+        'integer': ['product_price', 'sales', 'stock', 'month', 'year', 'revenue'],
+        'date_format': '%Y-%m-%d %H:%M:%S',
+        'columns': {'product': 'product_name', 'price': 'product_price', 'sales': 'sales',
+                    'revenue': 'revenue', 'group': 'categories', 'rating': 'rating'},
+        'clean': {
+            'raw': {'product_name': 'text', 'categories': 'text', 'product_price': 'amount', 'sales': 'amount',
+                    'rating': 'decimal', 'stock': 'amount', 'scraping_date': 'date'},
+            'month': 'number',
+            'year': True,
+            'bins': {'Price Range': {'bins': 10, 'style': 'range'}},
+            'order': ['product_name', 'product_price', 'sales', 'rating', 'categories', 'stock',
+                      'scraping_date', 'month', 'year', 'revenue', 'Price Range'],
+        },
+    },
+}
+
+
+def get_dataset(name):
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise KeyError(f'Unknown dataset {name!r}, expected one of {sorted(DATASETS)}') from None
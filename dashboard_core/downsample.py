@@ -0,0 +1,65 @@
+#Point reduction for long time series before they are sent to the browser
+#A product scraped every hour for months has thousands of points per trace and plotly
+#ships and draws every one of them. Each trace is cut into equal-count buckets and
+#only the lowest and the highest point of every bucket are kept (plus both ends), so
+#spikes and dips survive while the trace shrinks to the requested resolution
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from dashboard_core import ingest
+from dashboard_core.datasets import get_dataset
+
+#reduced series kept in memory, each one is at most a few thousand rows
+MAX_SERIES = 512
+
+_series = OrderedDict()
+_lock = threading.Lock()
+
+
+def minmax_indices(y, points):
+    #Positions of the rows to keep out of y (ordered by x), about `points` of them.
+    #One lexsort by (bucket, value) puts the minimum of every bucket at its start
+    #and the maximum at its end, no python loop over the buckets
+    n = len(y)
+    if points is None or n <= points:
+        return np.arange(n)
+    buckets = max(points // 2, 1)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate([order[starts], order[ends], [0, n - 1]]))
+
+
+def product_series(name, product, metric, points, group = None):
+    #(scraping_date, metric) of one product in date order, reduced to about `points`
+    #rows. Cached per (dataset, group, product, metric, points, source version),
+    #the returned frame is shared, treat it as read-only
+    key = (name, group, product, metric, points, ingest.source_version(name))
+    with _lock:
+        series = _series.get(key)
+        if series is not None:
+            _series.move_to_end(key)
+            return series
+
+    columns = get_dataset(name)['columns']
+    df = ingest.load_dataset(name)
+    mask = df[columns['product']] == product
+    if group is not None:
+        mask &= df[columns['group']] == group
+    series = df.loc[mask & df['scraping_date'].notna(), ['scraping_date', metric]]
+    series = series.sort_values('scraping_date', kind = 'stable')
+    series = series.iloc[minmax_indices(series[metric].to_numpy(), points)].reset_index(drop = True)
+
+    with _lock:
+        _series[key] = series
+        while len(_series) > MAX_SERIES:
+            _series.popitem(last = False)
+    return series
+
+
+def clear_series_cache():
+    with _lock:
+        _series.clear()
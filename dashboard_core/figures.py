@@ -0,0 +1,93 @@
+#Process-wide LRU cache of built Plotly figures
+#Every widget change reruns the whole script, building a figure with plotly express
+#is one of the slowest steps, so finished figures are kept as JSON keyed by
+#(dashboard, panel, filter values, dataset version) and shared by every session.
+#They are written through to the persistent store as well, a new process (or one
+#started after `python -m dashboard_core.warmup`) reads them back instead of building
+import os
+import threading
+from collections import OrderedDict
+
+from dashboard_core import store, timing
+from dashboard_core.lazy import lazy_import
+
+#needed by the first figure a page shows, not while the page is imported
+pio = lazy_import('plotly.io')
+
+#upper bound on the serialized figures kept in memory
+MAX_BYTES = int(float(os.environ.get('NOSE_FIGURE_CACHE_MB', 64)) * 1024 * 1024)
+
+_figures = OrderedDict()
+_stats = {'hits': 0, 'stored': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+#(dashboard, version) whose older entries this process removed from the store
+_pruned = set()
+_lock = threading.Lock()
+
+
+def figure_key(dashboard, panel, filters, version):
+    return (dashboard, panel, tuple(sorted(filters.items())), version)
+
+
+def cached_figure(dashboard, panel, filters, version, build):
+    #build() is only called on a miss. filters holds every widget value the panel
+    #uses and only those: a panel is rebuilt when one of its own values changes, the
+    #others reuse their figure
+    with timing.span('figure', panel = panel) as span:
+        return _cached_figure(dashboard, panel, filters, version, build, span)
+
+
+def _cached_figure(dashboard, panel, filters, version, build, span):
+    key = figure_key(dashboard, panel, filters, version)
+    source = 'memory'
+    with _lock:
+        payload = _figures.get(key)
+        if payload is not None:
+            _figures.move_to_end(key)
+            _stats['hits'] += 1
+
+    if payload is None:
+        stored = store.load('figures', dashboard, version, key)
+        if stored is not None:
+            payload = stored.decode('utf-8')
+            source = 'store'
+        else:
+            source = 'built'
+            with timing.span('build'):
+                payload = build().to_json()
+            store.save('figures', dashboard, version, key, payload.encode('utf-8'))
+            _prune_store(dashboard, version)
+        with _lock:
+            _stats['stored' if stored is not None else 'misses'] += 1
+            if key not in _figures:
+                _figures[key] = payload
+                _stats['bytes'] += len(payload)
+            #least recently used figures go first, the newest one always stays
+            while _stats['bytes'] > MAX_BYTES and len(_figures) > 1:
+                _, evicted = _figures.popitem(last = False)
+                _stats['bytes'] -= len(evicted)
+                _stats['evictions'] += 1
+
+    span.record(source = source, bytes = len(payload))
+    with timing.span('from_json'):
+        return pio.from_json(payload)
+
+
+def _prune_store(dashboard, version):
+    #the first figure a process saves for a dataset version removes the ones of every
+    #older version from the store, like the aggregates do, they are never read again
+    with _lock:
+        if (dashboard, version) in _pruned:
+            return
+        _pruned.add((dashboard, version))
+    store.prune('figures', dashboard, version)
+
+
+def figure_cache_stats():
+    with _lock:
+        return dict(_stats, figures = len(_figures))
+
+
+def clear_figure_cache():
+    with _lock:
+        _figures.clear()
+        _stats.update(hits = 0, stored = 0, misses = 0, evictions = 0, bytes = 0)
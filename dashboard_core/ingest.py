@@ -0,0 +1,383 @@
+#Columnar ingestion of the dashboard datasets
+#The clean CSVs are parsed into typed Arrow (feather) parts which are memory-mapped
+#on later loads. The scraper only appends new snapshots to the CSVs, so a refresh
+#parses just the complete lines added since the last load and stores them as one
+#more part. The whole CSV is reparsed only when its already ingested part was
+#rewritten.
+#The cache is shared by every process of the app: one process parses a change while
+#the others wait on a lock file and then read its parts instead of parsing again.
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from dashboard_core.datasets import ROOT_DIR, DATASETS, get_dataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, without it the CSV is parsed in memory only
+    pa = None
+    feather = None
+
+try:
+    import fcntl
+except ImportError:  # no cross-process lock on Windows, each process parses on its own
+    fcntl = None
+
+CACHE_DIR = os.environ.get('NOSE_CACHE_DIR', os.path.join(ROOT_DIR, '.cache'))
+#bump whenever _prepare changes the columns it produces, so old caches are rebuilt
+SCHEMA_VERSION = 6
+#bytes before the ingested offset that must be unchanged for an append-only refresh
+TAIL_BYTES = 4096
+#past this many parts the cache is compacted back into a single part
+MAX_PARTS = 32
+
+#in-process state per dataset: {'df': frame, 'manifest': dict}
+_datasets = {}
+_lock = threading.Lock()
+
+
+def cache_dir(name):
+    return os.path.join(CACHE_DIR, name)
+
+
+def _invalidation_mark(name):
+    try:
+        with open(os.path.join(cache_dir(name), 'invalidated')) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def source_version(name):
+    #mtime + size of the source CSV, cheap to compute on every rerun, plus the mark
+    #left by the last invalidate(name). Everything cached per version (page frames,
+    #figures, series) misses as soon as either changes
+    stat = os.stat(get_dataset(name)['path'])
+    version = f'{stat.st_mtime_ns}-{stat.st_size}'
+    mark = _invalidation_mark(name)
+    return version if mark is None else f'{version}-{mark}'
+
+
+@contextmanager
+def _file_lock(name):
+    #serializes the rebuilds of a dataset across the processes sharing its cache
+    if fcntl is None or pa is None:
+        yield
+        return
+    directory = cache_dir(name)
+    os.makedirs(directory, exist_ok = True)
+    with open(os.path.join(directory, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _prepare(df, spec):
+    #typed columns shared by the full and the incremental parse
+    df = df.reset_index(drop = True)
+    for col in spec['categorical']:
+        df[col] = df[col].astype('category')
+    for col in spec['integer']:
+        df[col] = pd.to_numeric(df[col], errors = 'coerce').fillna(0).astype('int64')
+    df['scraping_date'] = pd.to_datetime(df['scraping_date'], format = spec['date_format'], errors = 'coerce')
+    return df
+
+
+def _read_csv(data, spec):
+    df = pd.read_csv(io.BytesIO(data), index_col = 0, on_bad_lines = 'skip')
+    return _prepare(df, spec)
+
+
+def parse_csv(name):
+    spec = get_dataset(name)
+    with open(spec['path'], 'rb') as f:
+        return _read_csv(f.read(), spec)
+
+
+def _tail_hash(data):
+    return hashlib.sha1(data[-TAIL_BYTES:]).hexdigest()
+
+
+def _complete_lines(data):
+    #data up to its last newline: a line the scraper is still writing is left for
+    #the next refresh instead of being parsed as a row of missing values
+    return data[:data.rfind(b'\n') + 1]
+
+
+def _append_rows(df, new_rows, spec):
+    merged = pd.concat([df, new_rows], ignore_index = True)
+    #concat falls back to object when the categories differ, keep them categorical
+    for col in spec['categorical']:
+        merged[col] = union_categoricals([df[col].array, new_rows[col].array], ignore_order = True)
+    return merged
+
+
+def _read_manifest(name):
+    try:
+        with open(os.path.join(cache_dir(name), 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('schema') != SCHEMA_VERSION:
+        return None
+    return manifest
+
+
+def _to_table(df):
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    #one dictionary index type in every part, whatever its number of categories,
+    #so the parts always concatenate and scan as one dataset
+    fields = [field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+              if pa.types.is_dictionary(field.type) else field for field in table.schema]
+    return table.cast(pa.schema(fields, metadata = table.schema.metadata))
+
+
+def _write_part(name, manifest, df):
+    #df is a DataFrame, or an Arrow table when compacting parts read from disk
+    part = f"{manifest['generation']}-{len(manifest['parts']):05d}.arrow"
+    path = os.path.join(cache_dir(name), part)
+    table = df if isinstance(df, pa.Table) else _to_table(df)
+    feather.write_feather(table, f'{path}.tmp', compression = 'uncompressed')
+    os.replace(f'{path}.tmp', path)
+    manifest['parts'].append(part)
+
+
+def _write_manifest(name, manifest):
+    path = os.path.join(cache_dir(name), 'manifest.json')
+    with open(f'{path}.{os.getpid()}.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(f'{path}.{os.getpid()}.tmp', path)
+
+
+def _save(name, manifest, df = None, new_rows = None):
+    #Persist a full frame (df) as a single part, or append new_rows as one more part.
+    #The manifest is swapped in last so readers never see a half written cache
+    if pa is None:
+        return
+    directory = cache_dir(name)
+    os.makedirs(directory, exist_ok = True)
+    if df is not None:
+        manifest['parts'] = []
+        _write_part(name, manifest, df)
+    else:
+        _write_part(name, manifest, new_rows)
+    _write_manifest(name, manifest)
+
+    #parts left over from older generations or compactions
+    for entry in os.listdir(directory):
+        if entry.endswith('.arrow') and entry not in manifest['parts']:
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+
+
+def _read_parts(name, parts):
+    #uncompressed feather is memory-mapped, nothing is read until it is used
+    tables = [feather.read_table(os.path.join(cache_dir(name), part), memory_map = True)
+              for part in parts]
+    return pa.concat_tables(tables)
+
+
+def _load_saved(name):
+    if pa is None:
+        return None
+    manifest = _read_manifest(name)
+    if manifest is None:
+        return None
+    try:
+        table = _read_parts(name, manifest['parts'])
+    except (OSError, pa.ArrowInvalid):
+        return None
+    #numeric columns of the memory-mapped parts are not copied
+    df = table.to_pandas(split_blocks = True)
+    return {'df': df, 'manifest': manifest}
+
+
+def _full_build(name):
+    spec = get_dataset(name)
+    version = source_version(name)
+    with open(spec['path'], 'rb') as f:
+        data = _complete_lines(f.read())
+    df = _read_csv(data, spec)
+
+    manifest = {
+        'schema': SCHEMA_VERSION,
+        'generation': uuid.uuid4().hex[:12],
+        'source_version': version,
+        'invalidated': _invalidation_mark(name),
+        'header': data.split(b'\n', 1)[0].decode('utf-8') + '\n',
+        'offset': len(data),
+        'tail_hash': _tail_hash(data),
+        'parts': [],
+    }
+    _save(name, manifest, df = df)
+    return {'df': df, 'manifest': manifest}
+
+
+def _append_build(name, state):
+    #Parse only what the scraper appended after the ingested offset. state['df'] is
+    #None when only the files are kept up to date (refresh_files).
+    #Returns None when the CSV was rewritten and needs a full rebuild
+    spec = get_dataset(name)
+    manifest = dict(state['manifest'])
+    version = source_version(name)
+    offset = manifest['offset']
+    with open(spec['path'], 'rb') as f:
+        start = max(offset - TAIL_BYTES, 0)
+        f.seek(start)
+        tail = f.read(offset - start)
+        chunk = _complete_lines(f.read())
+    if len(tail) != offset - start or _tail_hash(tail) != manifest['tail_hash']:
+        return None
+
+    manifest['source_version'] = version
+    if not chunk.strip():
+        #nothing appended, the other processes still learn this version is ingested
+        if pa is not None:
+            _write_manifest(name, manifest)
+        return {'df': state['df'], 'manifest': manifest}
+
+    #every byte past the offset is new, rows of a snapshot written across two
+    #refreshes are all kept
+    new_rows = _read_csv(manifest['header'].encode('utf-8') + chunk, spec)
+
+    manifest['offset'] = offset + len(chunk)
+    manifest['tail_hash'] = _tail_hash(tail + chunk)
+    manifest['parts'] = list(manifest['parts'])
+    if new_rows.empty:
+        if pa is not None:
+            _write_manifest(name, manifest)
+        return {'df': state['df'], 'manifest': manifest}
+
+    df = None if state['df'] is None else _append_rows(state['df'], new_rows, spec)
+    if len(manifest['parts']) >= MAX_PARTS:
+        #without a loaded frame the parts on disk are compacted as Arrow tables
+        compacted = df if df is not None else pa.concat_tables(
+            [_read_parts(name, manifest['parts']), _to_table(new_rows)])
+        _save(name, manifest, df = compacted)
+    else:
+        _save(name, manifest, new_rows = new_rows)
+    return {'df': df, 'manifest': manifest}
+
+
+def _catch_up(name, state, manifest, frame):
+    #state brought to a manifest saved by another process, None when its parts can
+    #not be read. Within a generation the new parts only hold appended rows
+    if not frame:
+        return {'df': None, 'manifest': manifest}
+    if state is not None and state['df'] is not None and state['manifest']['generation'] == manifest['generation']:
+        parts = state['manifest']['parts']
+        if manifest['parts'][:len(parts)] == parts:
+            df = state['df']
+            new = manifest['parts'][len(parts):]
+            if new:
+                try:
+                    rows = _read_parts(name, new).to_pandas(split_blocks = True)
+                except (OSError, pa.ArrowInvalid):
+                    return None
+                df = _append_rows(df, rows, get_dataset(name))
+            return {'df': df, 'manifest': manifest}
+    return _load_saved(name)
+
+
+def _sync(name, state, frame):
+    #Bring state (None, or this process' state) up to date with the source CSV, with
+    #the file lock held. What another process saved for this version is read back,
+    #only a change nobody ingested yet is parsed. frame=False keeps no frame
+    version = source_version(name)
+    mark = _invalidation_mark(name)
+    if pa is not None:
+        saved = _read_manifest(name)
+        #parts saved before the last invalidation are never read again
+        stale = saved is None or saved.get('invalidated') != mark
+        state = None if stale else _catch_up(name, state, saved, frame)
+        if state is not None and saved['source_version'] == version:
+            return state
+    if state is None or state['manifest'].get('invalidated') != mark:
+        state = _full_build(name)
+    elif state['manifest']['source_version'] != version:
+        state = _append_build(name, state) or _full_build(name)
+    return state if frame else dict(state, df = None)
+
+
+def refresh_dataset(name):
+    #Bring a dataset up to date with its source CSV and return its state.
+    #Rows are only ever appended within one manifest['generation'], so consumers
+    #can fold df.iloc[rows_seen:] into what they computed before
+    with _lock:
+        state = _datasets.get(name)
+        if state is None or state['manifest']['source_version'] != source_version(name):
+            with _file_lock(name):
+                state = _sync(name, state, frame = True)
+            _datasets[name] = state
+        return state
+
+
+def load_dataset(name):
+    #the returned frame is shared by the whole process, treat it as read-only
+    return refresh_dataset(name)['df']
+
+
+def refresh_files(name):
+    #Bring the columnar cache of a dataset up to date without keeping the frame in
+    #memory, for readers that scan the parts themselves (query.py). A frame that is
+    #already loaded is refreshed with it. Returns the manifest
+    if pa is None:
+        raise RuntimeError('pyarrow is required for the columnar cache')
+    with _lock:
+        version = source_version(name)
+        state = _datasets.get(name)
+        if state is None:
+            manifest = _read_manifest(name)
+            if manifest is not None and manifest['source_version'] == version:
+                return manifest
+        elif state['manifest']['source_version'] == version:
+            return state['manifest']
+        with _file_lock(name):
+            state = _sync(name, state, frame = state is not None)
+        if state['df'] is not None:
+            _datasets[name] = state
+        return state['manifest']
+
+
+def invalidate(name):
+    #Explicit invalidation hook for the scraper or an operator, e.g. after a CSV was
+    #rewritten in a way its mtime and size do not show. The new mark changes the
+    #source_version every process sees, so nothing cached under the old one is served
+    #again, and the dataset is reparsed once, here: the app's processes read the new
+    #parts instead of parsing it themselves. Returns the new state
+    directory = cache_dir(name)
+    os.makedirs(directory, exist_ok = True)
+    path = os.path.join(directory, 'invalidated')
+    with _lock, _file_lock(name):
+        with open(f'{path}.{os.getpid()}.tmp', 'w') as f:
+            f.write(uuid.uuid4().hex[:12])
+        os.replace(f'{path}.{os.getpid()}.tmp', path)
+        state = _sync(name, _datasets.get(name), frame = True)
+        _datasets[name] = state
+        return state
+
+
+if __name__ == '__main__':
+    #Refresh the columnar cache, e.g. right after the scraper wrote a new snapshot.
+    #--rebuild invalidates the dataset and reparses the whole CSV instead of only the
+    #appended rows, running dashboards pick the new parts up on their next rerun
+    args = sys.argv[1:]
+    rebuild = '--rebuild' in args
+    names = [arg for arg in args if arg != '--rebuild'] or list(DATASETS)
+    for name in names:
+        state = invalidate(name) if rebuild else refresh_dataset(name)
+        manifest = state['manifest']
+        print(f"{name}: {len(state['df'])} rows in {len(manifest['parts'])} part(s) -> {cache_dir(name)}")
@@ -0,0 +1,30 @@
+#Deferred imports of the heavy plotting libraries
+#plotly.express and the graph objects it pulls in are among the slowest imports of a
+#page, yet a rerun whose figures all come from the figure cache never calls them.
+#The pages bind px to a stand-in that imports the real module on first use, so the
+#cost is paid by the first figure that has to be built instead of every cold start
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        #import_module holds the import lock, concurrent sessions import it once
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    #lazy_import('plotly.express') instead of import plotly.express
+    return LazyModule(name)
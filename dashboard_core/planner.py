@@ -0,0 +1,45 @@
+#Single pass aggregation of the panels of a page
+#The panels of a dashboard used to group the same filtered rows one after another,
+#often on the same key. Each panel now declares the key and the measures it reads,
+#the plan merges the declarations and runs one groupby per distinct key over the
+#union of their measures. Nothing runs until the first panel asks for its table, so
+#a rerun whose figures all come from the figure cache aggregates nothing
+from dashboard_core import timing
+
+def _merge(panels):
+    #{key: {column: func}} over every panel, a column asked with two funcs is an error
+    merged = {}
+    for panel, (key, measures) in panels.items():
+        spec = merged.setdefault(key, {})
+        for column, func in measures.items():
+            if spec.setdefault(column, func) != func:
+                raise ValueError(f'Panel {panel!r} asks for {column!r} as {func!r}, '
+                                 f'another panel grouped by {key!r} asks for {spec[column]!r}')
+    return merged
+
+
+def aggregate_plan(df, panels, names = None):
+    #panels: {panel: (key, {column: func})}, key is a column or a tuple of columns
+    #and the measures are a dict spec like DataFrame.agg takes.
+    #names: {key: finish(grouped)} e.g. products.join_names, applied once per key to
+    #the frame indexed by the key; keys without one get their index reset.
+    #Returns table(panel), the panel's rows with only its own measures
+    merged = _merge(panels)
+    names = names or {}
+    results = {}
+
+    def run():
+        for key, spec in merged.items():
+            with timing.span('groupby', key = str(key), rows = len(df)):
+                grouped = df.groupby(list(key) if isinstance(key, tuple) else key, observed = True).agg(spec)
+                finish = names.get(key)
+                results[key] = finish(grouped) if finish else grouped.reset_index()
+
+    def table(panel):
+        if not results:
+            run()
+        key, measures = panels[panel]
+        others = [column for column in merged[key] if column not in measures]
+        return results[key].drop(columns = others, errors = 'ignore')
+
+    return table
@@ -0,0 +1,103 @@
+#Product dimension of the datasets
+#Product names are often longer than 150 characters and repeat in every snapshot.
+#Ingest keeps the product column dictionary-encoded, so a fact row only carries the
+#integer code of its name, the product_id, and every distinct name is stored once.
+#The dimension table maps those ids to the short and display names the charts show,
+#so panels group on integer ids and join the names onto the few aggregated rows
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core import ingest, query
+from dashboard_core.datasets import get_dataset
+
+#(dataset, max_len) -> {'generation', 'size', 'value'}
+_dimensions = {}
+_lock = threading.Lock()
+
+
+def short_names(names, max_len = 25):
+    #names longer than max_len cut to max_len characters and '...', over the distinct names
+    names = pd.Series(names, dtype = object)
+    return names.where(names.str.len() <= max_len, names.str.slice(0, max_len) + '...')
+
+
+def build_dimension(categories, max_len = 25):
+    #Indexed by product_id. short_id is shared by the products whose short names
+    #collide, name_rank is the position of the name in sorted order, so the min
+    #of the ranks of a group is its alphabetically first product
+    names = pd.Series(np.asarray(categories, dtype = object))
+    short = short_names(names, max_len)
+    short_id, _ = pd.factorize(short)
+    name_rank = np.empty(len(names), dtype = 'int32')
+    name_rank[np.argsort(names.to_numpy(), kind = 'stable')] = np.arange(len(names), dtype = 'int32')
+    dim = pd.DataFrame({
+        'product_name': names,
+        'short_name': short,
+        'short_id': short_id.astype('int32'),
+        'name_rank': name_rank,
+    })
+    dim.index.name = 'product_id'
+    return dim
+
+
+def product_ids(df, name):
+    #int32 product_id of every row, the code of its dictionary-encoded name
+    return df[get_dataset(name)['columns']['product']].cat.codes.astype('int32')
+
+
+def _categories(name):
+    #(generation, the distinct names in product_id order)
+    if query.serves(name):
+        #the DuckDB backend numbers the sorted distinct names of the parts
+        return query.product_names(name)
+    state = ingest.refresh_dataset(name)
+    return state['manifest']['generation'], state['df'][get_dataset(name)['columns']['product']].cat.categories
+
+
+def product_dimension(name, max_len = 25):
+    #Process-wide dimension of a dataset. Appended snapshots only add names at the
+    #end of the categories, so the ids of older rows stay valid within a generation
+    generation, categories = _categories(name)
+    with _lock:
+        key = (name, max_len)
+        entry = _dimensions.get(key)
+        if entry is None or entry['generation'] != generation or entry['size'] != len(categories):
+            entry = {'generation': generation, 'size': len(categories),
+                     'value': build_dimension(categories, max_len)}
+            _dimensions[key] = entry
+        return entry['value']
+
+
+def lookup(ids, name, column, max_len = 25, missing = -1):
+    #a dimension column for every product_id in ids, rows without a name have
+    #the code -1 and get missing
+    ids = np.asarray(ids)
+    values = product_dimension(name, max_len)[column].to_numpy()
+    return np.where(ids >= 0, values[ids], missing)
+
+
+def add_product_keys(df, name, max_len = 25):
+    #product_id, short_id, short_name and name_rank columns for a page frame,
+    #looked up through the ids instead of shortening every row's name
+    ids = product_ids(df, name).to_numpy()
+    df['product_id'] = ids
+    df['short_id'] = lookup(ids, name, 'short_id', max_len).astype('int32')
+    df['short_name'] = lookup(ids, name, 'short_name', max_len, missing = None)
+    df['name_rank'] = lookup(ids, name, 'name_rank', max_len).astype('int32')
+    return df
+
+
+def join_names(df, name, max_len = 25):
+    #Names of rows aggregated per short_id (their index) with name_rank reduced by
+    #'min' or 'max': short_name and product_name, the first or last product name of
+    #the group. Rows come back ordered by short_name like a groupby on the names
+    #would return them, without the ids and ranks
+    dim = product_dimension(name, max_len)
+    by_rank = dim['product_name'].to_numpy()[np.argsort(dim['name_rank'].to_numpy())]
+    short = dim.drop_duplicates('short_id').set_index('short_id')['short_name']
+    #rows without a name (short_id -1) are dropped like a groupby drops missing keys
+    df = df[df.index >= 0].join(short)
+    df['product_name'] = by_rank[df.pop('name_rank').to_numpy()]
+    return df.sort_values('short_name', kind = 'stable').reset_index(drop = True)
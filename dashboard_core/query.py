@@ -0,0 +1,283 @@
+#Embedded DuckDB backend over the columnar cache
+#With a full year of snapshots the pandas frame of a dataset no longer fits the
+#dashboard container comfortably. This backend lets an in-process DuckDB scan the
+#feather parts written by ingest where they are: filters and aggregations run next
+#to the data and only the small result sets reach pandas and Plotly. Opt in with
+#NOSE_QUERY_BACKEND=duckdb, duckdb is an optional dependency and nothing else changes
+#without it
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from dashboard_core import aggregates, ingest
+from dashboard_core.datasets import get_dataset
+
+BACKEND = os.environ.get('NOSE_QUERY_BACKEND', 'pandas')
+
+duckdb = None
+pa_dataset = None
+#only imported when selected, the pandas backend starts without it
+if BACKEND == 'duckdb':
+    try:
+        import duckdb
+        import pyarrow.dataset as pa_dataset
+    except ImportError:  # duckdb is optional, the pages keep their pandas frames without it
+        duckdb = None
+        pa_dataset = None
+#datasets whose page reads through the backend when it is enabled
+SERVED = {'babycare'}
+#small results kept per (dataset parts, query), a rerun with the same filters does
+#not scan the parts again
+MAX_RESULTS = 256
+
+#SQL for the pandas aggregation names the dashboards use
+FUNCTIONS = {
+    'sum': 'sum({})',
+    'min': 'min({})',
+    'max': 'max({})',
+    'mean': 'avg({})',
+    'nunique': 'count(DISTINCT {})',
+    'size': 'count(*)',
+}
+
+#columns the pages filter and group on that are derived from others, as SQL.
+#strftime's %B is the English month name, like calendar.month_name
+DERIVED = {'period': '''strftime("scraping_date", '%B %Y')'''}
+
+_connection = None
+#dataset -> parts currently registered with the connection
+_registered = {}
+#dataset -> {'parts', 'value'} of the distinct product names
+_product_names = {}
+#(dataset, group) -> {'parts', 'value'} of the monthly rollup
+_rollups = {}
+#(dataset, group) -> {'parts', 'value'} of the monthly sales from the counters
+_monthly_sales = {}
+#dataset -> {'parts', 'value'} of the market share pivots
+_market_shares = {}
+_results = OrderedDict()
+_lock = threading.Lock()
+
+
+def enabled():
+    return BACKEND == 'duckdb' and duckdb is not None and ingest.pa is not None
+
+
+def serves(name):
+    return enabled() and name in SERVED
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _column(column):
+    #SQL of a stored or derived column
+    return DERIVED.get(column) or _quote(column)
+
+
+def _parts(name):
+    return tuple(ingest.refresh_files(name)['parts'])
+
+
+def _register(name, parts):
+    #the dataset is re-registered whenever a refresh or compaction changed its parts,
+    #call with _lock held
+    global _connection
+    if _connection is None:
+        _connection = duckdb.connect()
+    if _registered.get(name) != parts:
+        paths = [os.path.join(ingest.cache_dir(name), part) for part in parts]
+        _connection.register(name, pa_dataset.dataset(paths, format = 'feather'))
+        _registered[name] = parts
+    return _connection
+
+
+def execute(name, sql, params = ()):
+    #Run sql against the up to date parts of a dataset, registered as a view named
+    #after it, and return the result as a DataFrame. One connection serves the whole
+    #process, queries are serialized (they only return small aggregates)
+    parts = _parts(name)
+    key = (name, parts, sql, tuple(params))
+    with _lock:
+        result = _results.get(key)
+        if result is None:
+            result = _register(name, parts).execute(sql, list(params)).df()
+            _results[key] = result
+            while len(_results) > MAX_RESULTS:
+                _results.popitem(last = False)
+        else:
+            _results.move_to_end(key)
+        return result.copy()
+
+
+def _where(filters):
+    if not filters:
+        return '', []
+    clauses = [f'{_column(column)} = ?' for column in filters]
+    return ' WHERE ' + ' AND '.join(clauses), list(filters.values())
+
+
+def aggregate(name, by, filters = None, **measures):
+    #GROUP BY query in the shape of a pandas named aggregation:
+    #aggregate('babycare', ['month'], {'brand': 'Zwitsal'}, sales = ('sales', 'sum'))
+    #rows come back ordered by the keys, like a groupby
+    select = [f'{_column(column)} AS {_quote(column)}' for column in by]
+    for output, (column, func) in measures.items():
+        select.append(f'{FUNCTIONS[func].format(_quote(column))} AS {_quote(output)}')
+    where, params = _where(filters)
+    sql = f'SELECT {", ".join(select)} FROM {_quote(name)}{where}'
+    if by:
+        keys = ', '.join(_column(column) for column in by)
+        sql += f' GROUP BY {keys} ORDER BY {keys}'
+    return execute(name, sql, params)
+
+
+def distinct(name, column):
+    #distinct values in order of first appearance, like Series.unique()
+    sql = (f'SELECT value FROM (SELECT {_quote(column)} AS value, row_number() OVER () AS position '
+           f'FROM {_quote(name)}) WHERE value IS NOT NULL GROUP BY value ORDER BY min(position)')
+    return execute(name, sql)['value'].tolist()
+
+
+def product_names(name):
+    #(parts, sorted distinct product names), the product_id of a name is its position
+    parts = _parts(name)
+    with _lock:
+        entry = _product_names.get(name)
+        if entry is not None and entry['parts'] == parts:
+            return parts, entry['value']
+    column = _quote(get_dataset(name)['columns']['product'])
+    names = execute(name, f'SELECT DISTINCT {column} AS name FROM {_quote(name)} '
+                          f'WHERE {column} IS NOT NULL ORDER BY name')['name']
+    value = pd.Index(names, dtype = object)
+    with _lock:
+        _product_names[name] = {'parts': parts, 'value': value}
+    return parts, value
+
+
+def monthly_rollup(name, group = None):
+    #aggregates.monthly_rollup answered by DuckDB, one GROUP BY per new set of parts
+    parts = _parts(name)
+    with _lock:
+        entry = _rollups.get((name, group))
+        if entry is not None and entry['parts'] == parts:
+            return entry['value']
+    columns = get_dataset(name)['columns']
+    keys = ['year("scraping_date") AS year', 'month("scraping_date") AS month']
+    if group is not None:
+        keys.insert(0, f'{_quote(group)} AS "group"')
+    rating = _quote(columns['rating']) if 'rating' in columns else 'NULL'
+    totals = execute(name, f'SELECT {", ".join(keys)}, '
+                           f'sum({_quote(columns["sales"])}) AS sales, '
+                           f'sum({_quote(columns["revenue"])}) AS revenue, '
+                           f'coalesce(sum({rating}), 0) AS rating_sum, '
+                           f'count({rating}) AS rating_count, '
+                           f'count(DISTINCT {_quote(columns["product"])}) AS unique_products '
+                           f'FROM {_quote(name)} GROUP BY ALL')
+    totals = totals.astype({'year': 'int64', 'month': 'int64', 'sales': 'int64', 'revenue': 'int64',
+                            'rating_sum': 'float64', 'rating_count': 'int64', 'unique_products': 'int64'})
+    index = (['group'] if group is not None else []) + aggregates.ROLLUP_KEYS
+    value = aggregates.monthly_rollup_view(totals.set_index(index), group is not None)
+    with _lock:
+        _rollups[(name, group)] = {'parts': parts, 'value': value}
+    return value
+
+
+#units sold in the interval ending at a snapshot of the deltas below
+DELTA = 'CASE WHEN change IS NULL THEN 0 WHEN change < 0 THEN sold ELSE change END'
+
+
+def _deltas(name, where = ''):
+    #WITH clause of the counter deltas of every product, a window over its snapshots
+    #with the rules of velocity.build_sales_deltas (the highest counter of a snapshot,
+    #a counter going down counts from zero, the first snapshot is 0)
+    columns = get_dataset(name)['columns']
+    sales, price = _quote(columns['sales']), _quote(columns['price'])
+    return (f'WITH snapshots AS ('
+            f'SELECT {_quote(columns["group"])}, {_quote(columns["product"])}, "scraping_date", '
+            f'max({sales}) AS sold, arg_max({price}, {sales}) AS price '
+            f'FROM {_quote(name)} WHERE "scraping_date" IS NOT NULL{where} GROUP BY ALL), '
+            f'deltas AS (SELECT *, sold - lag(sold) OVER (PARTITION BY '
+            f'{_quote(columns["group"])}, {_quote(columns["product"])} ORDER BY "scraping_date") AS change '
+            f'FROM snapshots) ')
+
+
+def monthly_sales(name, group = None):
+    #velocity.monthly_sales answered by DuckDB
+    parts = _parts(name)
+    with _lock:
+        entry = _monthly_sales.get((name, group))
+        if entry is not None and entry['parts'] == parts:
+            return entry['value']
+    keys = ['year("scraping_date") AS year', 'month("scraping_date") AS month']
+    if group is not None:
+        keys.insert(0, f'{_quote(group)} AS "group"')
+    totals = execute(name, f'{_deltas(name)}'
+                           f'SELECT {", ".join(keys)}, sum({DELTA}) AS sales, sum(({DELTA}) * price) AS revenue, '
+                           f'count(change) AS intervals FROM deltas GROUP BY ALL')
+    totals = totals.astype({'year': 'int64', 'month': 'int64', 'sales': 'int64', 'revenue': 'int64',
+                            'intervals': 'int64'})
+    index = (['group'] if group is not None else []) + aggregates.ROLLUP_KEYS
+    value = aggregates.monthly_rollup_view(totals.set_index(index), group is not None)
+    with _lock:
+        _monthly_sales[(name, group)] = {'parts': parts, 'value': value}
+    return value
+
+
+def market_share(name):
+    #aggregates.market_share answered by DuckDB, one GROUP BY per new set of parts
+    parts = _parts(name)
+    with _lock:
+        entry = _market_shares.get(name)
+        if entry is not None and entry['parts'] == parts:
+            return entry['value']
+    totals = aggregate(name, ['period', 'brand'], sales = ('sales', 'sum'), revenue = ('revenue', 'sum'))
+    totals = totals.dropna(subset = ['period']).astype({'sales': 'int64', 'revenue': 'int64'}).set_index(['period', 'brand'])
+    value = aggregates.market_share_pivots(totals)
+    with _lock:
+        _market_shares[name] = {'parts': parts, 'value': value}
+    return value
+
+
+def price_max(name, group = None):
+    #aggregates.price_max answered by DuckDB
+    price = get_dataset(name)['columns']['price']
+    maxima = {}
+    if group is not None:
+        rows = aggregate(name, [group], highest = (price, 'max'))
+        maxima = {str(key): int(value) for key, value in zip(rows[group], rows['highest']) if pd.notna(value)}
+    highest = aggregate(name, [], highest = (price, 'max'))['highest'].iloc[0]
+    if pd.notna(highest):
+        maxima[''] = int(highest)
+    return maxima
+
+
+def cube_slice(name, table, brand, period):
+    #aggregates.cube_slice answered by DuckDB, the same columns in the same order
+    filters = {'brand': brand, 'period': period}
+    if table == 'prices':
+        return aggregate(name, ['product_price'], filters, sales = ('sales', 'sum')).astype(
+            {'product_price': 'int64', 'sales': 'int64'})
+    rows = aggregate(name, ['product_name'], filters, sales = ('sales', 'sum'), revenue = ('revenue', 'sum'))
+    _, names = product_names(name)
+    rows.insert(0, 'product_id', names.get_indexer(rows.pop('product_name')).astype('int32'))
+    return rows.astype({'sales': 'int64', 'revenue': 'int64'})
+
+
+def sold_slice(name, table, brand, period):
+    #aggregates.cube_slice of velocity.sold_cube answered by DuckDB, the deltas of the
+    #brand's products counted in the period they end in
+    columns = get_dataset(name)['columns']
+    where = f' AND {_quote(columns["group"])} = ?'
+    period_filter = f'FROM deltas WHERE {DERIVED["period"]} = ? GROUP BY ALL ORDER BY 1'
+    if table == 'prices':
+        return execute(name, f'{_deltas(name, where)}SELECT price AS {_quote(columns["price"])}, '
+                             f'sum({DELTA}) AS sales {period_filter}', (brand, period)).astype('int64')
+    rows = execute(name, f'{_deltas(name, where)}SELECT {_quote(columns["product"])} AS name, '
+                         f'sum({DELTA}) AS sales, sum(({DELTA}) * price) AS revenue {period_filter}', (brand, period))
+    _, names = product_names(name)
+    rows.insert(0, 'product_id', names.get_indexer(rows.pop('name')).astype('int32'))
+    return rows.astype({'sales': 'int64', 'revenue': 'int64'})
@@ -0,0 +1,191 @@
+#Type-ahead search over the product names of a dataset
+#A selectbox of every product name in a month ships and renders thousands of options
+#and its filter only scans them in the browser. The index here is built once per
+#product dimension (so once per dataset version) from the distinct names: postings of
+#every character trigram, each a sorted array of product_ids. A query looks up one
+#posting list per trigram of its words and intersects them, shortest first, then ranks
+#the few names left, so it answers in milliseconds however many products there are.
+#Words of one or two characters have no trigram, they are found by a vectorized scan
+#of every name's characters
+import bisect
+import heapq
+import re
+import threading
+
+import numpy as np
+
+from dashboard_core import products
+
+#what separates words, dropped from names and queries alike
+_SEPARATORS = re.compile(r'[\W_]+')
+#code of a word boundary and of the end of a name in the character arrays
+_SPACE = 0
+_END = 1
+
+#dataset -> {'dimension', 'value'}
+_indexes = {}
+_lock = threading.Lock()
+
+
+def normalize(text):
+    #casefolded words separated by single spaces, the form names are indexed in
+    return _SEPARATORS.sub(' ', str(text).casefold()).strip()
+
+
+def _postings(keys, ids):
+    #(sorted distinct keys, offsets, ids): the product_ids having keys[i] are
+    #ids[offsets[i]:offsets[i + 1]], sorted and without repeats
+    order = np.lexsort((ids, keys))
+    keys, ids = keys[order], ids[order]
+    first = np.r_[True, (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])] if len(keys) else np.array([], dtype = bool)
+    keys, ids = keys[first], ids[first]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype = 'int64')
+    return keys[starts], np.r_[starts, len(keys)], ids
+
+
+class ProductIndex:
+    #postings of the names of one product dimension, positions are product_ids
+    def __init__(self, names):
+        self.names = np.asarray(names, dtype = object)
+        self.normalized = [normalize(name) for name in self.names]
+        self.lengths = np.array([len(name) for name in self.normalized], dtype = 'int64')
+        #the normalized names in sorted order, the names starting with a query are one range
+        self.order = np.argsort(np.array(self.normalized, dtype = object), kind = 'stable').astype('int32')
+        self.sorted = [self.normalized[i] for i in self.order]
+        #every name's characters end to end, each name followed by an end marker,
+        #the other characters coded from 2 up in code point order
+        text = ''.join(name + '\0' for name in self.normalized)
+        chars = np.frombuffer(text.encode('utf-32-le'), dtype = np.uint32)
+        alphabet, codes = np.unique(chars, return_inverse = True)
+        remap = np.array([_SPACE if char == ord(' ') else _END if char == 0 else 2 + code
+                          for code, char in enumerate(alphabet.tolist())], dtype = 'int64')
+        self.alphabet = {chr(char): int(remap[code]) for code, char in enumerate(alphabet.tolist())}
+        codes = remap[codes]
+        self.base = len(alphabet) + 2
+        owner = np.repeat(np.arange(len(self.names), dtype = 'int32'),
+                          [len(name) + 1 for name in self.normalized])
+        #kept for the scan of the short words
+        self.codes, self.owner = codes, owner
+
+        #trigrams inside a word (no space and no end marker among the three)
+        inside = codes > _END
+        first, second, third = codes[:-2], codes[1:-1], codes[2:]
+        keep = inside[:-2] & inside[1:-1] & inside[2:]
+        self.trigrams = _postings(((first * self.base + second) * self.base + third)[keep], owner[:-2][keep])
+
+    def _key(self, gram):
+        #the code of a gram, None when one of its characters is in no name
+        key = 0
+        for char in gram:
+            code = self.alphabet.get(char)
+            if code is None:
+                return None
+            key = key * self.base + code
+        return key
+
+    def _posting(self, table, gram):
+        distinct, offsets, ids = table
+        key = self._key(gram)
+        if key is None:
+            return ids[:0]
+        position = np.searchsorted(distinct, key)
+        if position == len(distinct) or distinct[position] != key:
+            return ids[:0]
+        return ids[offsets[position]:offsets[position + 1]]
+
+    def _scan(self, term):
+        #product_ids of the names containing a term of one or two characters, one
+        #comparison per character of all names ('ml' finds '400ml', not only 'ml...')
+        keys = [self.alphabet.get(char) for char in term]
+        if None in keys:
+            return self.owner[:0]
+        hits = self.codes[:len(self.codes) - len(term) + 1] == keys[0]
+        if len(term) == 2:
+            hits &= self.codes[1:] == keys[1]
+        found = np.zeros(len(self.names), dtype = bool)
+        found[self.owner[:len(hits)][hits]] = True
+        return np.flatnonzero(found).astype('int32')
+
+    def _term(self, term):
+        #product_ids of the names containing the term anywhere: short terms are exact
+        #matches of the scan, longer ones candidates of the trigrams, verified later
+        if len(term) < 3:
+            return self._scan(term), False
+        lists = sorted((self._posting(self.trigrams, term[i:i + 3]) for i in range(len(term) - 2)), key = len)
+        ids = lists[0]
+        for other in lists[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, other, assume_unique = True)
+        return ids, True
+
+    def search(self, text, limit = 20, among = None):
+        #product_ids of the best `limit` names matching every word of text, ranked
+        #by the exact name, then names starting with the query, then the query at the
+        #start of a word, then anywhere, then the remaining matches of every word; ties
+        #go to the earlier match and the shorter name. among restricts the matches to
+        #those product_ids and, for an empty query, is returned in its own order
+        query = normalize(text)
+        if not query:
+            ids = np.arange(len(self.names), dtype = 'int32') if among is None else np.asarray(among)
+            return ids[:limit]
+
+        #enough names start with the query: they rank first, by length, no posting needed
+        start = bisect.bisect_left(self.sorted, query)
+        starting = self.order[start:bisect.bisect_left(self.sorted, query + '\U0010ffff', start)]
+        if among is not None:
+            starting = starting[np.isin(starting, among)]
+        if len(starting) >= limit:
+            lengths = self.lengths[starting]
+            ranked = starting[np.lexsort((starting, lengths, lengths != len(query)))]
+            return ranked[:limit]
+
+        candidates = None
+        substrings = []
+        for term in dict.fromkeys(query.split(' ')):
+            ids, verify = self._term(term)
+            if verify:
+                substrings.append(term)
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique = True)
+            if not len(candidates):
+                return candidates
+        if among is not None:
+            candidates = candidates[np.isin(candidates, among)]
+
+        ranked = []
+        for product_id in candidates.tolist():
+            name = self.normalized[product_id]
+            if not all(term in name for term in substrings):
+                continue
+            position = name.find(query)
+            if name == query:
+                tier = 0
+            elif position == 0:
+                tier = 1
+            elif position > 0 and name.find(' ' + query) >= 0:
+                tier, position = 2, name.find(' ' + query)
+            elif position > 0:
+                tier = 3
+            else:
+                tier, position = 4, len(name)
+            ranked.append((tier, position, len(name), product_id))
+        return np.array([entry[-1] for entry in heapq.nsmallest(limit, ranked)], dtype = 'int32')
+
+
+def product_index(name):
+    #Process-wide search index of a dataset's product names, rebuilt only when the
+    #product dimension is (a new generation or appended names)
+    dimension = products.product_dimension(name)
+    with _lock:
+        entry = _indexes.get(name)
+        if entry is not None and entry['dimension'] is dimension:
+            return entry['value']
+    index = ProductIndex(dimension['product_name'].to_numpy())
+    with _lock:
+        _indexes[name] = {'dimension': dimension, 'value': index}
+    return index
+
+
+def search(name, text, limit = 20, among = None):
+    #ranked product_ids of a dataset's names matching text, see ProductIndex.search
+    return product_index(name).search(text, limit, among)
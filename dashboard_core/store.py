@@ -0,0 +1,86 @@
+#Persistent store of derived results (figures, aggregates) next to the columnar cache
+#The in-memory caches start empty in every new process, so the first visitor after
+#a deploy or restart used to pay for every aggregate and figure again. Results are
+#also written here, one file per key, and any process of the app reads them back
+#instead of recomputing. Entries live under the fingerprint of the app's code,
+#a deploy that changes a page or dashboard_core never reads results of the old code
+import glob
+import hashlib
+import os
+import shutil
+import uuid
+
+from dashboard_core.datasets import ROOT_DIR
+from dashboard_core.ingest import CACHE_DIR
+
+STORE_DIR = os.path.join(CACHE_DIR, 'store')
+#NOSE_STORE=0 keeps the derived results in memory only
+ENABLED = os.environ.get('NOSE_STORE', '1') != '0'
+
+_code_version = None
+
+
+def code_version():
+    #digest of the source of the pages and of dashboard_core, computed once per process
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha1()
+        for pattern in ('*.py', os.path.join('*', '*.py')):
+            for path in sorted(glob.glob(os.path.join(ROOT_DIR, pattern))):
+                with open(path, 'rb') as f:
+                    digest.update(os.path.relpath(path, ROOT_DIR).encode('utf-8'))
+                    digest.update(f.read())
+        _code_version = digest.hexdigest()[:12]
+    return _code_version
+
+
+def _directory(kind, name, version):
+    return os.path.join(STORE_DIR, kind, name, f'{version}-{code_version()}')
+
+
+def _path(kind, name, version, key):
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return os.path.join(_directory(kind, name, version), digest)
+
+
+def load(kind, name, version, key):
+    #bytes stored for key, None when it was never stored for this version and code
+    if not ENABLED:
+        return None
+    try:
+        with open(_path(kind, name, version, key), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def save(kind, name, version, key, payload):
+    #written to a unique temporary file and renamed, readers in other processes
+    #see either nothing or the whole payload
+    if not ENABLED:
+        return
+    path = _path(kind, name, version, key)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, path)
+    except OSError:
+        #a read-only or full disk only costs the persistence
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def prune(kind, name, version):
+    #remove the entries of every other dataset version or code fingerprint
+    keep = os.path.basename(_directory(kind, name, version))
+    parent = os.path.join(STORE_DIR, kind, name)
+    if not os.path.isdir(parent):
+        return 0
+    stale = [entry for entry in os.listdir(parent) if entry != keep]
+    for entry in stale:
+        shutil.rmtree(os.path.join(parent, entry), ignore_errors = True)
+    return len(stale)
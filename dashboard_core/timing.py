@@ -0,0 +1,172 @@
+#Timing spans of a page run
+#Tells which stage of a slow rerun is responsible: loading the dataset, the
+#aggregates and groupbys, building a figure with plotly express or serializing it
+#with st.plotly_chart. The pages wrap main() in timed_page, their fragments in
+#timed_fragment and their stages and panels in span(); every span records its
+#milliseconds, nesting and, where known, the rows and bytes it handled. Spans go to a sidebar overlay and/or one JSON line
+#each in an append-only log:
+#
+#   NOSE_TIMING_OVERLAY=1 streamlit run app.py
+#   NOSE_TIMING_LOG=timings.jsonl streamlit run app.py
+#
+#With neither set, timed_page returns main unchanged, timed_fragment is st.fragment
+#and span() returns a shared do-nothing span after one flag check, the
+#instrumentation can stay in production
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+OVERLAY = os.environ.get('NOSE_TIMING_OVERLAY', '0') == '1'
+LOG_PATH = os.environ.get('NOSE_TIMING_LOG')
+ENABLED = OVERLAY or bool(LOG_PATH)
+
+#the run of the page executing in this script thread
+_current = contextvars.ContextVar('nose_timing_run', default = None)
+_log_lock = threading.Lock()
+
+
+class _NullSpan:
+    #span() while timing is off, or outside a timed page
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, **fields):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Run:
+    def __init__(self, page):
+        self.page = page
+        self.id = uuid.uuid4().hex[:12]
+        self.start = time.perf_counter()
+        self.depth = 0
+        self.spans = []
+
+
+class _Span:
+    __slots__ = ('run', 'name', 'fields', 'depth', 'start')
+
+    def __init__(self, run, name, fields):
+        self.run = run
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.depth = self.run.depth
+        self.run.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.run.depth -= 1
+        self.run.spans.append(dict(
+            self.fields,
+            span = self.name,
+            depth = self.depth,
+            offset_ms = round((self.start - self.run.start) * 1000, 3),
+            ms = round((end - self.start) * 1000, 3),
+        ))
+        return False
+
+    def record(self, **fields):
+        #rows, bytes or anything else learned while the span runs
+        self.fields.update(fields)
+
+
+def span(name, **fields):
+    #with span('load_data', dataset = 'babycare') as s: ... s.record(rows = len(df))
+    if not ENABLED:
+        return NULL_SPAN
+    run = _current.get()
+    if run is None:
+        return NULL_SPAN
+    return _Span(run, name, fields)
+
+
+def frame_size(df):
+    #rows and bytes of a frame for span.record, the shallow memory usage (no string scan)
+    return {'rows': len(df), 'bytes': int(df.memory_usage(index = False, deep = False).sum())}
+
+
+def _write_log(run):
+    lines = ''.join(json.dumps(dict(entry, page = run.page, run = run.id, ts = round(time.time(), 3)),
+                               default = str) + '\n' for entry in run.spans)
+    #one write per run, concurrent sessions and processes append whole runs
+    with _log_lock:
+        try:
+            with open(LOG_PATH, 'a') as f:
+                f.write(lines)
+        except OSError:
+            pass
+
+
+def _overlay(run, container):
+    rows = []
+    for entry in sorted(run.spans, key = lambda entry: entry['offset_ms']):
+        label = ' '.join(str(entry[key]) for key in ('span', 'panel', 'build', 'key') if key in entry)
+        details = ', '.join(f'{key} {entry[key]:,}' for key in ('rows', 'bytes') if isinstance(entry.get(key), int))
+        if 'source' in entry:
+            details = f"{entry['source']}, {details}"
+        rows.append(f"{'  ' * entry['depth']}{label[:40]:<{42 - 2 * entry['depth']}} "
+                    f"{entry['ms']:9.1f} ms  {details}")
+    with container.expander('Timings', expanded = True):
+        st.code('\n'.join(rows), language = None)
+
+
+def _timed_run(page, name, fields, container, func, args, kwargs):
+    #one run of spans under a top span, reported when it ends
+    run = _Run(page)
+    token = _current.set(run)
+    try:
+        with _Span(run, name, fields):
+            return func(*args, **kwargs)
+    finally:
+        _current.reset(token)
+        if LOG_PATH:
+            _write_log(run)
+        if OVERLAY:
+            _overlay(run, container)
+
+
+def timed_page(page):
+    #decorator of a page's main(): one run of spans per rerun
+    def decorate(main):
+        if not ENABLED:
+            return main
+
+        @functools.wraps(main)
+        def timed(*args, **kwargs):
+            return _timed_run(page, 'main', {}, st.sidebar, main, args, kwargs)
+        return timed
+    return decorate
+
+
+def timed_fragment(page):
+    #Decorator of a page's panel in place of st.fragment. The panel's widgets rerun
+    #only the panel, not the page: the page's run is over by then, so a rerun of the
+    #fragment alone is a run of its own (a 'fragment' span naming the panel, its
+    #overlay inside the panel). Called by the page, its spans nest in the page's run
+    def decorate(panel):
+        if not ENABLED:
+            return st.fragment(panel)
+
+        @functools.wraps(panel)
+        def timed(*args, **kwargs):
+            if _current.get() is not None:
+                return panel(*args, **kwargs)
+            return _timed_run(page, 'fragment', {'panel': panel.__name__}, st, panel, args, kwargs)
+        return st.fragment(timed)
+    return decorate
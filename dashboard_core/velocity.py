@@ -0,0 +1,211 @@
+#Sales velocity from the cumulative "sold" counters scraped from Shopee
+#A snapshot only tells how many units a product sold since it was listed, so summing
+#the counters of a month overstates sales whenever that month has several snapshots.
+#The snapshots are ordered per product once and turned into per-interval deltas in
+#a single vectorized pass
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core import aggregates
+from dashboard_core.datasets import get_dataset
+
+#(dataset, group) -> {'deltas', 'value'} of the monthly sales views
+_monthly = {}
+#dataset -> {'deltas', 'value'} of the per-product and per-price sales cubes
+_cubes = {}
+#dataset -> {'market', 'sales', 'value'} of the market share pivots of the units sold
+_shares = {}
+_lock = threading.Lock()
+
+
+def _keys(columns):
+    return [columns['group'], columns['product']]
+
+
+def build_sales_deltas(df, name):
+    #Returns {'deltas': one row per product snapshot with the units (sales_delta) and
+    #rupiah (revenue_delta) sold since the previous snapshot of that product, its
+    #product_id and row (index label in the ingested frame), 'last': the latest counter
+    #of every product, used to merge later snapshots}
+    columns = get_dataset(name)['columns']
+    keys = _keys(columns)
+    frame = df.loc[df['scraping_date'].notna(), keys + ['scraping_date', columns['sales'], columns['price']]]
+
+    product = frame.groupby(keys, observed = True, sort = False).ngroup().to_numpy()
+    dates = frame['scraping_date'].to_numpy('datetime64[ns]')
+    sold = frame[columns['sales']].to_numpy('int64')
+    order = np.lexsort((sold, dates, product))
+    product, dates, sold = product[order], dates[order], sold[order]
+
+    #a product listed twice in one snapshot keeps its highest counter
+    last_in_snapshot = np.ones(len(order), dtype = bool)
+    last_in_snapshot[:-1] = (product[1:] != product[:-1]) | (dates[1:] != dates[:-1])
+    order, product, dates, sold = order[last_in_snapshot], product[last_in_snapshot], dates[last_in_snapshot], sold[last_in_snapshot]
+
+    first = np.ones(len(order), dtype = bool)
+    first[1:] = product[1:] != product[:-1]
+    delta = np.diff(sold, prepend = 0)
+    #a counter going down means the listing was reset or relisted,
+    #everything sold since then is the new counter value
+    delta = np.where(delta < 0, sold, delta)
+    #the first snapshot of a product is the baseline, nothing to attribute yet
+    delta[first] = 0
+    interval_start = np.roll(dates, 1)
+    interval_start[first] = np.datetime64('NaT')
+
+    deltas = frame.iloc[order][keys + ['scraping_date']].reset_index(drop = True)
+    deltas['product_id'] = frame[columns['product']].cat.codes.to_numpy('int32')[order]
+    deltas['row'] = frame.index.to_numpy('int64')[order]
+    deltas['interval_start'] = interval_start
+    deltas['sold'] = sold
+    deltas['price'] = frame[columns['price']].to_numpy('int64')[order]
+    deltas['first'] = first
+    deltas['sales_delta'] = delta
+    deltas['revenue_delta'] = delta * deltas['price'].to_numpy()
+
+    last = deltas.loc[np.r_[first[1:], True], keys + ['scraping_date', 'sold']].set_index(keys)
+    return {'deltas': deltas, 'last': last}
+
+
+def merge_sales_deltas(value, new, name):
+    #Only the first snapshot of each product in the new rows needs the previous
+    #counter, which comes from value['last'] instead of the full history
+    keys = _keys(get_dataset(name)['columns'])
+    deltas = new['deltas'].copy()
+    first = deltas.index[deltas['first'].to_numpy()]
+    previous = value['last'].reindex(pd.MultiIndex.from_frame(deltas.loc[first, keys]))
+    known = (previous['scraping_date'] < deltas.loc[first, 'scraping_date'].to_numpy()).to_numpy()
+    first = first[known]
+    previous = previous[known]
+
+    sold = deltas.loc[first, 'sold'].to_numpy()
+    delta = sold - previous['sold'].to_numpy('int64')
+    delta = np.where(delta < 0, sold, delta)
+    deltas.loc[first, 'interval_start'] = previous['scraping_date'].to_numpy()
+    deltas.loc[first, 'first'] = False
+    deltas.loc[first, 'sales_delta'] = delta
+    deltas.loc[first, 'revenue_delta'] = delta * deltas.loc[first, 'price'].to_numpy()
+
+    last = pd.concat([value['last'], new['last']])
+    last = last[~last.index.duplicated(keep = 'last')]
+    return {'deltas': pd.concat([value['deltas'], deltas], ignore_index = True), 'last': last}
+
+
+def load_sales_deltas(name):
+    #process-wide, extended incrementally as the scraper appends snapshots
+    return aggregates.load_aggregate(name, build_sales_deltas, merge_sales_deltas, name)['deltas']
+
+
+def sales_per_period(deltas, freq = 'M', by = None):
+    #real units and rupiah sold per period, each interval counted in the period it ends in,
+    #and the number of intervals (snapshots with an earlier one of their product)
+    period = deltas['scraping_date'].dt.to_period(freq).rename('period')
+    groups = [deltas[col] for col in (by or [])] + [period]
+    frame = deltas[['sales_delta', 'revenue_delta']].assign(intervals = ~deltas['first'])
+    return frame.groupby(groups, observed = True).sum().reset_index()
+
+
+def monthly_sales(name, group = None):
+    #Units and rupiah really sold per (year, month), per value of the group column
+    #when given, as a monthly rollup view: aggregates.rollup_periods looks up its rows
+    #(sales, revenue, intervals and the period label). Rebuilt only when the deltas changed
+    deltas = load_sales_deltas(name)
+    with _lock:
+        entry = _monthly.get((name, group))
+        if entry is not None and entry['deltas'] is deltas:
+            return entry['value']
+    totals = sales_per_period(deltas, 'M', None if group is None else [group])
+    period = totals['period'].dt
+    keys = [period.year.rename('year'), period.month.rename('month')]
+    if group is not None:
+        keys.insert(0, totals[group].astype(object).rename('group'))
+    totals = pd.DataFrame({'sales': totals['sales_delta'].to_numpy('int64'),
+                           'revenue': totals['revenue_delta'].to_numpy('int64'),
+                           'intervals': totals['intervals'].to_numpy('int64')},
+                          index = pd.MultiIndex.from_arrays(keys))
+    value = aggregates.monthly_rollup_view(totals, group is not None)
+    with _lock:
+        _monthly[(name, group)] = {'deltas': deltas, 'value': value}
+    return value
+
+
+def sales_periods(sales, rollup, period, group = None):
+    #(row, previous row) of the sales and revenue KPIs like aggregates.rollup_periods:
+    #a row of the monthly sales when some product of its period has an earlier snapshot
+    #to count from, else the row of the monthly rollup summing the counters (the first
+    #month scraped, a dataset of single snapshots)
+    rows = aggregates.rollup_periods(sales, period, group)
+    counters = aggregates.rollup_periods(rollup, period, group)
+    return tuple(row if row is None or row.get('intervals', 0) > 0 else counter
+                 for row, counter in zip(rows, counters))
+
+
+def measured(row):
+    #whether a row of sales_periods holds units sold rather than summed counters
+    return row is not None and row.get('intervals', 0) > 0
+
+
+def sold_cube(name):
+    #aggregates.build_brand_month_cube of the units and rupiah sold instead of the
+    #counters, products and prices per (group, period), sliced with aggregates.cube_slice.
+    #Product shares of a measured period add up to its sales_periods row
+    deltas = load_sales_deltas(name)
+    with _lock:
+        entry = _cubes.get(name)
+        if entry is not None and entry['deltas'] is deltas:
+            return entry['value']
+    columns = get_dataset(name)['columns']
+    keys = [deltas[columns['group']].rename(columns['group']), aggregates.period_names(deltas['scraping_date'])]
+    sold = pd.DataFrame({'sales': deltas['sales_delta'], 'revenue': deltas['revenue_delta']})
+    products = sold.groupby(keys + [deltas['product_id']], observed = True).sum().sort_index()
+    prices = sold[['sales']].groupby(keys + [deltas['price'].rename(columns['price'])], observed = True).sum().sort_index()
+    value = {'products': products, 'prices': prices}
+    with _lock:
+        _cubes[name] = {'deltas': deltas, 'value': value}
+    return value
+
+
+def add_sold_columns(df, name):
+    #units_sold and revenue_sold of every row of a frame of the dataset (indexed by
+    #the ingested frame's labels): the growth of its counter since the previous snapshot
+    #of its product, 0 for a baseline snapshot or a lower duplicate listing
+    deltas = load_sales_deltas(name)
+    rows = deltas['row'].to_numpy()
+    labels = df.index.to_numpy()
+    size = max(rows.max(initial = -1), labels.max(initial = -1)) + 1
+    for column, delta in (('units_sold', 'sales_delta'), ('revenue_sold', 'revenue_delta')):
+        values = np.zeros(size, dtype = 'int64')
+        values[rows] = deltas[delta].to_numpy('int64')
+        df[column] = values[labels]
+    return df
+
+
+def sold_rows(frame, row, sales, revenue):
+    #frame with its sales and revenue columns holding the units and rupiah sold of each
+    #row (add_sold_columns) when row, the selection's sales_periods row, is measured
+    if not measured(row):
+        return frame
+    return frame.assign(**{sales: frame['units_sold'], revenue: frame['revenue_sold']})
+
+
+def market_share(name, market, sales):
+    #aggregates.market_share_pivots with every measured (period, brand) of the monthly
+    #sales by brand taking its units and rupiah sold, the others keep their counters
+    with _lock:
+        entry = _shares.get(name)
+        if entry is not None and entry['market'] is market and entry['sales'] is sales:
+            return entry['value']
+    rows = pd.DataFrame(sales['rows'])
+    rows = rows[rows['intervals'] > 0] if len(rows) else rows
+    totals = market['totals'][['sales', 'revenue']]
+    if len(rows):
+        index = pd.MultiIndex.from_arrays([rows['period'], rows['group']], names = totals.index.names)
+        sold = pd.DataFrame({'sales': rows['sales'].to_numpy('int64'), 'revenue': rows['revenue'].to_numpy('int64')},
+                            index = index)
+        totals = pd.concat([totals[~totals.index.isin(index)], sold])
+    value = aggregates.market_share_pivots(totals)
+    with _lock:
+        _shares[name] = {'market': market, 'sales': sales, 'value': value}
+    return value
@@ -0,0 +1,213 @@
+#Helpers shared by the Streamlit pages
+#Every dashboard used to carry its own load_data and format_number.
+#The frames handed out here exist once per process and are shared by every page
+#and session of the multipage app
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pandas.api.types import union_categoricals
+
+from dashboard_core import ingest, products, search, timing
+
+#help of the sales and revenue KPIs, which come from velocity.sales_periods
+SALES_HELP = ('Sold in the month: the growth of every product\'s cumulative sales counter '
+              'since its previous snapshot. A month without earlier snapshots to count '
+              'from, like the first one scraped, shows the counters themselves')
+
+
+def _partition(df, columns):
+    #Rows reordered so every combination of the columns' values is one contiguous
+    #run, and {values: slice} of the runs. Runs follow the first appearance of their
+    #values and keep the original row order, so unique() and every selection see the
+    #rows in the order a boolean mask would return them
+    codes = df.groupby(list(columns), sort = False, observed = True, dropna = False).ngroup().to_numpy()
+    order = np.argsort(codes, kind = 'stable')
+    df = df.take(order)
+    codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype = int)
+    stops = np.r_[starts[1:], len(codes)]
+    keys = df[list(columns)].iloc[starts].itertuples(index = False, name = None)
+    return df, {key: slice(start, stop) for key, start, stop in zip(keys, starts, stops)}
+
+
+def _append_partitioned(frame, blocks, new, new_blocks):
+    #frame and the partitioned new rows as one partitioned frame: every run of the new
+    #rows follows the run of the same values, so no sort. Rows appended to the last
+    #run or to new values (the usual new snapshot) need no reordering either
+    offset = len(frame)
+    keys = list(blocks) + [key for key in new_blocks if key not in blocks]
+    pieces = []
+    for key in keys:
+        for runs, start in ((blocks, 0), (new_blocks, offset)):
+            if key in runs:
+                pieces.append(np.arange(runs[key].start + start, runs[key].stop + start))
+    order = np.concatenate(pieces) if pieces else np.array([], dtype = int)
+    merged = _append_rows(frame, new)
+    if not np.array_equal(order, np.arange(len(order))):
+        merged = merged.take(order)
+    merged_blocks = {}
+    stop = 0
+    for key in keys:
+        size = sum(runs[key].stop - runs[key].start for runs in (blocks, new_blocks) if key in runs)
+        merged_blocks[key] = slice(stop, stop + size)
+        stop += size
+    return merged, merged_blocks
+
+
+def _append_rows(frame, new):
+    #concat falls back to object when the categories differ, keep them categorical
+    merged = pd.concat([frame, new])
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, pd.CategoricalDtype):
+            merged[col] = union_categoricals([frame[col].array, new[col].array], ignore_order = True)
+    return merged
+
+
+#(dataset, prepare name, partition, product keys) -> {'version', 'generation', 'rows',
+#'names', 'value', 'lock'} of the page frames. Only the latest version of each is kept:
+#a superseded frame is released as soon as the first rerun after a refresh built the
+#new one, rows appended to the dataset are prepared and partitioned on their own
+_page_frames = {}
+_lock = threading.Lock()
+
+
+def _page_frame(name, version, prepare_name, prepare, partition = None, product_keys = None):
+    key = (name, prepare_name, partition, product_keys)
+    with _lock:
+        entry = _page_frames.setdefault(key, {'version': None, 'value': None, 'lock': threading.Lock()})
+    #one build per frame and version, the sessions rerunning meanwhile wait for it
+    with entry['lock']:
+        if entry['version'] != version:
+            state = ingest.refresh_dataset(name)
+            df, generation = state['df'], state['manifest']['generation']
+            appended = entry['value'] is not None and entry['generation'] == generation and entry['rows'] <= len(df)
+            names = None if product_keys is None else len(products.product_dimension(name, product_keys))
+            if appended and entry['rows'] == len(df) and names == entry['names']:
+                value = entry['value']
+            elif appended:
+                value = _extend_page_frame(entry['value'], df.iloc[entry['rows']:], name, prepare, partition,
+                                           product_keys, names == entry['names'])
+            else:
+                entry['value'] = None
+                value = _build_page_frame(df, name, prepare, partition, product_keys)
+            entry.update(version = version, generation = generation, rows = len(df), names = names, value = value)
+        return entry['value']
+
+
+def clear_page_frames():
+    with _lock:
+        _page_frames.clear()
+
+
+def _prepared(df, name, prepare, product_keys):
+    #a shallow copy, the page's columns are added without touching the ingested frame
+    df = df.copy(deep = False)
+    if prepare is not None:
+        df = prepare(df)
+    if product_keys is not None:
+        df = products.add_product_keys(df, name, product_keys)
+    return df
+
+
+def _build_page_frame(df, name, prepare, partition, product_keys):
+    df = _prepared(df, name, prepare, product_keys)
+    if partition is None:
+        return {'frame': df, 'blocks': None}
+    df, blocks = _partition(df, partition)
+    return {'frame': df, 'blocks': blocks}
+
+
+def _extend_page_frame(value, new, name, prepare, partition, product_keys, same_names):
+    #value with the appended rows new. The product keys of the older rows stay valid
+    #while no name was added, a new name shifts the name ranks of every row
+    new = _prepared(new, name, prepare, product_keys if same_names else None)
+    if partition is None:
+        frame, blocks = _append_rows(value['frame'], new), None
+    else:
+        frame, blocks = _append_partitioned(value['frame'], value['blocks'], *_partition(new, partition))
+    if not same_names:
+        frame = products.add_product_keys(frame.copy(deep = False), name, product_keys)
+    return {'frame': frame, 'blocks': blocks}
+
+
+def load_data(name, prepare = None, product_keys = None):
+    #(frame, version) of a dataset. prepare(df) adds the page's derived columns once
+    #per dataset version instead of on every rerun, for the appended rows only after
+    #a refresh, and product_keys (the max_len of the short names) the columns of
+    #products.add_product_keys. The frame is shared by every session, treat it as read-only
+    with timing.span('load_data', dataset = name) as span:
+        version = ingest.source_version(name)
+        prepare_name = None if prepare is None else prepare.__qualname__
+        frame = _page_frame(name, version, prepare_name, prepare, None, product_keys)['frame']
+        span.record(**timing.frame_size(frame))
+    return frame, version
+
+
+def load_partitioned(name, columns, prepare = None, product_keys = None):
+    #(frame, blocks, version), load_data for a page that filters on equality of the
+    #columns: the frame is reordered once per version (one copy of it) so that
+    #select(frame, blocks, *values) is a slice of the shared frame, not a copy of the
+    #selected rows per rerun and session
+    with timing.span('load_data', dataset = name) as span:
+        version = ingest.source_version(name)
+        prepare_name = None if prepare is None else prepare.__qualname__
+        entry = _page_frame(name, version, prepare_name, prepare, tuple(columns), product_keys)
+        span.record(**timing.frame_size(entry['frame']))
+    return entry['frame'], entry['blocks'], version
+
+
+def select(frame, blocks, *values):
+    #rows whose partition columns equal values, in frame order, a view of the frame
+    return frame.iloc[blocks.get(values, slice(0, 0))]
+
+
+def format_number(num):
+    if num is None:
+        return "-"
+    try:
+        num = float(num)
+    except (ValueError, TypeError):
+        return str(num)
+
+    if abs(num) >= 1_000_000_000:
+        return f"{num / 1_000_000_000:.1f}Bn"
+    elif abs(num) >= 1_000_000:
+        return f"{num / 1_000_000:.1f}M"
+    else:
+        return f"{num:,.0f}"  # Format biasa dengan koma (misal: 12,500)
+
+
+def metric_delta(value, previous, column, unit = '', digits = None):
+    #st.metric delta of value against the previous period's row of a monthly rollup
+    #(aggregates.rollup_periods), None shows no delta
+    if previous is None or pd.isna(value) or pd.isna(previous[column]):
+        return None
+    change = value - previous[column]
+    if digits is not None:
+        #+ 0.0 turns a change rounded to -0.0 into 0.0
+        text = f'{round(change, digits) + 0.0:+.{digits}f}'
+    else:
+        text = ('+' if change > 0 else '') + format_number(change)
+    return f"{text}{unit} vs {previous['period']}"
+
+
+def product_picker(label, name, key, among = None, default = None, limit = 50):
+    #(product_id, product name) picked from a search box and a selectbox of its best
+    #`limit` matches (search.py) instead of a selectbox of every name. among restricts
+    #the matches to those product_ids, default is preselected while nothing is typed.
+    #(None, None) when nothing matches
+    index = search.product_index(name)
+    text = st.text_input(f'Search: {label}', key = key, placeholder = 'Type part of a product name')
+    options = index.search(text, limit, among).tolist()
+    position = 0
+    if not text.strip() and default is not None:
+        if default not in options:
+            options.append(default)
+        position = options.index(default)
+    if not options:
+        st.caption(f'No product matches "{text}"')
+        return None, None
+    product_id = st.selectbox(label, options, index = position, format_func = lambda option: index.names[option])
+    return product_id, index.names[product_id]
@@ -0,0 +1,160 @@
+#Cache warm-up after a deploy or a data refresh
+#Brings the columnar cache of every dataset up to date and computes the persisted
+#aggregates, then (unless --no-figures) runs every page through Streamlit's AppTest
+#harness for every combination of its sidebar selections on a pool of worker
+#processes. Every figure built on the way is written to the persistent store, which
+#the app reads before building anything, so no visitor lands on a cold path:
+#
+#   python -m dashboard_core.warmup
+#   python -m dashboard_core.warmup babycare --workers 4 --sliders
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dashboard_core import aggregates, figures, ingest, query, store, velocity
+from dashboard_core.datasets import ROOT_DIR
+
+#dataset -> page scripts, the figures of a page are stored under its dataset name
+PAGES = {
+    'babycare': ['all_babycare_dashboard.py', 'babycare_market_share_dashboard.py'],
+    'expertcare': ['expertcare_dasboard.py'],
+    'finallyfoundyou': [os.path.join('FinallyFoundYou', 'FinallyFoundYou_Dashboard.py')],
+}
+#process-wide aggregates the pages load through aggregates.load_aggregate, as
+#(build, merge, args) with the args the pages pass: they are part of the stored key
+AGGREGATES = {
+    'babycare': [(aggregates.build_brand_month_cube, aggregates.merge_brand_month_cube, ()),
+                 (aggregates.build_market_share, aggregates.merge_market_share, ()),
+                 (aggregates.build_monthly_rollup, aggregates.merge_monthly_rollup, ('babycare', 'brand')),
+                 (aggregates.build_price_max, aggregates.merge_price_max, ('babycare', 'brand')),
+                 (velocity.build_sales_deltas, velocity.merge_sales_deltas, ('babycare',))],
+    'expertcare': [(aggregates.build_monthly_rollup, aggregates.merge_monthly_rollup, ('expertcare', None)),
+                   (aggregates.build_price_max, aggregates.merge_price_max, ('expertcare', None)),
+                   (velocity.build_sales_deltas, velocity.merge_sales_deltas, ('expertcare',))],
+    'finallyfoundyou': [(aggregates.build_monthly_rollup, aggregates.merge_monthly_rollup, ('finallyfoundyou', 'categories')),
+                        (aggregates.build_price_max, aggregates.merge_price_max, ('finallyfoundyou', 'categories')),
+                        (velocity.build_sales_deltas, velocity.merge_sales_deltas, ('finallyfoundyou',))],
+}
+
+
+def warm_data(name):
+    #the columnar cache and the persisted aggregates of a dataset
+    if query.serves(name):
+        #the DuckDB backend scans the parts, it keeps no frame and no cube
+        ingest.refresh_files(name)
+        return
+    ingest.refresh_dataset(name)
+    for build, merge, args in AGGREGATES.get(name, []):
+        aggregates.load_aggregate(name, build, merge, *args)
+
+
+def _slider_values(slider):
+    proto = slider.proto
+    if proto.data_type not in (proto.INT, proto.FLOAT):
+        return [slider.value]
+    count = int(round((proto.max - proto.min) / proto.step)) + 1
+    values = [proto.min + i * proto.step for i in range(count)]
+    return [int(value) for value in values] if proto.data_type == proto.INT else values
+
+
+def _sidebar_widgets(at, sliders):
+    widgets = list(at.sidebar.selectbox) + list(at.sidebar.radio)
+    if sliders:
+        widgets += list(at.sidebar.slider)
+    return widgets
+
+
+def _app(script, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    #the pages run with the pandas options app.py sets
+    pd.set_option('mode.copy_on_write', True)
+    at = AppTest.from_file(os.path.join(ROOT_DIR, script), default_timeout = timeout).run()
+    if at.exception:
+        raise RuntimeError(f'{script} failed: {at.exception[0].value}')
+    return at
+
+
+def sidebar_states(script, sliders, timeout):
+    #every combination of the sidebar selectboxes, radios (and sliders), the default
+    #state is built on the way
+    at = _app(script, timeout)
+    options = [widget.options for widget in list(at.sidebar.selectbox) + list(at.sidebar.radio)]
+    if sliders:
+        options += [_slider_values(slider) for slider in at.sidebar.slider]
+    return list(itertools.product(*options))
+
+
+def warm_states(script, states, sliders, timeout):
+    #worker: rerun the page in each state, returns the figure cache stats of these
+    #states (a worker process warms the states of several pages)
+    before = figures.figure_cache_stats()
+    at = _app(script, timeout)
+    for state in states:
+        for widget, value in zip(_sidebar_widgets(at, sliders), state):
+            widget.set_value(value)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f'{script} failed on {state}: {at.exception[0].value}')
+    after = figures.figure_cache_stats()
+    return {stat: after[stat] - before[stat] for stat in ('misses', 'stored')}
+
+
+def _chunks(states, count):
+    size = max(-(-len(states) // count), 1)
+    return [states[i:i + size] for i in range(0, len(states), size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Precompute the aggregates and figures of every sidebar selection')
+    parser.add_argument('datasets', nargs = '*', help = f'pages to warm, all of them by default ({", ".join(PAGES)})')
+    parser.add_argument('--workers', type = int, default = os.cpu_count() or 1, help = 'worker processes')
+    parser.add_argument('--sliders', action = 'store_true',
+                        help = 'also every value of the sidebar sliders, instead of their defaults only')
+    parser.add_argument('--no-figures', action = 'store_true', help = 'only the columnar caches and the aggregates')
+    parser.add_argument('--timeout', type = float, default = 300, help = 'seconds allowed per rerun')
+    args = parser.parse_args()
+    unknown = sorted(set(args.datasets) - set(PAGES))
+    if unknown:
+        parser.error(f'unknown datasets: {", ".join(unknown)}')
+    if not store.ENABLED:
+        parser.error('NOSE_STORE=0 disables the persistent store, there is nothing to warm')
+
+    names = args.datasets or list(PAGES)
+    for name in names:
+        start = time.perf_counter()
+        warm_data(name)
+        print(f'{name}: data and aggregates ready in {time.perf_counter() - start:.1f}s')
+    if args.no_figures:
+        return
+
+    #spawned workers, the parent already runs Streamlit's threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers = args.workers, mp_context = context) as pool:
+        for name in names:
+            for script in PAGES[name]:
+                start = time.perf_counter()
+                states = sidebar_states(script, args.sliders, args.timeout)
+                jobs = [pool.submit(warm_states, script, chunk, args.sliders, args.timeout)
+                        for chunk in _chunks(states, args.workers)]
+                built = stored = 0
+                for job in jobs:
+                    stats = job.result()
+                    built += stats['misses']
+                    stored += stats['stored']
+                print(f'{script}: {len(states)} sidebar states, {built} figures built, {stored} already stored '
+                      f'in {time.perf_counter() - start:.1f}s')
+            pruned = store.prune('figures', name, ingest.source_version(name))
+            print(f'{name}: {pruned} stale version(s) removed')
+
+
+if __name__ == '__main__':
+    #run from the imported module, the spawned workers look warm_states up there
+    from dashboard_core.warmup import main
+    sys.exit(main())
@@ -1,16 +1,21 @@
 #Create webapp to visualize data dashboard for specific product for NOSE HERBALINDO
 #WebApp Dashboard Project : 19 June 2025
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
-import numpy as np
-import altair as alt
-import matplotlib.pyplot as plt
-import csv
-import regex as re
+from dashboard_core import aggregates, figures, planner, products, timing, velocity, views
+from dashboard_core.lazy import lazy_import
+
+px = lazy_import('plotly.express')
+
+
+def prepare_expertcare(df):
+    #period labels and the units and rupiah each row sold, added once per dataset version
+    df['period'] = aggregates.period_names(df['scraping_date'])
+    return velocity.add_sold_columns(df, 'expertcare')
+
 
 #Setting Page
+@timing.timed_page('expertcare')
 def main():
     st.set_page_config(
         page_title = 'ExpertCare Sales Performance',
@@ -18,76 +23,63 @@ def main():
         initial_sidebar_state = "expanded"
     )
 
-    #alt.themes.enable("dark")
     st.title('ExpertCare Sales Performance 2025')
-    @st.cache_data
-    def load_data(url):
-        df = pd.read_csv(url, on_bad_lines='skip')
-        return df
-    df = load_data('dataset/Clean_Shopee_16625.csv')
-    month_order = {
-    1:'January',
-    2:'February',
-    3:'March',
-    4:'April',
-    5:'May',
-    6:'June',
-    7:'July',
-    8:'August',
-    9:'September',
-    10:'October',
-    11:'November',
-    12:'December'
-    }
-
-    df['month'] = pd.to_datetime(df['scraping_date']).dt.month
-
-    df['month'] = df['month'].map(month_order)
+    #reordered once per version so the month selected below is a slice, not a copy
+    df, blocks, version = views.load_partitioned('expertcare', ['period'], prepare_expertcare, product_keys = 25)
+    #KPI totals per (year, month), built once per dataset version, and the units and
+    #revenue really sold per (year, month) from the cumulative sales counters
+    rollup = aggregates.monthly_rollup('expertcare')
+    monthly_sales = velocity.monthly_sales('expertcare')
 
     with st.sidebar:
         st.title('ExpertCare Product Sales Performance')
 
-        #Create available month list for the visitor to choose
-        month_list = df['month'].unique().tolist()
+        #Create available month list for the visitor to choose, every (year, month)
+        #of the history oldest first
+        month_list = rollup['periods']
 
         #button mechanisms
         selected_month = st.selectbox('Select a month', month_list, index=len(month_list)-1)
-        df_selected_month = df[df.month == selected_month]
-        df_selected_month_sorted = df_selected_month.sort_values(by="Sales", ascending=False)
+        #the rest of the products is rolled into one 'Others' bar
+        top_n = st.slider('Products shown per chart', min_value = 5, max_value = 100, value = 25, step = 5)
+        df_selected_month = views.select(df, blocks, selected_month)
+
+    #KPI totals of the selected month and of the month before it, positional lookups
+    #in the monthly rollup, the same (year, month) rows the charts slice
+    current, month_before = aggregates.rollup_periods(rollup, selected_month)
+    sold, sold_before = velocity.sales_periods(monthly_sales, rollup, selected_month)
+    #the charts read the month on the same basis as the KPIs
+    df_selected_month = velocity.sold_rows(df_selected_month, sold, 'Sales', 'revenue')
+
+    #figure cache keys of the panels
+    selection = {'period': selected_month}
+    filters = dict(selection, top_n = top_n)
+
+    #what every chart reads from the selected month, grouped once per key on the first
+    #figure miss. Products are grouped on their integer short_id (from prepare_expertcare),
+    #the short name (to wrap the text) and product name come from the product dimension
+    month_table = planner.aggregate_plan(df_selected_month, {
+        'top_product_sales': ('short_id', {'name_rank':'min', 'Sales':'sum', 'revenue':'sum'}),
+        'top_product_revenue': ('short_id', {'name_rank':'min', 'revenue':'sum'}),
+    }, names = {'short_id': lambda grouped: products.join_names(grouped, 'expertcare', 25)})
 
     #Create placeholder 
     sales_metric,revenue_metric,rating_metric = st.columns((2.5,2.5,1.5),gap='medium')
 
     #Create sales calculation function
     def calculate_sales_metric(month):
-        sales_ = df.loc[df['month'] == month, 'Sales'].sum()
+        sales_ = sold['sales']
         return sales_
     
     #Create revenue calculation function
     def calculate_revenue_metric(month):
-        total_revenue = df.loc[df['month']==month,'revenue'].sum()
+        total_revenue = sold['revenue']
         return total_revenue
     #Create rating calculation function
     def calculate_rating(month):
-        average_rating = round(df.loc[df['month']==month,'Rating'].mean(),2)
+        average_rating = round(current['rating'],2)
         return average_rating
 
-    #formatting number in metric viz
-    def format_number(num):
-        if num is None:
-            return "-" 
-        try:
-            num = float(num)
-        except (ValueError, TypeError):
-            return str(num)
-
-        if abs(num) >= 1_000_000_000:
-            return f"{num / 1_000_000_000:.1f}Bn"
-        elif abs(num) >= 1_000_000:
-            return f"{num / 1_000_000:.1f}M"
-        else:
-            return f"{num:,.0f}"  # Format biasa dengan koma (misal: 12,500)
-
     st.markdown("""
         <style>
         [data-testid="stMetricValue"] {
@@ -95,125 +87,164 @@ def main():
         }
         </style>
         """, unsafe_allow_html=True)
-    
-    def shorten_name(name, max_len=25):
-        return name if len(name) <= max_len else name[:max_len]+ '...'
-    
-    df['short_name'] = df['Nama Produk'].apply(lambda x : shorten_name(x,25))
-    with sales_metric:
+
+    with sales_metric, timing.span('sales_metric'):
         sales_selected_month = calculate_sales_metric(selected_month)
-        #selected_month_num = {v: k for k, v in month_order.items()}[selected_month]
-        #selected_month_before = selected_month_num - 1
-        #month_before = df[selected_month_before].map(month_order)
-        #sales_month_before = calculate_sales_metric(month_before)
-        st.metric(label = f'Sales in {selected_month}', value = f'{format_number(sales_selected_month)} units')
+        st.metric(label = f'Sales in {selected_month}', value = f'{views.format_number(sales_selected_month)} units',
+                  delta = views.metric_delta(sales_selected_month, sold_before, 'sales', ' units'),
+                  help = views.SALES_HELP)
     
-    with revenue_metric:
+    with revenue_metric, timing.span('revenue_metric'):
         total_rev = calculate_revenue_metric(selected_month)
-        st.metric(label=f'Total Revenue(Rp) in {selected_month}', value = f'{format_number(total_rev)} Rupiah')
-    with rating_metric:
+        st.metric(label=f'Total Revenue(Rp) in {selected_month}', value = f'{views.format_number(total_rev)} Rupiah',
+                  delta = views.metric_delta(total_rev, sold_before, 'revenue', ' Rupiah'),
+                  help = views.SALES_HELP)
+    with rating_metric, timing.span('rating_metric'):
         rating = calculate_rating(selected_month)
-        st.metric(label = f'Shop Rating in {selected_month}', value = rating)
+        st.metric(label = f'Shop Rating in {selected_month}', value = rating,
+                  delta = views.metric_delta(rating, month_before, 'rating', digits = 2))
 
     sales_histogram,rev_month=st.columns(2)
 
-    def extract_min_price(price_str):
-    # Ambil semua angka dari string (hilangkan titik dan koma)
-        numbers = re.findall(r'\d[\d.]*', price_str.replace(',', '').replace('.', ''))
-        if numbers:
-            return int(numbers[0])
-        return 0
-
-    # Tambahkan kolom untuk sort
-    df_selected_month['min_price'] = df_selected_month['price_bins'].apply(extract_min_price)
-    df_seletced_month = df_selected_month.sort_values(by='min_price',ascending = True)
 
     #create histogram of sales distribution with certain range price
     #fig1 = Sales Distribution Based on Price Range
     #fig2 = Revenue MoM 
-    with sales_histogram:
-        df_sales_hist = df_selected_month.groupby('min_price').agg({
-        'price_bins':'min',
-        'Sales':'sum'
-        }).reset_index()
-
-        fig1 = px.bar(df_sales_hist,x = 'price_bins',y='Sales',color = 'price_bins',
-                 color_discrete_sequence= px.colors.sequential.Plasma_r,text = 'price_bins')
-        fig1.update_traces(marker_line_width=0,texttemplate="%{y}")
-        fig1.update_layout(
-            title = 'Customer Spending Range',
-            xaxis = dict(
-            title='Price Range',
-            tickangle = 45,
-            tickfont = dict(size=12),
-            rangeslider=dict(visible=False)
-            ),
-            yaxis = dict(title='Customer Amount'),
-            width = 500,
-            height = 500,
-            margin = dict(l=40,r=40,t=40,b=40),
-        )
-        st.plotly_chart(fig1, use_container_width=True)
-
-    with rev_month:
-        df_total_rev = df_selected_month.groupby('month').agg({
-            'revenue':'sum'
-        }).reset_index()
-        fig2 = px.line(df_total_rev, x = 'month', y='revenue', title = 'Revenue per Month(Rp)')
-        st.plotly_chart(fig2, use_container_width=True)
+
+    #the bin settings rerun only this panel
+    @timing.timed_fragment('expertcare')
+    def sales_histogram_panel():
+        #bins are a count or a width, from 0 to the highest price
+        bins_col, width_col = st.columns(2)
+        price_bins = bins_col.slider('Price bins', min_value = 5, max_value = 40, value = 16, step = 1)
+        bin_width = width_col.number_input('Bin width (Rp), 0 uses the count', min_value = 0, value = 0, step = 5000)
+        hist_filters = dict(selection, price_bins = price_bins, bin_width = bin_width)
+
+        def build_fig1():
+            #units sold per price of the month, binned numerically up to the highest price
+            edges = aggregates.price_edges(aggregates.price_max('expertcare').get('', 0), price_bins, bin_width)
+            df_sales_hist = aggregates.price_histogram(df_selected_month['Harga'], df_selected_month['Sales'], edges,
+                                                       label = 'price_bins', weight = 'Sales')
+
+            fig1 = px.bar(df_sales_hist,x = 'price_bins',y='Sales',color = 'price_bins',
+                     color_discrete_sequence= px.colors.sequential.Plasma_r,text = 'price_bins')
+            fig1.update_traces(marker_line_width=0,texttemplate="%{y}")
+            fig1.update_layout(
+                title = 'Customer Spending Range',
+                xaxis = dict(
+                title='Price Range',
+                tickangle = 45,
+                tickfont = dict(size=12),
+                rangeslider=dict(visible=False)
+                ),
+                yaxis = dict(title='Customer Amount'),
+                width = 500,
+                height = 500,
+                margin = dict(l=40,r=40,t=40,b=40),
+            )
+            return fig1
+
+        fig1 = figures.cached_figure('expertcare', 'sales_histogram', hist_filters, version, build_fig1)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig1, use_container_width=True)
+
+    with sales_histogram, timing.span('sales_histogram'):
+        sales_histogram_panel()
+
+    with rev_month, timing.span('rev_month'):
+        def build_fig2():
+            #every month of the history, not only the selected one
+            rows = [velocity.sales_periods(monthly_sales, rollup, period)[0] for period in rollup['periods']]
+            df_total_rev = pd.DataFrame(rows, columns = ['period', 'revenue'])
+            fig2 = px.line(df_total_rev, x = 'period', y='revenue', title = 'Revenue per Month(Rp)',
+                           labels = {'period': 'month'})
+            return fig2
+
+        fig2 = figures.cached_figure('expertcare', 'rev_month', {}, version, build_fig2)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig2, use_container_width=True)
     
     top_product_sales,top_product_revenue = st.columns(2)
-    #Shorten product name, to wrap the text
-    df_selected_month['short_name'] = df_selected_month['Nama Produk'].apply(lambda x:shorten_name(x,25))
-
-    df_top_sales_rev = df_selected_month.groupby('short_name').agg({
-        'Sales':'sum',
-        'revenue':'sum'
-    }).reset_index().sort_values(by= 'Sales',ascending = False)
-
-    with top_product_sales:
-        fig3 = px.bar(df_top_sales_rev,x = 'short_name', y = 'Sales',
-                      color = 'Sales',labels = 'Nama Produk',
-                 color_discrete_sequence= px.colors.sequential.Plasma_r,
-                 text = 'Sales')
-        fig3.update_traces(marker_line_width=0,texttemplate="%{y}",hovertemplate = df_selected_month['Nama Produk'])
-        fig3.update_layout(
-            title = 'Highest Performing Product Based on Monthly Sales',
-            xaxis = dict(
-            title='Product Name',
-            tickangle = 90,
-            tickfont = dict(size=12),
-            rangeslider=dict(visible=False)
-            ),
-            yaxis = dict(title='Sales'),
-            width = 1200,
-            height = 500,
-            margin = dict(l=40,r=40,t=40,b=40),
-        )
-        st.plotly_chart(fig3)
-
-    with top_product_revenue:
-        df_top_product_revenue = df_selected_month.groupby('short_name').agg(
-            {
-                'Nama Produk':'min',
-                'revenue':'sum'
-            }
-        ).reset_index().sort_values(by='revenue', ascending = False)
-        
-        fig4 = px.bar(df_top_product_revenue,x = 'short_name',y = 'revenue',color = 'revenue',labels = 'Nama Produk', 
-                      color_continuous_scale= px.colors.sequential.Viridis,
-                      text = 'revenue')
-        fig4.update_traces(marker_line_width=0, texttemplate="%{y}",hovertemplate=df_selected_month['Nama Produk'])
-        fig4.update_layout(
-            title = 'Revenue per Product (Rp)',
-            xaxis = dict(
-                title = 'Product Name', tickangle = 90, tickfont=dict(size=12),rangeslider=dict(visible=False)),
-                yaxis = dict(title = 'revenue'),
+
+    with top_product_sales, timing.span('top_product_sales'):
+        def build_fig3():
+            df_top_sales_rev = aggregates.top_n_with_others(month_table('top_product_sales'), 'Sales', top_n)
+
+            fig3 = px.bar(df_top_sales_rev,x = 'short_name', y = 'Sales',
+                          color = 'Sales',labels = 'Nama Produk',
+                          custom_data = ['product_name'],
+                     color_discrete_sequence= px.colors.sequential.Plasma_r,
+                     text = 'Sales')
+            fig3.update_traces(marker_line_width=0,texttemplate="%{y}",hovertemplate = '%{customdata[0]}')
+            fig3.update_layout(
+                title = 'Highest Performing Product Based on Monthly Sales',
+                xaxis = dict(
+                title='Product Name',
+                tickangle = 90,
+                tickfont = dict(size=12),
+                rangeslider=dict(visible=False)
+                ),
+                yaxis = dict(title='Sales'),
                 width = 1200,
                 height = 500,
                 margin = dict(l=40,r=40,t=40,b=40),
             )
-        st.plotly_chart(fig4)
+            return fig3
+
+        fig3 = figures.cached_figure('expertcare', 'top_product_sales', filters, version, build_fig3)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig3)
+
+    with top_product_revenue, timing.span('top_product_revenue'):
+        def build_fig4():
+            df_top_product_revenue = aggregates.top_n_with_others(month_table('top_product_revenue'), 'revenue', top_n)
+        
+            fig4 = px.bar(df_top_product_revenue,x = 'short_name',y = 'revenue',color = 'revenue',labels = 'Nama Produk', 
+                          custom_data = ['product_name'],
+                          color_continuous_scale= px.colors.sequential.Viridis,
+                          text = 'revenue')
+            fig4.update_traces(marker_line_width=0, texttemplate="%{y}",hovertemplate = '%{customdata[0]}')
+            fig4.update_layout(
+                title = 'Revenue per Product (Rp)',
+                xaxis = dict(
+                    title = 'Product Name', tickangle = 90, tickfont=dict(size=12),rangeslider=dict(visible=False)),
+                    yaxis = dict(title = 'revenue'),
+                    width = 1200,
+                    height = 500,
+                    margin = dict(l=40,r=40,t=40,b=40),
+                )
+            return fig4
+
+        fig4 = figures.cached_figure('expertcare', 'top_product_revenue', filters, version, build_fig4)
+        with timing.span('plotly_chart'):
+            st.plotly_chart(fig4)
+
+    #the products of the month in order of appearance, searched through the index of
+    #every product name built once per dataset version
+    month_products = df_selected_month['product_id'].unique()
+    month_products = month_products[month_products >= 0]
+
+    product_search = st.columns(1)[0]
+    #typing and picking rerun only this panel
+    @timing.timed_fragment('expertcare')
+    def product_search_panel():
+        picker, product_sales, product_revenue, product_share = st.columns((3, 1, 1, 1))
+        with picker:
+            product_id, _ = views.product_picker('Find a product', 'expertcare', 'search_product',
+                                                 among = month_products)
+        if product_id is None:
+            return
+        rows = df_selected_month.loc[df_selected_month['product_id'].to_numpy() == product_id, ['Sales', 'revenue']]
+        with product_sales:
+            st.metric(label = f'Sales in {selected_month}', value = f"{views.format_number(rows['Sales'].sum())} units")
+        with product_revenue:
+            st.metric(label = f'Revenue in {selected_month}', value = f"{views.format_number(rows['revenue'].sum())} Rupiah")
+        with product_share:
+            share = rows['revenue'].sum() / total_rev * 100 if total_rev else 0
+            st.metric(label = 'Share of Revenue', value = f'{share:.2f}%')
+
+    with product_search, timing.span('product_search'):
+        product_search_panel()
 
 if __name__== '__main__':
     main()
@@ -0,0 +1,67 @@
+#Every test runs against its own columnar cache and result store, with the
+#in-process caches emptied, so nothing leaks between tests or into .cache/
+import os
+import shutil
+import sys
+
+import pytest
+
+#the dashboard_core package lives one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import synthetic_data
+from dashboard_core import aggregates, downsample, figures, ingest, products, query, search, store, velocity, views
+from dashboard_core.datasets import get_dataset
+
+
+def _clear():
+    ingest._datasets.clear()
+    aggregates._aggregates.clear()
+    velocity._monthly.clear()
+    velocity._cubes.clear()
+    velocity._shares.clear()
+    products._dimensions.clear()
+    search._indexes.clear()
+    figures.clear_figure_cache()
+    figures._pruned.clear()
+    views.clear_page_frames()
+    downsample.clear_series_cache()
+    #the DuckDB caches are keyed by part file names, the same in every test's cache
+    for cache in (query._registered, query._product_names, query._rollups, query._monthly_sales,
+                  query._market_shares, query._results):
+        cache.clear()
+
+
+@pytest.fixture(autouse = True)
+def isolated_cache(tmp_path, monkeypatch):
+    cache = tmp_path / 'cache'
+    monkeypatch.setattr(ingest, 'CACHE_DIR', str(cache))
+    monkeypatch.setattr(store, 'STORE_DIR', str(cache / 'store'))
+    _clear()
+    yield cache
+    _clear()
+
+
+@pytest.fixture
+def dataset_copy(tmp_path, monkeypatch):
+    #copy_dataset(name) points a dataset at a copy of its CSV the test may append
+    #to or rewrite, and returns the path of the copy
+    def copy_dataset(name):
+        spec = get_dataset(name)
+        path = tmp_path / os.path.basename(spec['path'])
+        shutil.copyfile(spec['path'], path)
+        monkeypatch.setitem(spec, 'path', str(path))
+        return path
+    return copy_dataset
+
+
+@pytest.fixture
+def synthetic_dataset(tmp_path, monkeypatch):
+    #synthetic(name, **options) points a dataset at a CSV written by
+    #benchmarks/synthetic_data.py (small by default) and returns its path
+    def synthetic(name, brands = 3, products = 8, snapshots = 40, months = 14, start = '2025-01-01', seed = 0):
+        path = tmp_path / 'synthetic' / os.path.basename(get_dataset(name)['path'])
+        path.parent.mkdir(exist_ok = True)
+        synthetic_data.write_csv(synthetic_data.generate(name, brands, products, snapshots, months, start, seed), str(path))
+        monkeypatch.setitem(get_dataset(name), 'path', str(path))
+        return path
+    return synthetic
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from dashboard_core import aggregates
+
+
+def _cube(name):
+    return aggregates.load_aggregate(name, aggregates.build_brand_month_cube, aggregates.merge_brand_month_cube)
+
+
+def test_periods_are_year_aware(synthetic_dataset):
+    #14 months of snapshots: every month name of the first two months is seen twice
+    synthetic_dataset('babycare', months = 14)
+    rollup = aggregates.monthly_rollup('babycare', 'brand')
+    periods = rollup['periods']
+    assert periods[:2] == ['January 2025', 'February 2025']
+    assert periods[-2:] == ['January 2026', 'February 2026']
+    assert periods == sorted(periods, key = aggregates.period_key)
+
+    current, previous = aggregates.rollup_periods(rollup, 'February 2026', 'Brand 000')
+    assert current['period'] == 'February 2026'
+    assert previous['period'] == 'January 2026'
+
+
+def test_cube_matches_rollup_per_period(synthetic_dataset):
+    #the charts (cube) and the KPIs (rollup) of a selection read the same rows
+    synthetic_dataset('babycare', months = 14)
+    rollup = aggregates.monthly_rollup('babycare', 'brand')
+    cube = _cube('babycare')
+    for (brand, period), position in rollup['positions'].items():
+        row = rollup['rows'][position]
+        products = aggregates.cube_slice(cube, 'products', brand, period)
+        assert products['sales'].sum() == row['sales']
+        assert products['revenue'].sum() == row['revenue']
+        assert len(products) == row['unique_products']
+
+
+def test_market_share_periods_in_time_order(synthetic_dataset):
+    synthetic_dataset('babycare', months = 14)
+    market = aggregates.market_share('babycare')
+    months = market['sales'].index.tolist()
+    assert months == sorted(months, key = aggregates.period_key)
+    assert len(months) == len(set(months)) == 14
+
+
+def test_top_n_with_others():
+    df = pd.DataFrame({'short_name': list('abcdef'), 'product_name': list('ABCDEF'),
+                       'sales': [5, 50, 1, 40, 3, 40]})
+    top = aggregates.top_n_with_others(df, 'sales', 3)
+    #the leaders keep their order, the rest is summed into one row
+    assert top['short_name'].tolist() == ['b', 'd', 'f', 'Others']
+    assert top['sales'].tolist() == [50, 40, 40, 9]
+    assert top['product_name'].iloc[-1] == 'Others (3 products)'
+    assert aggregates.top_n_with_others(df, 'sales', 6) is df
+    assert aggregates.top_n_with_others(df, 'sales', None) is df
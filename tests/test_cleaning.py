@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_core import cleaning
+from dashboard_core.datasets import get_dataset
+
+pytest.importorskip('pyarrow')
+
+
+def test_parse_amount():
+    values = pd.Series(['Rp1.234.567', '15,5rb', '1JT+ terjual', '10RB+ terjual', '1,2RB', 'Rp 145.900', '145900'])
+    assert cleaning.parse_amount(values).tolist() == [1234567, 15500, 1000000, 10000, 1200, 145900, 145900]
+
+
+def test_parse_amount_ranges_and_garbage():
+    #a price range gives its lower bound
+    values = pd.Series(['Rp50.000 - Rp80.000', 'Rp1,2JT-Rp1,5JT', 'habis', '', None])
+    parsed = cleaning.parse_amount(values)
+    assert parsed[:2].tolist() == [50000, 1200000]
+    assert np.isnan(parsed[2:]).all()
+
+
+def test_parse_date_mixed_formats():
+    values = pd.Series(['2025-06-16 10:00:00', '06/17/2025 10:00', '18 June 2025', '2025-06-16 10:00:00', 'kemarin', None])
+    parsed = pd.Series(cleaning.parse_date(values))
+    assert parsed[:4].tolist() == [pd.Timestamp('2025-06-16 10:00'), pd.Timestamp('2025-06-17 10:00'),
+                                   pd.Timestamp('2025-06-18'), pd.Timestamp('2025-06-16 10:00')]
+    assert parsed[4:].isna().all()
+
+
+def _raw(rows):
+    return pd.DataFrame(rows, columns = ['product_name', 'brand', 'product_price', 'sales', 'scraping_date'])
+
+
+def test_normalize_counts_rejects_per_reason():
+    raw = _raw([
+        ('Bambi Wash', 'Bambi', 'Rp45.000', '1,2RB terjual', '2025-06-16 10:00:00'),
+        ('  ', 'Bambi', 'Rp45.000', '3', '2025-06-16 10:00:00'),
+        #the first failing check wins: missing product, not bad price
+        ('', 'Bambi', 'gratis', '3', '2025-06-16 10:00:00'),
+        ('Bambi Lotion', 'Bambi', 'Rp0', '3', '2025-06-16 10:00:00'),
+        ('Bambi Oil', 'Bambi', 'Rp20.000', 'banyak', '2025-06-16 10:00:00'),
+        ('Bambi Cream', 'Bambi', 'Rp20.000', '5', 'kemarin'),
+        ('Zwitsal Powder', 'Zwitsal', 'Rp12.500', '15,5rb', '06/17/2025 10:00'),
+    ])
+    rejected = dict.fromkeys(cleaning.REASONS, 0)
+    df = cleaning.normalize(raw, get_dataset('babycare'), rejected)
+    assert rejected == {'malformed': 0, 'missing_product': 2, 'bad_price': 1, 'bad_sales': 1, 'bad_date': 1}
+    assert df['product_name'].tolist() == ['Bambi Wash', 'Zwitsal Powder']
+    assert df['sales'].tolist() == [1200, 15500]
+    assert df['revenue'].tolist() == [45000 * 1200, 12500 * 15500]
+    assert df['month'].tolist() == ['June', 'June'] and df['year'].tolist() == [2025, 2025]
+
+
+def test_clean_file_counts_malformed_rows(tmp_path):
+    path = tmp_path / 'dump.csv'
+    path.write_text('product_name,brand,product_price,sales,scraping_date\n'
+                    'Bambi Wash,Bambi,Rp45.000,10RB+ terjual,2025-06-16 10:00:00\n'
+                    'Bambi Oil,Bambi,Rp20.000,5,2025-06-16 10:00:00,extra,fields\n'
+                    ',Bambi,Rp20.000,5,2025-06-16 10:00:00\n'
+                    'Zwitsal Powder,Zwitsal,"Rp12.500 - Rp15.000",1JT+ terjual,06/17/2025 10:00\n')
+    stats = cleaning.clean_file('babycare', str(path), str(tmp_path / 'part.arrow'))
+    assert stats['rows'] == 4 and stats['clean'] == 2
+    assert stats['rejected'] == {'malformed': 1, 'missing_product': 1, 'bad_price': 0, 'bad_sales': 0, 'bad_date': 0}
+    #highest price per brand for the per-brand bins, over every brand for the global ones
+    assert stats['max'] == {'Price Range': {'Bambi': 45000, 'Zwitsal': 12500}, 'Global Price Range': {'': 45000}}
+
+
+def test_label_bins():
+    spec = get_dataset('babycare')
+    df = pd.DataFrame({'brand': ['A', 'A', 'B', 'C'], 'product_price': [1, 10, 100, 5]})
+    edges = cleaning.bin_edges(spec, {'Price Range': {'A': 10, 'B': 100}})['Price Range']
+    labels = cleaning.label_bins(df, spec, 'Price Range', edges)
+    #(0, 1] is the first bin of A, its highest price the last one; C has no edges
+    assert labels.tolist() == ['0 - 1', '9 - 10', '90 - 100', '']
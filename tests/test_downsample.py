@@ -0,0 +1,36 @@
+import numpy as np
+
+from dashboard_core import downsample, ingest
+
+
+def test_minmax_indices_keep_the_extremes():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size = 10000)
+    y[1234], y[8765] = 50, -50
+    keep = downsample.minmax_indices(y, 200)
+    assert len(keep) <= 202
+    assert (np.diff(keep) > 0).all()
+    assert {0, 1234, 8765, len(y) - 1} <= set(keep.tolist())
+    #the lowest and highest point of every bucket
+    for bucket in np.array_split(np.arange(len(y)), 100):
+        kept = y[np.intersect1d(keep, bucket)]
+        assert kept.min() == y[bucket].min() and kept.max() == y[bucket].max()
+
+
+def test_minmax_indices_short_series_untouched():
+    assert downsample.minmax_indices(np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert downsample.minmax_indices(np.arange(5), None).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_product_series(synthetic_dataset):
+    synthetic_dataset('finallyfoundyou', snapshots = 400)
+    df = ingest.load_dataset('finallyfoundyou')
+    product = df['product_name'].iloc[0]
+    rows = df[(df['product_name'] == product) & df['scraping_date'].notna()]
+    series = downsample.product_series('finallyfoundyou', product, 'sales', 100)
+    assert len(series) <= 102 < len(rows)
+    assert series['scraping_date'].is_monotonic_increasing
+    assert series['sales'].max() == rows['sales'].max() and series['sales'].min() == rows['sales'].min()
+    assert downsample.product_series('finallyfoundyou', product, 'sales', 100) is series
+    full = downsample.product_series('finallyfoundyou', product, 'sales', None)
+    assert len(full) == len(rows)
@@ -0,0 +1,24 @@
+import os
+
+import plotly.graph_objects as go
+
+from dashboard_core import figures, store
+
+
+def _versions(dashboard):
+    parent = os.path.join(store.STORE_DIR, 'figures', dashboard)
+    return sorted(entry.split('-')[0] for entry in os.listdir(parent))
+
+
+def test_store_keeps_latest_version_only():
+    build = lambda: go.Figure(go.Bar(x = ['a'], y = [1]))
+    figures.cached_figure('babycare', 'panel', {'brand': 'X'}, 'v1', build)
+    figures.cached_figure('babycare', 'panel', {'brand': 'Y'}, 'v1', build)
+    assert _versions('babycare') == ['v1']
+
+    figures.cached_figure('babycare', 'panel', {'brand': 'X'}, 'v2', build)
+    assert _versions('babycare') == ['v2']
+    #the figures of the other versions are built again, not read back
+    figures.clear_figure_cache()
+    figures.cached_figure('babycare', 'panel', {'brand': 'Y'}, 'v1', build)
+    assert figures.figure_cache_stats()['misses'] == 1
@@ -0,0 +1,116 @@
+import pandas as pd
+
+from dashboard_core import aggregates, ingest, velocity
+
+
+def _split(path, *cuts):
+    #rewrite path with its rows before the first cut (a fraction of the rows), returns
+    #one function per cut appending the rows up to the next cut, the last one the rest
+    df = pd.read_csv(path, dtype = str, keep_default_na = False)
+    positions = [int(len(df) * cut) for cut in cuts] + [len(df)]
+    df.iloc[:positions[0]].to_csv(path, index = False)
+
+    def appender(start, stop):
+        return lambda: df.iloc[start:stop].to_csv(path, mode = 'a', header = False, index = False)
+    return df, positions, [appender(start, stop) for start, stop in zip(positions, positions[1:])]
+
+
+def _aggregates(name):
+    #every incrementally merged aggregate of a dataset, as comparable frames
+    cube = aggregates.load_aggregate(name, aggregates.build_brand_month_cube, aggregates.merge_brand_month_cube)
+    deltas = velocity.load_sales_deltas(name)
+    return {
+        'products': cube['products'],
+        'prices': cube['prices'],
+        'rollup': pd.DataFrame(aggregates.monthly_rollup(name, 'brand')['rows']),
+        'market_share': aggregates.market_share(name)['totals'].sort_index(),
+        'deltas': deltas.sort_values(['product_name', 'scraping_date'], ignore_index = True),
+    }
+
+
+def _rebuilt(name):
+    #the same aggregates built from scratch over the current frame
+    aggregates._aggregates.clear()
+    return _aggregates(name)
+
+
+def test_append_merges_equal_full_rebuild(synthetic_dataset, monkeypatch):
+    #the second cut falls inside a snapshot, its rows arrive in two appends
+    df, positions, appends = _split(synthetic_dataset('babycare', months = 3), 0.5, 0.71)
+    assert df['scraping_date'].iloc[positions[1] - 1] == df['scraping_date'].iloc[positions[1]]
+    before = ingest.refresh_dataset('babycare')
+    _aggregates('babycare')
+
+    merges = []
+    for module, merge in [(aggregates, 'merge_brand_month_cube'), (aggregates, 'merge_monthly_rollup'),
+                          (aggregates, 'merge_market_share'), (velocity, 'merge_sales_deltas')]:
+        def spy(*args, merge = getattr(module, merge), name = merge):
+            merges.append(name)
+            return merge(*args)
+        monkeypatch.setattr(module, merge, spy)
+
+    for append in appends:
+        append()
+        after = ingest.refresh_dataset('babycare')
+        merged = _aggregates('babycare')
+    assert after['manifest']['generation'] == before['manifest']['generation']
+    assert len(after['df']) == len(df) == len(ingest.parse_csv('babycare'))
+    assert sorted(set(merges)) == ['merge_brand_month_cube', 'merge_market_share', 'merge_monthly_rollup', 'merge_sales_deltas']
+    assert len(merges) == 8
+    assert all(entry['rows'] == len(after['df']) for entry in aggregates._aggregates.values())
+
+    rebuilt = _rebuilt('babycare')
+    for table, frame in rebuilt.items():
+        pd.testing.assert_frame_equal(merged[table], frame, check_dtype = False, obj = table)
+
+
+def test_half_written_line_waits_for_its_end(synthetic_dataset):
+    path = synthetic_dataset('babycare', months = 1)
+    rows = len(ingest.refresh_dataset('babycare')['df'])
+    with open(path, 'rb') as f:
+        line = f.read().splitlines(keepends = True)[-1]
+
+    #the scraper is in the middle of writing a row
+    with open(path, 'ab') as f:
+        f.write(line[:len(line) // 2])
+    state = ingest.refresh_dataset('babycare')
+    assert len(state['df']) == rows
+    assert state['df']['scraping_date'].notna().all()
+
+    with open(path, 'ab') as f:
+        f.write(line[len(line) // 2:])
+    df = ingest.refresh_dataset('babycare')['df']
+    assert len(df) == rows + 1
+    assert df['scraping_date'].notna().all() and df['brand'].notna().all()
+    pd.testing.assert_frame_equal(df.iloc[[-1]].reset_index(drop = True), df.iloc[[-2]].reset_index(drop = True))
+
+
+def test_rewrite_rebuilds(synthetic_dataset):
+    path = synthetic_dataset('babycare', months = 3)
+    before = ingest.refresh_dataset('babycare')
+    _aggregates('babycare')
+
+    #a rewritten history, not an append: the dataset and its aggregates are rebuilt
+    _split(path, 0.5)
+    after = ingest.refresh_dataset('babycare')
+    assert after['manifest']['generation'] != before['manifest']['generation']
+    assert len(after['df']) < len(before['df'])
+    current = _aggregates('babycare')
+    rebuilt = _rebuilt('babycare')
+    for table, frame in rebuilt.items():
+        pd.testing.assert_frame_equal(current[table], frame, check_dtype = False, obj = table)
+
+
+def test_invalidate_rebuilds(dataset_copy):
+    dataset_copy('babycare')
+    version = ingest.source_version('babycare')
+    before = ingest.refresh_dataset('babycare')
+    rollup = aggregates.monthly_rollup('babycare', 'brand')
+
+    state = ingest.invalidate('babycare')
+    assert state['manifest']['generation'] != before['manifest']['generation']
+    assert ingest.source_version('babycare') != version
+    #rebuilt for the new generation, not merged into nor served from the old one
+    assert aggregates.monthly_rollup('babycare', 'brand') is not rollup
+    entries = [entry for (name, build, _), entry in aggregates._aggregates.items() if build == 'build_monthly_rollup']
+    assert [entry['generation'] for entry in entries] == [state['manifest']['generation']]
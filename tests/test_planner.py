@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from dashboard_core import planner
+
+
+def _rows():
+    return pd.DataFrame({'product': ['b', 'a', 'b', 'c', 'a'], 'brand': ['X', 'X', 'Y', 'Y', 'Y'],
+                         'sales': [1, 2, 3, 4, 5], 'revenue': [10, 20, 30, 40, 50]})
+
+
+def test_one_groupby_per_key(monkeypatch):
+    df = _rows()
+    calls = []
+    groupby = pd.DataFrame.groupby
+
+    def counted(self, *args, **kwargs):
+        calls.append(args)
+        return groupby(self, *args, **kwargs)
+    monkeypatch.setattr(pd.DataFrame, 'groupby', counted)
+    table = planner.aggregate_plan(df, {
+        'sales': ('product', {'sales': 'sum'}),
+        'revenue': ('product', {'revenue': 'sum'}),
+        'by_brand': (('brand', 'product'), {'sales': 'max'}),
+    })
+    #nothing runs until a panel asks for its table
+    assert calls == []
+    sales = table('sales')
+    assert calls == [('product',), (['brand', 'product'],)]
+    assert sales.to_dict('list') == {'product': ['a', 'b', 'c'], 'sales': [7, 4, 4]}
+    assert table('revenue').to_dict('list') == {'product': ['a', 'b', 'c'], 'revenue': [70, 40, 40]}
+    assert table('by_brand')['sales'].tolist() == [2, 1, 5, 3, 4]
+    assert len(calls) == 2
+
+
+def test_names_finish_each_key_once():
+    finished = []
+
+    def names(grouped):
+        finished.append(len(grouped))
+        return grouped.reset_index().assign(name = lambda frame: frame['product'].str.upper())
+
+    table = planner.aggregate_plan(_rows(), {
+        'sales': ('product', {'sales': 'sum'}),
+        'revenue': ('product', {'revenue': 'sum'}),
+    }, names = {'product': names})
+    assert table('sales')['name'].tolist() == ['A', 'B', 'C']
+    assert 'revenue' not in table('sales') and 'sales' not in table('revenue')
+    assert finished == [3]
+
+
+def test_conflicting_measures():
+    with pytest.raises(ValueError, match = "'sales'"):
+        planner.aggregate_plan(_rows(), {
+            'total': ('product', {'sales': 'sum'}),
+            'best': ('product', {'sales': 'max'}),
+        })
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from dashboard_core import ingest, products
+
+
+def test_build_dimension():
+    names = ['Zwitsal Baby Powder Classic 300g', 'Bambi Wash', 'Zwitsal Baby Powder Classic 100g', 'Alpha']
+    dim = products.build_dimension(names, max_len = 25)
+    assert dim.index.name == 'product_id'
+    assert dim['short_name'].tolist() == ['Zwitsal Baby Powder Class...', 'Bambi Wash',
+                                          'Zwitsal Baby Powder Class...', 'Alpha']
+    #the two powders share their short name and its short_id
+    assert dim['short_id'].tolist() == [0, 1, 0, 2]
+    assert dim['name_rank'].tolist() == [3, 1, 2, 0]
+
+
+def test_lookup_missing_ids():
+    ids = np.array([0, -1, 2], dtype = 'int32')
+    categories = ingest.load_dataset('babycare')['product_name'].cat.categories
+    assert products.lookup(ids, 'babycare', 'product_name', missing = None).tolist() == [categories[0], None, categories[2]]
+
+
+def test_join_names_matches_a_groupby_on_the_names():
+    df = products.add_product_keys(ingest.load_dataset('babycare').copy(), 'babycare', 20)
+    assert (products.lookup(df['product_id'], 'babycare', 'product_name') == df['product_name'].astype(object)).all()
+
+    grouped = df.groupby('short_id').agg({'name_rank': 'min', 'sales': 'sum'})
+    joined = products.join_names(grouped, 'babycare', 20)
+    expected = (df.assign(product_name = df['product_name'].astype(object))
+                  .groupby('short_name').agg(product_name = ('product_name', 'min'), sales = ('sales', 'sum'))
+                  .reset_index())
+    pd.testing.assert_frame_equal(joined[['short_name', 'product_name', 'sales']], expected, check_dtype = False)
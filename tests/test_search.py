@@ -0,0 +1,21 @@
+import pytest
+
+from dashboard_core import search
+from dashboard_core.datasets import DATASETS
+
+
+def test_short_terms_match_inside_words():
+    #regression: one and two character terms only matched the start of a word
+    index = search.ProductIndex(['Cetaphil Baby Wash 400ml', 'Mlk Soap', 'Zwitsal Baby Oil'])
+    assert [index.names[i] for i in index.search('ml')] == ['Mlk Soap', 'Cetaphil Baby Wash 400ml']
+    assert [index.names[i] for i in index.search('baby ml')] == ['Cetaphil Baby Wash 400ml']
+    assert not len(index.search('q'))
+
+
+@pytest.mark.parametrize('name', sorted(DATASETS))
+@pytest.mark.parametrize('text', ['a', 'ml', '0', 'ba', 'rum', 'baby oil', 'x z'])
+def test_search_finds_every_substring_match(name, text):
+    index = search.product_index(name)
+    found = set(index.search(text, limit = len(index.names)).tolist())
+    terms = search.normalize(text).split(' ')
+    assert found == {i for i, normalized in enumerate(index.normalized) if all(term in normalized for term in terms)}
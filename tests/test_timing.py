@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from dashboard_core import timing
+
+
+@pytest.fixture
+def timing_log(tmp_path, monkeypatch):
+    #timing on, spans logged to a file of the test, no overlay (no Streamlit run)
+    path = tmp_path / 'timings.jsonl'
+    monkeypatch.setattr(timing, 'ENABLED', True)
+    monkeypatch.setattr(timing, 'OVERLAY', False)
+    monkeypatch.setattr(timing, 'LOG_PATH', str(path))
+    #outside a script run st.fragment would not call the panel
+    monkeypatch.setattr(timing.st, 'fragment', lambda panel: panel)
+
+    def entries():
+        return [json.loads(line) for line in path.read_text().splitlines()]
+    return entries
+
+
+def test_span_is_a_no_op_when_disabled(monkeypatch):
+    monkeypatch.setattr(timing, 'ENABLED', False)
+    main = lambda: 1
+    assert timing.timed_page('page')(main) is main
+    assert timing.span('load_data') is timing.NULL_SPAN
+
+
+def test_page_run_logs_nested_spans(timing_log):
+    assert timing.span('outside') is timing.NULL_SPAN
+
+    @timing.timed_page('page')
+    def main():
+        with timing.span('load_data', dataset = 'babycare') as load:
+            with timing.span('groupby'):
+                pass
+            load.record(rows = 3)
+        return 'done'
+
+    assert main() == 'done'
+    entries = {entry['span']: entry for entry in timing_log()}
+    assert sorted(entries) == ['groupby', 'load_data', 'main']
+    assert [entries[span]['depth'] for span in ('main', 'load_data', 'groupby')] == [0, 1, 2]
+    assert entries['load_data']['dataset'] == 'babycare' and entries['load_data']['rows'] == 3
+    assert len({(entry['page'], entry['run']) for entry in entries.values()}) == 1
+    assert all(entry['ms'] >= 0 for entry in entries.values())
+
+
+def test_fragment_rerun_is_a_run_of_its_own(timing_log):
+    @timing.timed_fragment('page')
+    def histogram_panel():
+        with timing.span('plotly_chart'):
+            pass
+
+    @timing.timed_page('page')
+    def main():
+        histogram_panel()
+
+    #within the page the panel's spans nest in the page's run
+    main()
+    page_run = timing_log()
+    assert [(entry['span'], entry['depth']) for entry in page_run] == [('plotly_chart', 1), ('main', 0)]
+
+    #a rerun of the fragment alone used to leave its spans untimed
+    histogram_panel()
+    fragment_run = timing_log()[len(page_run):]
+    assert [(entry['span'], entry['depth']) for entry in fragment_run] == [('plotly_chart', 1), ('fragment', 0)]
+    assert fragment_run[1]['panel'] == 'histogram_panel'
+    assert fragment_run[0]['run'] != page_run[0]['run']
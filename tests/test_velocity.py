@@ -0,0 +1,144 @@
+import pandas as pd
+import pytest
+
+from dashboard_core import aggregates, ingest, query, velocity
+from dashboard_core.datasets import DATASETS
+
+
+@pytest.mark.parametrize('name', sorted(DATASETS))
+def test_load_sales_deltas(name):
+    #regression: the aggregate cache key used to hold the unhashable column spec
+    deltas = velocity.load_sales_deltas(name)
+    assert len(deltas)
+    assert (deltas['sales_delta'] >= 0).all()
+    assert not deltas.loc[deltas['first'], 'sales_delta'].any()
+
+
+def _snapshots(rows):
+    #babycare-shaped frame of (brand, product, day of June, counter, price) rows
+    df = pd.DataFrame(rows, columns = ['brand', 'product_name', 'day', 'sales', 'product_price'])
+    df['scraping_date'] = pd.to_datetime('2025-06-01') + pd.to_timedelta(df.pop('day') - 1, unit = 'D')
+    df['brand'] = df['brand'].astype('category')
+    df['product_name'] = df['product_name'].astype('category')
+    return df
+
+
+#A sells 5 then has its listing reset (counter 3), B is listed twice in one snapshot,
+#C only appears in the appended snapshots and is reset there
+SNAPSHOTS = [
+    ('X', 'A', 1, 10, 100), ('X', 'B', 1, 4, 50), ('X', 'B', 1, 2, 50),
+    ('X', 'A', 2, 15, 100), ('X', 'B', 2, 6, 50),
+]
+APPENDED = [
+    ('X', 'A', 3, 3, 120), ('X', 'B', 3, 9, 50), ('X', 'C', 3, 7, 10),
+    ('X', 'A', 4, 8, 120), ('X', 'C', 4, 1, 10),
+]
+
+
+def test_merge_equals_full_build():
+    full = velocity.build_sales_deltas(_snapshots(SNAPSHOTS + APPENDED), 'babycare')
+    value = velocity.build_sales_deltas(_snapshots(SNAPSHOTS), 'babycare')
+    merged = velocity.merge_sales_deltas(value, velocity.build_sales_deltas(_snapshots(APPENDED), 'babycare'), 'babycare')
+
+    order = ['product_name', 'scraping_date']
+    columns = order + ['interval_start', 'sold', 'price', 'first', 'sales_delta', 'revenue_delta']
+    expected = full['deltas'][columns].astype({'product_name': object}).sort_values(order, ignore_index = True)
+    actual = merged['deltas'][columns].astype({'product_name': object}).sort_values(order, ignore_index = True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype = False)
+    #A: +5, reset to 3 (3 sold), +5; B: +2, +3; C: first seen, reset to 1 (1 sold)
+    assert expected.groupby('product_name')['sales_delta'].sum().to_dict() == {'A': 13, 'B': 5, 'C': 1}
+    assert merged['last']['sold'].to_dict() == {('X', 'A'): 8, ('X', 'B'): 9, ('X', 'C'): 1}
+
+
+def test_sales_periods_count_intervals(synthetic_dataset):
+    synthetic_dataset('babycare', months = 3)
+    sales = velocity.monthly_sales('babycare', 'brand')
+    rollup = aggregates.monthly_rollup('babycare', 'brand')
+    current, previous = velocity.sales_periods(sales, rollup, 'March 2025', 'Brand 000')
+    assert current['intervals'] > 0 and previous['period'] == 'February 2025'
+    #the counters count every unit since the listing in every snapshot
+    assert current['sales'] < aggregates.rollup_periods(rollup, 'March 2025', 'Brand 000')[0]['sales']
+
+
+def test_sales_periods_fall_back_to_counters():
+    #every product of the shipped babycare sample is scraped once, nothing to count from
+    sales = velocity.monthly_sales('babycare', 'brand')
+    rollup = aggregates.monthly_rollup('babycare', 'brand')
+    for (brand, period) in rollup['positions']:
+        assert velocity.sales_periods(sales, rollup, period, brand) == aggregates.rollup_periods(rollup, period, brand)
+
+
+def test_duckdb_monthly_sales(synthetic_dataset, monkeypatch):
+    duckdb = pytest.importorskip('duckdb')
+    monkeypatch.setattr(query, 'BACKEND', 'duckdb')
+    monkeypatch.setattr(query, 'duckdb', duckdb)
+    monkeypatch.setattr(query, 'pa_dataset', pytest.importorskip('pyarrow.dataset'))
+    synthetic_dataset('babycare', months = 3)
+    for group in (None, 'brand'):
+        assert query.monthly_sales('babycare', group)['rows'] == velocity.monthly_sales('babycare', group)['rows']
+
+
+def test_product_shares_sum_to_the_brand_revenue(synthetic_dataset):
+    #regression: the product panels summed the counters of every snapshot of the month
+    #and divided them by the units really sold, shares went past 10000%
+    synthetic_dataset('babycare', months = 3)
+    sales = velocity.monthly_sales('babycare', 'brand')
+    rollup = aggregates.monthly_rollup('babycare', 'brand')
+    cube = velocity.sold_cube('babycare')
+    measured = 0
+    for (brand, period) in rollup['positions']:
+        sold, _ = velocity.sales_periods(sales, rollup, period, brand)
+        if not velocity.measured(sold):
+            continue
+        measured += 1
+        products = aggregates.cube_slice(cube, 'products', brand, period)
+        share = products['revenue'] / sold['revenue'] * 100
+        assert share.between(0, 100).all()
+        assert products[['sales', 'revenue']].sum().tolist() == [sold['sales'], sold['revenue']]
+        assert aggregates.cube_slice(cube, 'prices', brand, period)['sales'].sum() == sold['sales']
+    assert measured
+
+
+def test_sold_columns_add_up_to_the_monthly_sales(synthetic_dataset):
+    synthetic_dataset('expertcare', months = 3)
+    df = velocity.add_sold_columns(ingest.load_dataset('expertcare').copy(), 'expertcare')
+    totals = df.groupby(aggregates.period_names(df['scraping_date']), observed = True)[['units_sold', 'revenue_sold']].sum()
+    sales = velocity.monthly_sales('expertcare')
+    for row in sales['rows']:
+        assert totals.loc[row['period']].tolist() == [row['sales'], row['revenue']]
+    #the counters of a measured month are replaced, the others kept
+    month = df[df['scraping_date'].dt.month == 3]
+    sold = velocity.sold_rows(month, sales['rows'][2], 'Sales', 'revenue')
+    assert sold['Sales'].sum() == sales['rows'][2]['sales'] < month['Sales'].sum()
+    assert velocity.sold_rows(month, {'sales': 0}, 'Sales', 'revenue') is month
+
+
+def test_market_share_of_the_units_sold(synthetic_dataset):
+    synthetic_dataset('babycare', months = 3)
+    sales = velocity.monthly_sales('babycare', 'brand')
+    market = velocity.market_share('babycare', aggregates.market_share('babycare'), sales)
+    assert velocity.market_share('babycare', aggregates.market_share('babycare'), sales) is market
+    for row in sales['rows']:
+        if row['intervals']:
+            assert market['revenue'].loc[row['period'], row['group']] == row['revenue']
+    shares = market['revenue_share'].sum(axis = 1)
+    assert ((shares - 100).abs() < 1e-9).all()
+
+
+def test_duckdb_sold_slice(synthetic_dataset, monkeypatch):
+    duckdb = pytest.importorskip('duckdb')
+    monkeypatch.setattr(query, 'BACKEND', 'duckdb')
+    monkeypatch.setattr(query, 'duckdb', duckdb)
+    monkeypatch.setattr(query, 'pa_dataset', pytest.importorskip('pyarrow.dataset'))
+    synthetic_dataset('babycare', months = 3)
+    cube = velocity.sold_cube('babycare')
+    names = ingest.load_dataset('babycare')['product_name'].cat.categories
+    _, sorted_names = query.product_names('babycare')
+    for table, key in (('products', 'product_id'), ('prices', 'product_price')):
+        expected = aggregates.cube_slice(cube, table, 'Brand 001', 'March 2025')
+        actual = query.sold_slice('babycare', table, 'Brand 001', 'March 2025')
+        if table == 'products':
+            #the backend numbers the sorted names
+            expected['product_id'] = sorted_names.get_indexer(names[expected['product_id']]).astype('int32')
+        expected = expected.sort_values(key, ignore_index = True)
+        pd.testing.assert_frame_equal(actual.sort_values(key, ignore_index = True), expected, check_dtype = False)
@@ -0,0 +1,57 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core import aggregates, ingest, views
+
+
+def _prepare(df):
+    df['period'] = aggregates.period_names(df['scraping_date'])
+    return df
+
+
+def test_page_frame_keeps_latest_version_only():
+    first = views._page_frame('babycare', 'v1', '_prepare', _prepare, ('brand',))
+    assert views._page_frame('babycare', 'v1', '_prepare', _prepare, ('brand',)) is first
+    #a new version of an unchanged dataset keeps the frame
+    assert views._page_frame('babycare', 'v2', '_prepare', _prepare, ('brand',)) is first
+
+    ingest.invalidate('babycare')
+    released = weakref.ref(first['frame'])
+    second = views._page_frame('babycare', 'v3', '_prepare', _prepare, ('brand',))
+    assert second is not first
+    del first
+    gc.collect()
+    #the superseded version's frame is not kept alive by the cache
+    assert released() is None
+    assert list(views._page_frames) == [('babycare', '_prepare', ('brand',), None)]
+
+
+def test_appended_rows_extend_the_page_frame(synthetic_dataset, monkeypatch):
+    #the appended rows cut a snapshot and a month, and bring new product names
+    path = synthetic_dataset('finallyfoundyou', products = 30, months = 3)
+    df = pd.read_csv(path, dtype = str, keep_default_na = False)
+    cut = int(len(df) * 0.61)
+    df.iloc[:cut][~df['product_name'].iloc[:cut].str.contains('1')].to_csv(path, index = False)
+    partition = ('period', 'categories')
+    before = views._page_frame('finallyfoundyou', 'v1', '_prepare', _prepare, partition, 20)
+
+    df.iloc[cut:].to_csv(path, mode = 'a', header = False, index = False)
+    extended_rows = []
+
+    def extend(value, new, *args, extend = views._extend_page_frame):
+        extended_rows.append(len(new))
+        return extend(value, new, *args)
+    monkeypatch.setattr(views, '_extend_page_frame', extend)
+    extended = views._page_frame('finallyfoundyou', 'v2', '_prepare', _prepare, partition, 20)
+    assert extended_rows == [len(extended['frame']) - len(before['frame'])] and extended_rows[0] > 0
+
+    views.clear_page_frames()
+    rebuilt = views._page_frame('finallyfoundyou', 'v2', '_prepare', _prepare, partition, 20)
+    assert extended['blocks'] == rebuilt['blocks']
+    pd.testing.assert_frame_equal(extended['frame'], rebuilt['frame'], check_categorical = False)
+    for values in rebuilt['blocks']:
+        selected = views.select(extended['frame'], extended['blocks'], *values)
+        assert np.array_equal(selected[list(partition)].drop_duplicates().to_numpy(), [values])
@@ -0,0 +1,25 @@
+import pytest
+
+from dashboard_core import aggregates, velocity, warmup
+from dashboard_core.datasets import DATASETS
+
+
+@pytest.mark.parametrize('name', sorted(DATASETS))
+def test_warm_data_loads_what_the_pages_load(name):
+    warmup.warm_data(name)
+    warmed = set(aggregates._aggregates)
+    #the aggregates behind the pages' calls, each under the key warm_data filled
+    group = {'babycare': 'brand', 'expertcare': None, 'finallyfoundyou': 'categories'}[name]
+    aggregates.monthly_rollup(name, group)
+    aggregates.price_max(name, group)
+    velocity.load_sales_deltas(name)
+    if name == 'babycare':
+        aggregates.load_aggregate(name, aggregates.build_brand_month_cube, aggregates.merge_brand_month_cube)
+        aggregates.market_share(name)
+    assert set(aggregates._aggregates) == warmed
+
+
+def test_sidebar_states_cover_the_radios():
+    states = warmup.sidebar_states('babycare_market_share_dashboard.py', False, 120)
+    #one month of the shipped sample, the share of revenue or of sales
+    assert sorted(state[-1] for state in states) == ['revenue', 'sales']